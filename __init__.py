@@ -29,26 +29,24 @@ def start_backend_server():
 
     try:
         from .backend.server import main as server_main
-        from .backend.config import AppConfig
 
-        # 加载配置
-        config = AppConfig.load()
+        # 不在导入路径上加载配置或等待：配置、端口绑定都在后台线程完成，
+        # 数据库在首个请求时才初始化；就绪状态见 backend.server.ready / /health
+        t0 = time.perf_counter()
 
         def run_server():
             try:
-                print(f"[Hikaze Model Manager] Starting server on {config.host}:{config.port}")
-                server_main(host=config.host, port=config.port)
+                server_main(started_at=t0)
             except Exception as e:
                 print(f"[Hikaze Model Manager] Server error: {e}")
 
         # 在后台线程中启动服务器
-        _server_thread = threading.Thread(target=run_server, daemon=True)
+        _server_thread = threading.Thread(target=run_server, name="hikaze-mm-server", daemon=True)
         _server_thread.start()
         _server_started = True
 
-        # 等待一段时间确保服务启动
-        time.sleep(2)
-        print(f"[Hikaze Model Manager] Server started successfully")
+        print(f"[Hikaze Model Manager] Server starting in background "
+              f"({(time.perf_counter() - t0) * 1000:.1f} ms on the import path)")
         return True
 
     except Exception as e:
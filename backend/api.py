@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""In-process query API for the ComfyUI nodes.
+
+The backend normally runs inside the ComfyUI process (started by the plugin __init__),
+so nodes can read the catalog straight from backend.db instead of calling the HTTP
+server on 127.0.0.1. Results have the same shape as the matching HTTP endpoints;
+the HTTP handlers build their responses from these functions too.
+Nodes fall back to HTTP when available() is False (backend running out of process).
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+try:
+    from . import db  # type: ignore
+    from .paths import MEDIA_DIR  # type: ignore
+    from .utils import calc_ckpt_name, calc_rel_in_domain, is_checkpoint_type  # type: ignore
+except Exception:
+    # Fallback for script-run context
+    import importlib.util, sys as _sys
+    _BDIR = os.path.dirname(__file__)
+
+    def _load_local(mod_name: str, rel_path: str):
+        spec = importlib.util.spec_from_file_location(mod_name, os.path.join(_BDIR, rel_path))
+        if spec is None or spec.loader is None:
+            raise ImportError(f"cannot load {rel_path}")
+        mod = importlib.util.module_from_spec(spec)
+        _sys.modules[mod_name] = mod
+        spec.loader.exec_module(mod)
+        return mod
+
+    db = _load_local("hikaze_mm_db", "db.py")
+    _paths = _load_local("hikaze_mm_paths", "paths.py")
+    _utils = _load_local("hikaze_mm_utils", "utils.py")
+    MEDIA_DIR = _paths.MEDIA_DIR
+    calc_ckpt_name = _utils.calc_ckpt_name
+    calc_rel_in_domain = _utils.calc_rel_in_domain
+    is_checkpoint_type = _utils.is_checkpoint_type
+
+# Set once the server in this process has initialized the database
+_ready = False
+
+
+def set_ready(ready: bool = True) -> None:
+    global _ready
+    _ready = bool(ready)
+
+
+def available() -> bool:
+    """True when the catalog can be queried in-process (the backend was started in this process)."""
+    return _ready
+
+
+def _loads_or(raw: Optional[str], default=None):
+    # Most rows have no meta/extra yet; skip the decoder entirely for those
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except Exception:
+        return default
+
+
+def list_item(m: dict) -> dict:
+    """Shape one query_models row (fetched with_tags=True) for the /models listing."""
+    meta = _loads_or(m.get("meta_json"))
+    extra = _loads_or(m.get("extra_json"))
+    tags = m.get("tags") or []
+    # Resolved at index time; rows not rescanned since schema v6 are resolved here
+    ckpt_name = m.get("ckpt_name")
+    lora_name = m.get("lora_name")
+    if ckpt_name is None and is_checkpoint_type(m.get("type")):
+        ckpt_name = calc_ckpt_name(m.get("path") or "")
+    if lora_name is None and (m.get("type") or "").strip().lower() in ("lora", "loras"):
+        lora_name = calc_rel_in_domain(m.get("path") or "", "loras")
+    return {
+        "id": m["id"],
+        "path": m["path"],
+        "name": m.get("name"),
+        "type": m.get("type"),
+        "size_bytes": m.get("size_bytes"),
+        "hash_hex": m.get("hash_hex"),
+        "created_at": m.get("created_at"),
+        "tags": tags,
+        "meta": meta,
+        "extra": extra,
+        "images": (extra or {}).get("images") if isinstance(extra, dict) else None,
+        "ckpt_name": ckpt_name,
+        "lora_name": lora_name,
+    }
+
+
+def merge_params(meta, extra) -> dict:
+    """Generation params of a model: user-edited extra params/prompts win over scanned metadata."""
+    params = {}
+    if isinstance(extra, dict):
+        if "params" in extra and isinstance(extra["params"], dict):
+            params.update(extra["params"])  # prefer user-extended params
+        if "prompts" in extra and isinstance(extra["prompts"], dict):
+            params.update(extra["prompts"])  # include prompt/negative
+    if isinstance(meta, dict) and "params" in meta and isinstance(meta["params"], dict):
+        for k, v in meta["params"].items():
+            params.setdefault(k, v)
+    return params
+
+
+def _match_ckpt_name(ckpt_name: str) -> Optional[dict]:
+    for m in db.find_models_by_ckpt_name(ckpt_name):
+        if is_checkpoint_type(m.get("type")):
+            return m
+    # Rows without a stored name (not rescanned since v6, or indexed outside ComfyUI) are resolved here
+    norm = ckpt_name.replace("\\", "/")
+    base = norm.rsplit("/", 1)[-1]
+    for m in db.unnamed_checkpoints():
+        path = (m.get("path") or "").replace("\\", "/")
+        if path.rsplit("/", 1)[-1] != base:
+            continue
+        if calc_ckpt_name(m.get("path") or "") == ckpt_name or path.endswith("/" + norm):
+            return m
+    return None
+
+
+def lookup_model(path: Optional[str] = None, ckpt_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """One model by absolute path or ComfyUI ckpt_name, as a /models item plus merged `params`."""
+    model = db.get_model_by_path(os.path.abspath(path)) if path else None
+    if model is None and ckpt_name:
+        model = _match_ckpt_name(ckpt_name)
+    if not model:
+        return None
+    item = list_item({**model, "tags": db.list_model_tags(model["id"])})
+    item["params"] = merge_params(item["meta"], item["extra"])
+    return item
+
+
+def model_params(mid: int) -> Optional[Dict[str, Any]]:
+    model = db.get_model_by_id(mid)
+    if not model:
+        return None
+    return merge_params(_loads_or(model.get("meta_json"), {}), _loads_or(model.get("extra_json"), {}))
+
+
+def media_path(url: str) -> Optional[str]:
+    """Local file behind a /media/<name> image URL, if it exists."""
+    if not isinstance(url, str) or not url.startswith("/media/"):
+        return None
+    name = url[len("/media/"):].split("?", 1)[0]
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        return None
+    p = os.path.join(MEDIA_DIR, name)
+    return p if os.path.isfile(p) else None
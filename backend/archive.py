@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""Catalog export/import: user annotations keyed by content hash, for moving between machines.
+
+The archive is an uncompressed tar stream (so it can be written to and read from a socket):
+
+    manifest.json          format, version and counts
+    tags.json              [{"name", "color"}] for tags that have a color
+    catalog.ndjson.gz      one line per annotated model: hash_hex, name, type, tags, extra, media
+    media/<file>           preview images referenced by extra["images"]
+
+Paths are not part of the match: importing applies each line to every indexed model with the
+same hash_hex, so the target machine only has to have scanned (and hashed) its models.
+Imported tags are added to the existing ones; extra keys from the archive replace the target's.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tarfile
+import tempfile
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+try:
+    from . import api, db, thumbs  # type: ignore
+    from .paths import MEDIA_DIR  # type: ignore
+except Exception:
+    # Fallback for script-run context
+    import importlib.util, sys as _sys
+    _BDIR = os.path.dirname(__file__)
+
+    def _load_local(mod_name: str, rel_path: str):
+        spec = importlib.util.spec_from_file_location(mod_name, os.path.join(_BDIR, rel_path))
+        if spec is None or spec.loader is None:
+            raise ImportError(f"cannot load {rel_path}")
+        mod = importlib.util.module_from_spec(spec)
+        _sys.modules[mod_name] = mod
+        spec.loader.exec_module(mod)
+        return mod
+
+    db = _load_local("hikaze_mm_db", "db.py")
+    api = _load_local("hikaze_mm_api", "api.py")
+    thumbs = _load_local("hikaze_mm_thumbs", "thumbs.py")
+    MEDIA_DIR = _load_local("hikaze_mm_paths", "paths.py").MEDIA_DIR
+
+FORMAT = "hikaze-mm-catalog"
+FORMAT_VERSION = 1
+# Models applied per write transaction on import
+IMPORT_BATCH = 500
+# The catalog is staged in memory up to this size, then in a temp file (tar needs member sizes up front)
+_SPOOL_MAX = 16 * 1024 * 1024
+_COPY_CHUNK = 1024 * 1024
+# Uploaded previews are named model_<id>_<rest> (see handlers.models.upload_image)
+_UPLOAD_NAME = re.compile(r"^model_\d+_(.+)$")
+
+
+def _loads(raw: Optional[str], default=None):
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except Exception:
+        return default
+
+
+def _media_urls(extra: Any) -> List[str]:
+    images = extra.get("images") if isinstance(extra, dict) else None
+    return [u for u in images if isinstance(u, str)] if isinstance(images, list) else []
+
+
+def _add_bytes(tar: tarfile.TarFile, name: str, data: bytes, mtime: float) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def export_archive(out: IO[bytes], media: bool = True) -> Dict[str, int]:
+    """Write the catalog archive to out (any writable binary stream); returns counts."""
+    now = time.time()
+    counts = {"models": 0, "skipped_unhashed": 0, "media": 0}
+    media_files: Dict[str, str] = {}
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX) as spool:
+        with gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=6, mtime=0) as gz:
+            for m in db.stream_models(sort="created", order="asc", with_tags=True, with_total=False):
+                extra = _loads(m.get("extra_json"))
+                # The type tag follows the file's location on the target, so it is not exported
+                tags = [t for t in (m.get("tags") or []) if t != m.get("type")]
+                if not tags and not extra:
+                    continue
+                if not m.get("hash_hex"):
+                    counts["skipped_unhashed"] += 1
+                    continue
+                rec: Dict[str, Any] = {"hash_hex": m["hash_hex"], "name": m.get("name"), "type": m.get("type"),
+                                       "tags": tags, "extra": extra}
+                if media:
+                    names = []
+                    for url in _media_urls(extra):
+                        local = api.media_path(url)
+                        if local:
+                            name = os.path.basename(local)
+                            media_files[name] = local
+                            names.append(name)
+                    if names:
+                        rec["media"] = names
+                gz.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+                counts["models"] += 1
+        size = spool.tell()
+        spool.seek(0)
+        counts["media"] = len(media_files)
+        with tarfile.open(fileobj=out, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            manifest = {"format": FORMAT, "version": FORMAT_VERSION, "schema": db.SCHEMA_VERSION,
+                        "created_at": int(now * 1000), **counts}
+            _add_bytes(tar, "manifest.json", json.dumps(manifest).encode("utf-8"), now)
+            colors = [{"name": t["name"], "color": t["color"]} for t in db.list_tags() if t.get("color")]
+            _add_bytes(tar, "tags.json", json.dumps(colors, ensure_ascii=False).encode("utf-8"), now)
+            info = tarfile.TarInfo("catalog.ndjson.gz")
+            info.size = size
+            info.mtime = int(now)
+            tar.addfile(info, spool)
+            for name, local in sorted(media_files.items()):
+                try:
+                    tar.add(local, arcname=f"media/{name}", recursive=False)
+                except OSError:
+                    # Removed since the catalog was read; its record simply has no file on import
+                    continue
+    return counts
+
+
+class _Importer:
+    def __init__(self, media: bool):
+        self.media = media
+        self.counts = {"records": 0, "matched": 0, "unmatched": 0, "skipped": 0, "models_updated": 0, "media": 0}
+        # archive media name -> target file names it is copied to
+        self.media_targets: Dict[str, List[str]] = {}
+        self.colors: Dict[str, str] = {}
+        # (model id, images before, images after) where the archive replaced a model's previews
+        self.replaced: List[Tuple[int, List[str], List[str]]] = []
+
+    def _target_extra(self, mid: int, current_raw: Optional[str], rec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        extra = rec.get("extra")
+        if not isinstance(extra, dict):
+            return None
+        current = _loads(current_raw, {})
+        merged = dict(current) if isinstance(current, dict) else {}
+        merged.update(extra)
+        shipped = {n for n in rec.get("media") or [] if isinstance(n, str)} if self.media else set()
+        images = []
+        for url in _media_urls(extra):
+            if not url.startswith("/media/"):
+                images.append(url)
+                continue
+            name = url[len("/media/"):]
+            if name not in shipped:
+                # The file did not travel with the archive: a dangling URL helps nobody
+                continue
+            # Renamed after the target model so upload_image's cleanup treats it as that model's own
+            hit = _UPLOAD_NAME.match(name)
+            new_name = f"model_{mid}_{hit.group(1) if hit else name}"
+            self.media_targets.setdefault(name, []).append(new_name)
+            images.append(f"/media/{new_name}")
+        if "images" in extra:
+            if images:
+                merged["images"] = images
+                if isinstance(current, dict):
+                    self.replaced.append((mid, _media_urls(current), images))
+            elif isinstance(current, dict) and "images" in current:
+                merged["images"] = current["images"]
+            else:
+                merged.pop("images", None)
+        return merged
+
+    @staticmethod
+    def _well_formed(rec: Dict[str, Any]) -> bool:
+        # A string in tags/media would be iterated per character ("anime" -> a, n, i, m, e)
+        return (isinstance(rec.get("hash_hex") or "", str) and isinstance(rec.get("tags") or [], list)
+                and isinstance(rec.get("media") or [], list))
+
+    def apply(self, records: List[Dict[str, Any]]) -> None:
+        self.counts["records"] += len(records)
+        valid = [r for r in records if self._well_formed(r)]
+        self.counts["skipped"] += len(records) - len(valid)
+        targets = db.models_by_hash(r.get("hash_hex") for r in valid)
+        updates: List[Tuple[int, Optional[Dict[str, Any]], List[str]]] = []
+        for rec in valid:
+            hits = targets.get(rec.get("hash_hex") or "")
+            if not hits:
+                self.counts["unmatched"] += 1
+                continue
+            self.counts["matched"] += 1
+            tags = [t for t in (rec.get("tags") or []) if isinstance(t, str) and t.strip()]
+            for t in hits:
+                # Never add another type's tag to a model the target classifies differently
+                updates.append((t["id"], self._target_extra(t["id"], t["extra_json"], rec),
+                                [x for x in tags if x.strip().lower() != (t["type"] or "")]))
+        self.counts["models_updated"] += db.apply_catalog_updates(updates)
+        # Committed: previews the archive replaced are no longer referenced (as after an upload)
+        for mid, before, after in self.replaced:
+            thumbs.remove_replaced_media(mid, before, keep=after)
+        self.replaced.clear()
+
+    def write_media(self, name: str, src: IO[bytes]) -> None:
+        targets = self.media_targets.pop(name, None)
+        if not targets:
+            return
+        os.makedirs(MEDIA_DIR, exist_ok=True)
+        first = os.path.join(MEDIA_DIR, targets[0])
+        self._write(first, lambda f: shutil.copyfileobj(src, f, _COPY_CHUNK))
+        # Same image on several matching models: one copy each, so each can be replaced alone
+        for other in targets[1:]:
+            with open(first, "rb") as s:
+                self._write(os.path.join(MEDIA_DIR, other), lambda f: shutil.copyfileobj(s, f, _COPY_CHUNK))
+        self.counts["media"] += len(targets)
+
+    @staticmethod
+    def _write(path: str, fill) -> None:
+        # Written beside the target and renamed into place, like uploads
+        tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.part")
+        try:
+            with open(tmp, "wb") as f:
+                fill(f)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _safe_media_name(member: tarfile.TarInfo) -> Optional[str]:
+    if not member.isfile() or not member.name.startswith("media/"):
+        return None
+    name = member.name[len("media/"):]
+    if not name or "/" in name or "\\" in name or name.startswith("."):
+        return None
+    return name
+
+
+def import_archive(src: IO[bytes], media: bool = True, batch: int = IMPORT_BATCH) -> Dict[str, int]:
+    """Apply an archive written by export_archive, read sequentially from src; returns counts.
+
+    Catalog lines that are not JSON objects are counted as skipped. Raises ValueError when src
+    is not such an archive; batches applied before a damaged stream was detected stay applied.
+    """
+    imp = _Importer(media)
+    seen_manifest = False
+    try:
+        tar = tarfile.open(fileobj=src, mode="r|*")
+    except tarfile.TarError as e:
+        raise ValueError(f"not a catalog archive: {e}")
+    with tar:
+        try:
+            for member in tar:
+                if member.name == "manifest.json":
+                    manifest = json.loads(tar.extractfile(member).read().decode("utf-8"))  # type: ignore[union-attr]
+                    if manifest.get("format") != FORMAT or int(manifest.get("version") or 0) > FORMAT_VERSION:
+                        raise ValueError("unsupported archive format")
+                    seen_manifest = True
+                elif not seen_manifest:
+                    raise ValueError("manifest.json missing")
+                elif member.name == "tags.json":
+                    for t in json.loads(tar.extractfile(member).read().decode("utf-8")) or []:  # type: ignore[union-attr]
+                        if isinstance(t, dict) and t.get("name") and t.get("color"):
+                            imp.colors[str(t["name"])] = str(t["color"])
+                elif member.name == "catalog.ndjson.gz":
+                    pending: List[Dict[str, Any]] = []
+                    with gzip.GzipFile(fileobj=tar.extractfile(member), mode="rb") as gz:  # type: ignore[arg-type]
+                        for line in gz:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                rec = json.loads(line)
+                            except ValueError:
+                                rec = None
+                            if isinstance(rec, dict):
+                                pending.append(rec)
+                            else:
+                                # A bad line must not abort the import after earlier batches committed
+                                imp.counts["skipped"] += 1
+                            if len(pending) >= batch:
+                                imp.apply(pending)
+                                pending = []
+                    if pending:
+                        imp.apply(pending)
+                elif media:
+                    name = _safe_media_name(member)
+                    if name is not None:
+                        imp.write_media(name, tar.extractfile(member))  # type: ignore[arg-type]
+        except (tarfile.TarError, EOFError, gzip.BadGzipFile) as e:
+            applied = " (records before the damage were applied)" if imp.counts["records"] else ""
+            raise ValueError(f"damaged catalog archive: {e}{applied}")
+    if not seen_manifest:
+        raise ValueError("manifest.json missing")
+    if imp.colors:
+        db.set_missing_tag_colors(imp.colors)
+    return imp.counts
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Backend benchmarks.
+
+Run from the plugin root so the backend package resolves, e.g.:
+
+    python -m backend.bench load --models 20000 --concurrency 16
+
+Every benchmark works on a throw-away database seeded with synthetic rows unless
+a target URL is given, so the real catalog under data/ is never touched.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+from . import db
+from .config import AppConfig
+
+_TYPES = ("checkpoint", "lora", "lora", "lora", "embedding", "vae", "upscale")
+
+
+# --- helpers ---
+
+def _use_temp_db() -> str:
+    """Point the db module at a fresh sqlite file; return the temp dir (caller removes it)."""
+    tmp = tempfile.mkdtemp(prefix="hikaze_mm_bench_")
+    db.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+    db.close()
+    db.init_db()
+    return tmp
+
+
+def _seed_models(n: int, tag_pool: int = 300, tags_per_model: int = 3, seed: int = 42) -> None:
+    """Insert n synthetic models with random user tags, bypassing the scanner."""
+    rnd = random.Random(seed)
+    conn = db.get_conn()
+    now = int(time.time() * 1000)
+    with conn:
+        for t in set(_TYPES):
+            conn.execute("INSERT OR IGNORE INTO tags(name, created_at) VALUES (?,?)", (t, now))
+        conn.executemany(
+            "INSERT OR IGNORE INTO tags(name, created_at) VALUES (?,?)",
+            [(f"tag{i:04d}", now) for i in range(tag_pool)],
+        )
+        tag_ids = {r["name"]: int(r["id"]) for r in conn.execute("SELECT id, name FROM tags").fetchall()}
+        rows = []
+        links = []
+        for i in range(n):
+            type_ = _TYPES[i % len(_TYPES)]
+            name = f"model_{i:07d}_{rnd.choice(('anime', 'photo', 'style', 'char', 'xl'))}.safetensors"
+            path = f"/bench/models/{type_}/sub{i % 37:02d}/{name}"
+            extra = '{"description":"synthetic %d"}' % i if i % 5 == 0 else None
+            rows.append((i + 1, path, name, type_, rnd.randint(1 << 20, 1 << 33), "", now - i, None, extra))
+            links.append((i + 1, tag_ids[type_]))
+            for t in rnd.sample(range(tag_pool), tags_per_model):
+                links.append((i + 1, tag_ids[f"tag{t:04d}"]))
+        conn.executemany(
+            "INSERT INTO models(id, path, name, type, size_bytes, hash_hex, created_at, meta_json, extra_json)"
+            " VALUES(?,?,?,?,?,?,?,?,?)",
+            rows,
+        )
+        conn.executemany("INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)", links)
+    db.rebuild_search_index()
+
+
+def _percentile(sorted_vals: Sequence[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+def _report(label: str, lat_ms: List[float], elapsed: float, errors: int = 0) -> None:
+    lat = sorted(lat_ms)
+    rps = len(lat) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"{label:<28} n={len(lat):<6} p50={_percentile(lat, 50):8.2f}ms "
+        f"p99={_percentile(lat, 99):8.2f}ms max={(lat[-1] if lat else 0):8.2f}ms "
+        f"{rps:9.1f} req/s errors={errors}"
+    )
+
+
+def _report_ms(label: str, lat_ms: List[float]) -> None:
+    lat = sorted(lat_ms)
+    print(f"{label:<36} p50={_percentile(lat, 50):8.2f}ms p99={_percentile(lat, 99):8.2f}ms")
+
+
+def _time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000.0)
+    return out
+
+
+# --- load: concurrent HTTP clients against the API server ---
+
+DEFAULT_LOAD_PATHS = (
+    "/models?limit=200",
+    "/models?q=anime&limit=50",
+    "/tags/facets?type=lora",
+    "/types",
+    "/tags",
+)
+
+
+def _run_clients(base_url: str, paths: Sequence[str], concurrency: int, requests_total: int):
+    lat: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        url = base_url + paths[i % len(paths)]
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                resp.read()
+        except (urllib.error.URLError, OSError):
+            ok = False
+        dt = (time.perf_counter() - t0) * 1000.0
+        with lock:
+            if ok:
+                lat.append(dt)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, range(requests_total)))
+    return lat, time.perf_counter() - t0, errors
+
+
+def cmd_load(args: argparse.Namespace) -> None:
+    paths = args.path or list(DEFAULT_LOAD_PATHS)
+    if args.url:
+        lat, elapsed, errors = _run_clients(args.url.rstrip("/"), paths, args.concurrency, args.requests)
+        _report(f"{args.url} c={args.concurrency}", lat, elapsed, errors)
+        return
+
+    from . import server as srv_mod
+    from .http_handler import ApiHandler, set_context
+
+    class _QuietHandler(ApiHandler):
+        def log_message(self, format, *a):  # noqa: A002
+            pass
+
+    tmp = _use_temp_db()
+    try:
+        _seed_models(args.models)
+        set_context(AppConfig(model_roots=[]), None, srv_mod.VERSION)
+        print(f"seeded {args.models} models; {args.requests} requests, concurrency {args.concurrency}")
+        modes = [0, args.workers] if args.compare else [args.workers]
+        for workers in modes:
+            server = srv_mod.make_server("127.0.0.1", 0, workers=workers, queue_size=args.queue_size)
+            server.RequestHandlerClass = _QuietHandler
+            th = threading.Thread(target=server.serve_forever, daemon=True)
+            th.start()
+            try:
+                base = f"http://127.0.0.1:{server.server_address[1]}"
+                _run_clients(base, paths, 2, min(20, args.requests))  # warm-up
+                lat, elapsed, errors = _run_clients(base, paths, args.concurrency, args.requests)
+                label = "single-threaded" if workers <= 0 else f"pool workers={workers}"
+                _report(label, lat, elapsed, errors)
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- list: /models page assembly, N+1 tag lookups vs one batched query ---
+
+def cmd_list(args: argparse.Namespace) -> None:
+    from .api import list_item as _list_item
+
+    for n in args.models:
+        tmp = _use_temp_db()
+        try:
+            _seed_models(n)
+            print(f"-- {n} models")
+            for limit in args.limit:
+                pages = [db.query_models(limit=limit, offset=off)[0] for off in (0, n // 2, max(0, n - limit))]
+
+                def per_row() -> None:
+                    for items in pages:
+                        for m in items:
+                            m["tags"] = db.list_model_tags(int(m["id"]))
+                            _list_item(m)
+
+                def batched() -> None:
+                    for items in pages:
+                        tag_map = db.list_tags_for_models(int(m["id"]) for m in items)
+                        for m in items:
+                            m["tags"] = tag_map[int(m["id"])]
+                            _list_item(m)
+
+                def full_page() -> None:
+                    db.query_models(limit=limit, offset=n // 2, with_tags=True)
+
+                for label, fn, per in (
+                    ("tags+rows per-row", per_row, len(pages)),
+                    ("tags+rows batched", batched, len(pages)),
+                    ("full page (query+count)", full_page, 1),
+                ):
+                    _report_ms(f"limit={limit} {label}", [t / per for t in _time_calls(fn, args.repeat)])
+        finally:
+            db.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- page: deep scrolling, LIMIT/OFFSET + COUNT per page vs keyset cursor + cached total ---
+
+def cmd_page(args: argparse.Namespace) -> None:
+    tmp = _use_temp_db()
+    try:
+        _seed_models(args.models)
+        print(f"-- {args.models} models, limit={args.limit}")
+        for sort in args.sort:
+            # cursor for each depth, collected by walking the listing once
+            cursors = {0: None}
+            cur, depth = None, 0
+            while depth < max(args.depth):
+                _, _, cur = db.query_models(limit=args.limit, sort=sort, cursor=cur, with_total=False)
+                depth += args.limit
+                if cur is None:
+                    break
+                cursors[depth] = cur
+            for d in args.depth:
+                if d not in cursors:
+                    continue
+
+                def by_offset() -> None:
+                    db._totals.clear()  # pre-cursor behaviour: COUNT on every page
+                    db.query_models(limit=args.limit, offset=d, sort=sort)
+
+                def by_cursor() -> None:
+                    db.query_models(limit=args.limit, sort=sort, cursor=cursors[d])
+
+                _report_ms(f"sort={sort} depth={d} offset+count", _time_calls(by_offset, args.repeat))
+                _report_ms(f"sort={sort} depth={d} cursor", _time_calls(by_cursor, args.repeat))
+    finally:
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- search: FTS index vs LIKE scans for /models?q= and /tags/facets ---
+
+DEFAULT_SEARCH_TERMS = ("anime", "model_00123", "synthetic 4242", "sub17 photo", "tag0042")
+
+
+def cmd_search(args: argparse.Namespace) -> None:
+    tmp = _use_temp_db()
+    try:
+        t0 = time.perf_counter()
+        _seed_models(args.models)
+        print(f"seeded + indexed {args.models} models in {time.perf_counter() - t0:.1f}s "
+              f"(tokenizer={db._fts_tokenizer})")
+        tokenizer = db._fts_tokenizer
+        for q in args.q or DEFAULT_SEARCH_TERMS:
+            for label, tok in (("fts", tokenizer), ("like", None)):
+                if label == "fts" and tok is None:
+                    continue
+                db._fts_tokenizer = tok
+                try:
+                    page = _time_calls(lambda: db.query_models(q=q, limit=50, sort="relevance"), args.repeat)
+                    facets = _time_calls(lambda: db.tag_facets(q=q), args.repeat)
+                finally:
+                    db._fts_tokenizer = tokenizer
+                _report_ms(f"{q!r} {label} /models", page)
+                _report_ms(f"{q!r} {label} /tags/facets", facets)
+    finally:
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- scan: initial index vs. no-change rescan of a synthetic model tree ---
+
+def _make_tree(root: str, n: int, size: int = 0) -> List[str]:
+    dirs = ("checkpoints", "loras", "loras/style", "loras/char", "embeddings", "vae")
+    paths = []
+    for i in range(n):
+        d = os.path.join(root, dirs[i % len(dirs)], f"batch{i // 500:03d}")
+        os.makedirs(d, exist_ok=True)
+        p = os.path.join(d, f"file_{i:07d}.safetensors")
+        with open(p, "wb") as f:
+            if size:
+                f.write(os.urandom(size))
+        paths.append(p)
+    return paths
+
+
+def _timed_scan(scanner, roots: List[str], full: bool = False) -> float:
+    t0 = time.perf_counter()
+    scanner.start(paths=roots, full=full)
+    scanner._thread.join()
+    return time.perf_counter() - t0
+
+
+def cmd_scan(args: argparse.Namespace) -> None:
+    from .scanner import Scanner
+
+    tmp = _use_temp_db()
+    try:
+        root = os.path.join(tmp, "models")
+        t0 = time.perf_counter()
+        _make_tree(root, args.files)
+        print(f"created {args.files} files in {time.perf_counter() - t0:.1f}s")
+        scanner = Scanner(AppConfig(model_roots=[root]))
+        for label in ("initial scan", "rescan (no changes)"):
+            dt = _timed_scan(scanner, [root])
+            st = scanner.status()["stats"]
+            print(f"{label:<24} {dt:7.2f}s  added={st['added']} updated={st['updated']} "
+                  f"skipped={st['skipped']} errors={st['errors']}")
+    finally:
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- hash: full-scan hashing throughput by pool size ---
+
+def cmd_hash(args: argparse.Namespace) -> None:
+    from .scanner import Scanner
+
+    tmp = _use_temp_db()
+    try:
+        root = os.path.join(tmp, "models")
+        _make_tree(root, args.files, size=args.size_mb * 1024 * 1024)
+        total_mb = args.files * args.size_mb
+        print(f"{args.files} files x {args.size_mb} MiB = {total_mb} MiB (page cache warm after first pass)")
+        for workers in args.workers:
+            cfg = AppConfig(model_roots=[root], hash_workers=workers, hash_buffer_mb=args.buffer_mb)
+            scanner = Scanner(cfg)
+            dt = _timed_scan(scanner, [root], full=True)
+            st = scanner.status()
+            print(f"hash_workers={workers:<3} {dt:7.2f}s  {total_mb / dt:8.1f} MiB/s  "
+                  f"hashed={st['stats']['hashed']} errors={st['stats']['errors']}")
+    finally:
+        db.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Hikaze Model Manager backend benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("load", help="p50/p99 latency of the HTTP API under concurrent clients")
+    p.add_argument("--url", help="Benchmark a running server instead of an in-process one")
+    p.add_argument("--models", type=int, default=20000, help="Synthetic models to seed (in-process mode)")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--requests", type=int, default=800)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--queue-size", type=int, default=256)
+    p.add_argument("--compare", action="store_true", help="Also run the single-threaded server")
+    p.add_argument("--path", action="append", help="Request path (repeatable)")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("list", help="per-page latency of the /models listing")
+    p.add_argument("--models", type=int, nargs="+", default=[10000, 100000])
+    p.add_argument("--limit", type=int, nargs="+", default=[50, 500])
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("page", help="deep /models pages: offset + count vs keyset cursor")
+    p.add_argument("--models", type=int, default=100000)
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--depth", type=int, nargs="+", default=[0, 10000, 50000, 90000])
+    p.add_argument("--sort", nargs="+", default=["created", "name", "size"])
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_page)
+
+    p = sub.add_parser("search", help="free-text search latency, FTS index vs LIKE scan")
+    p.add_argument("--models", type=int, default=100000)
+    p.add_argument("--q", action="append", help="Search string (repeatable)")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("scan", help="initial scan vs. no-change rescan of a synthetic tree")
+    p.add_argument("--files", type=int, default=20000)
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("hash", help="full-scan hashing throughput per hash pool size")
+    p.add_argument("--files", type=int, default=64)
+    p.add_argument("--size-mb", type=int, default=32)
+    p.add_argument("--buffer-mb", type=int, default=8)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.set_defaults(func=cmd_hash)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
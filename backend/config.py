@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import json
 import os
+import sys
 import importlib.util
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Tuple
@@ -41,10 +42,30 @@ _NAME_ALIASES = {
 SYSTEM_TAGS = {"checkpoint", "lora", "embedding", "vae", "upscale", "ultralytics", "other"}
 DEFAULT_PORT = 8789
 DEFAULT_HOST = "127.0.0.1"
+# HTTP worker pool: 0 workers falls back to the legacy single-threaded server
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 64
+# Full-scan hashing: parallel readers and per-read buffer size
+DEFAULT_HASH_WORKERS = 4
+DEFAULT_HASH_BUFFER_MB = 8
+# Watch mode: apply filesystem changes after this quiet period; roots inotify cannot see are polled
+DEFAULT_WATCH_DEBOUNCE_SEC = 2.0
+DEFAULT_WATCH_POLL_SEC = 30
+# Disk budget of the preview thumbnail cache (data/thumbs)
+DEFAULT_THUMB_CACHE_MB = 256
+# Largest accepted preview image upload (PUT /models/{id}/image)
+DEFAULT_MAX_UPLOAD_MB = 32
+# Memory budget for LoRA weights kept loaded between Power LoRA Loader runs (0 disables)
+DEFAULT_LORA_CACHE_MB = 1024
 
 
 def _load_folder_paths_module(repo_root: str):
-    """Attempt to load folder_paths.py from the repo root; return module or None."""
+    """ComfyUI's folder_paths module: the one already imported when running inside ComfyUI
+    (executing it again costs time and misses paths registered at runtime), else loaded
+    from the repo root; None if unavailable."""
+    mod = sys.modules.get("folder_paths")
+    if mod is not None:
+        return mod
     try:
         fp = os.path.join(repo_root, "folder_paths.py")
         if not os.path.exists(fp):
@@ -69,6 +90,16 @@ class AppConfig:
     host: str = DEFAULT_HOST
     port: int = DEFAULT_PORT
     model_roots: List[str] = None
+    workers: int = DEFAULT_WORKERS
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    hash_workers: int = DEFAULT_HASH_WORKERS
+    hash_buffer_mb: int = DEFAULT_HASH_BUFFER_MB
+    watch: bool = False
+    watch_debounce_sec: float = DEFAULT_WATCH_DEBOUNCE_SEC
+    watch_poll_sec: int = DEFAULT_WATCH_POLL_SEC
+    thumb_cache_mb: int = DEFAULT_THUMB_CACHE_MB
+    max_upload_mb: int = DEFAULT_MAX_UPLOAD_MB
+    lora_cache_mb: int = DEFAULT_LORA_CACHE_MB
     # Runtime: mapping from root path to type name (used when a root is exactly a type directory)
     root_type_map: Dict[str, str] = field(default_factory=dict)
 
@@ -86,6 +117,16 @@ class AppConfig:
             cfg = {}
         host = cfg.get("host", DEFAULT_HOST)
         port = int(cfg.get("port", DEFAULT_PORT))
+        workers = max(0, int(cfg.get("workers", DEFAULT_WORKERS)))
+        queue_size = max(1, int(cfg.get("queue_size", DEFAULT_QUEUE_SIZE)))
+        hash_workers = max(1, int(cfg.get("hash_workers", DEFAULT_HASH_WORKERS)))
+        hash_buffer_mb = max(1, int(cfg.get("hash_buffer_mb", DEFAULT_HASH_BUFFER_MB)))
+        watch = bool(cfg.get("watch", False))
+        watch_debounce_sec = max(0.1, float(cfg.get("watch_debounce_sec", DEFAULT_WATCH_DEBOUNCE_SEC)))
+        watch_poll_sec = max(1, int(cfg.get("watch_poll_sec", DEFAULT_WATCH_POLL_SEC)))
+        thumb_cache_mb = max(1, int(cfg.get("thumb_cache_mb", DEFAULT_THUMB_CACHE_MB)))
+        max_upload_mb = max(1, int(cfg.get("max_upload_mb", DEFAULT_MAX_UPLOAD_MB)))
+        lora_cache_mb = max(0, int(cfg.get("lora_cache_mb", DEFAULT_LORA_CACHE_MB)))
         roots_cfg = cfg.get("model_roots")
         if not roots_cfg:
             roots_cfg = [p for p in DEFAULT_MODEL_ROOTS if os.path.isdir(p)]
@@ -129,9 +170,28 @@ class AppConfig:
                 rmap[os.path.normcase(ap)] = t
         # Note: default REPO_ROOT/models is not mapped; still infer by first-level subdir
 
-        return AppConfig(host=host, port=port, model_roots=all_roots, root_type_map=rmap)
+        return AppConfig(host=host, port=port, model_roots=all_roots, root_type_map=rmap,
+                         workers=workers, queue_size=queue_size,
+                         hash_workers=hash_workers, hash_buffer_mb=hash_buffer_mb,
+                         watch=watch, watch_debounce_sec=watch_debounce_sec, watch_poll_sec=watch_poll_sec,
+                         thumb_cache_mb=thumb_cache_mb, max_upload_mb=max_upload_mb,
+                         lora_cache_mb=lora_cache_mb)
 
     def save(self) -> None:
-        data = {"host": self.host, "port": self.port, "model_roots": self.model_roots}
+        data = {
+            "host": self.host,
+            "port": self.port,
+            "model_roots": self.model_roots,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "hash_workers": self.hash_workers,
+            "hash_buffer_mb": self.hash_buffer_mb,
+            "watch": self.watch,
+            "watch_debounce_sec": self.watch_debounce_sec,
+            "watch_poll_sec": self.watch_poll_sec,
+            "thumb_cache_mb": self.thumb_cache_mb,
+            "max_upload_mb": self.max_upload_mb,
+            "lora_cache_mb": self.lora_cache_mb,
+        }
         with open(CONFIG_PATH, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
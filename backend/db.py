@@ -1,14 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import base64
+import functools
+import json
 import os
 import sqlite3
 import threading
 import time
-from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Literal, NamedTuple, Optional, Set, Tuple
 
 try:
     from .config import DB_PATH, SYSTEM_TAGS  # type: ignore
+    from .facets import FacetIndex  # type: ignore
+    from .roots import RootMatcher  # type: ignore
 except Exception:
     # Fallback for script-run context
     import importlib.util, sys as _sys
@@ -21,26 +28,189 @@ except Exception:
     _spec.loader.exec_module(_mod)
     DB_PATH = _mod.DB_PATH
     SYSTEM_TAGS = _mod.SYSTEM_TAGS
-
+    _spec = importlib.util.spec_from_file_location("hikaze_mm_facets", os.path.join(_BDIR, "facets.py"))
+    if _spec is None or _spec.loader is None:
+        raise ImportError("cannot load facets.py")
+    _mod = importlib.util.module_from_spec(_spec)
+    _sys.modules["hikaze_mm_facets"] = _mod
+    _spec.loader.exec_module(_mod)
+    FacetIndex = _mod.FacetIndex
+    _spec = importlib.util.spec_from_file_location("hikaze_mm_roots", os.path.join(_BDIR, "roots.py"))
+    if _spec is None or _spec.loader is None:
+        raise ImportError("cannot load roots.py")
+    _mod = importlib.util.module_from_spec(_spec)
+    _sys.modules["hikaze_mm_roots"] = _mod
+    _spec.loader.exec_module(_mod)
+    RootMatcher = _mod.RootMatcher
+
+# Connections (WAL lets readers run alongside the writer):
+# - one write connection, shared by every thread and serialized by _WRITE_LOCK; write helpers
+#   run as a whole under it, so a scan batch and a tag edit never interleave in one transaction;
+# - one read-only connection per thread for the read helpers; each statement reads the last
+#   committed state, so listings never wait on a scan commit or see half of a batch;
+# - a probe connection that only answers PRAGMA data_version for generation().
+# A read helper called from inside a write helper keeps using the write connection, so it
+# sees the caller's uncommitted rows.
+_WRITE_LOCK = threading.RLock()
 _CONN_LOCK = threading.Lock()
-_conn: Optional[sqlite3.Connection] = None
+_writer: Optional[sqlite3.Connection] = None
+_probe: Optional[sqlite3.Connection] = None
+_PROBE_LOCK = threading.Lock()
+# Bumped by close(): thread-local readers opened before it are discarded on next use
+_conn_epoch = 0
+_local = threading.local()
+# Every open per-thread reader, so close() can close them; a thread's reader drops out when the thread ends
+_readers: "weakref.WeakSet[_ReaderConnection]" = weakref.WeakSet()
+# Type/tag membership bitmaps for /types and the tag facets; write helpers below keep it
+# current by touching the model ids they change (see facets.py)
+_facets = FacetIndex()
+# Facet updates of the current write, published together with its commit (see _WriterConnection)
+_pending_touch: List[int] = []
+_pending_reset = False
+# Writer's own data_version: it only moves when another process commits
+_writer_dv: Optional[int] = None
+# Connection epoch the schema was last checked for (init_db runs lazily, once per epoch)
+_initialized_epoch = -1
+_init_ms: Optional[float] = None
 
 
 def _dict_factory(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> Dict[str, Any]:
     return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
 
 
-def get_conn() -> sqlite3.Connection:
-    global _conn
+class _WriterConnection(sqlite3.Connection):
+    """`with conn:` on the writer commits and publishes the pending facet updates atomically
+    with respect to facet queries."""
+
+    def __exit__(self, exc_type, exc, tb):
+        with _facets.commit_guard():
+            try:
+                return super().__exit__(exc_type, exc, tb)
+            finally:
+                _publish_facets()
+
+
+class _ReaderConnection(sqlite3.Connection):
+    """Per-thread read connection (a subclass only so that _readers can reference it weakly)."""
+
+
+def _touch(model_ids: Iterable[int]) -> None:
+    _pending_touch.extend(int(i) for i in model_ids)
+
+
+def _invalidate_facets() -> None:
+    global _pending_reset
+    _pending_reset = True
+
+
+def _publish_facets() -> None:
+    global _pending_reset
+    if _pending_reset:
+        _facets.invalidate()
+    elif _pending_touch:
+        _facets.touch(_pending_touch)
+    _pending_reset = False
+    _pending_touch.clear()
+
+
+def _open(factory=sqlite3.Connection, read_only: bool = False) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=factory)
+    conn.row_factory = _dict_factory
+    if read_only:
+        conn.execute("PRAGMA query_only=ON;")
+    else:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    return conn
+
+
+def _writer_conn() -> sqlite3.Connection:
+    global _writer
+    with _CONN_LOCK:
+        if _writer is None:
+            _writer = _open(_WriterConnection)
+        return _writer
+
+
+def _reader_conn() -> sqlite3.Connection:
+    held = getattr(_local, "reader", None)
+    if held is not None and held[0] == _conn_epoch:
+        return held[1]
+    _writer_conn()  # the writer creates the file and switches it to WAL first
+    conn = _open(_ReaderConnection, read_only=True)
     with _CONN_LOCK:
-        if _conn is None:
-            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-            _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            _conn.row_factory = _dict_factory
-            _conn.execute("PRAGMA journal_mode=WAL;")
-            _conn.execute("PRAGMA synchronous=NORMAL;")
-            _conn.execute("PRAGMA foreign_keys=ON;")
-        return _conn
+        _readers.add(conn)
+    _local.reader = (_conn_epoch, conn)
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    """Connection for the current helper: the writer inside write helpers, this thread's reader
+    inside read helpers. Outside any helper (scripts, bench) it is the write connection."""
+    bound = getattr(_local, "bound", None)
+    return bound if bound is not None else _writer_conn()
+
+
+def close() -> None:
+    """Close all connections, every thread's reader included (e.g. after pointing DB_PATH
+    elsewhere); they reopen on next use. Call it while no read is in progress on another thread."""
+    global _writer, _probe, _conn_epoch, _writer_dv
+    with _WRITE_LOCK, _CONN_LOCK, _PROBE_LOCK:
+        for c in (_writer, _probe, *list(_readers)):
+            if c is not None:
+                c.close()
+        _readers.clear()
+        _writer = _probe = None
+        _writer_dv = None
+        _conn_epoch += 1
+
+
+def _check_external_writes(conn: sqlite3.Connection) -> None:
+    """Drop the facet index if another process committed since we last looked (caller holds _WRITE_LOCK)."""
+    global _writer_dv
+    dv = int(conn.execute("PRAGMA data_version").fetchone()["data_version"])
+    if _writer_dv is not None and dv != _writer_dv:
+        _facets.invalidate()
+    _writer_dv = dv
+
+
+def _synchronized(fn):
+    """Write helper: runs under _WRITE_LOCK on the write connection."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _WRITE_LOCK:
+            _ensure_initialized()
+            prev = getattr(_local, "bound", None)
+            conn = _writer_conn()
+            if prev is None:
+                _check_external_writes(conn)
+            _local.bound = conn
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _local.bound = prev
+                if prev is None and (_pending_touch or _pending_reset):
+                    # Touches recorded outside a `with conn:` block
+                    with _facets.commit_guard():
+                        _publish_facets()
+    return wrapper
+
+
+def _reader(fn):
+    """Read helper: runs on this thread's read connection without taking the write lock."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "bound", None) is not None:
+            return fn(*args, **kwargs)
+        _ensure_initialized()
+        _local.bound = _reader_conn()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.bound = None
+    return wrapper
 
 
 SCHEMA_SQL = r"""
@@ -57,6 +227,9 @@ CREATE TABLE IF NOT EXISTS directories (
 );
 
 -- v2: streamlined models table; removed dir_path/mtime_ns/updated_at/hash_algo
+-- v3: file fingerprint (size_bytes + mtime_ns + inode) for incremental scans
+-- v6: ComfyUI loader names (ckpt_name / lora_name), resolved at index time
+-- v7: missing_since (ms): file gone, row kept for its user tags/extra until the file turns up again
 CREATE TABLE IF NOT EXISTS models (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   path TEXT NOT NULL UNIQUE,
@@ -66,11 +239,36 @@ CREATE TABLE IF NOT EXISTS models (
   hash_hex TEXT NOT NULL,
   created_at INTEGER NOT NULL,
   meta_json TEXT,
-  extra_json TEXT
+  extra_json TEXT,
+  mtime_ns INTEGER,
+  inode INTEGER,
+  ckpt_name TEXT,
+  lora_name TEXT,
+  missing_since INTEGER
 );
 CREATE INDEX IF NOT EXISTS idx_models_hash ON models(hash_hex);
 CREATE INDEX IF NOT EXISTS idx_models_type ON models(type);
 CREATE INDEX IF NOT EXISTS idx_models_path ON models(path);
+-- v5: one index per sort key for keyset pagination (rowid is implicit: each orders by (key, id))
+CREATE INDEX IF NOT EXISTS idx_models_name ON models(name);
+CREATE INDEX IF NOT EXISTS idx_models_size ON models(size_bytes);
+CREATE INDEX IF NOT EXISTS idx_models_created ON models(created_at);
+CREATE INDEX IF NOT EXISTS idx_models_type_created ON models(type, created_at);
+-- v7: the few rows kept for gone files, looked up when a new file might be one of them
+CREATE INDEX IF NOT EXISTS idx_models_missing ON models(missing_since) WHERE missing_since IS NOT NULL;
+-- v8: loader lookups by ComfyUI ckpt_name (/models/lookup, the checkpoint node)
+CREATE INDEX IF NOT EXISTS idx_models_ckpt_name ON models(ckpt_name);
+
+-- v4: content hashes by file identity, so moved/renamed/symlinked files are not re-read
+CREATE TABLE IF NOT EXISTS hash_cache (
+  dev INTEGER NOT NULL,
+  ino INTEGER NOT NULL,
+  size_bytes INTEGER NOT NULL,
+  mtime_ns INTEGER NOT NULL,
+  hash_hex TEXT NOT NULL,
+  updated_at INTEGER,
+  PRIMARY KEY (dev, ino)
+);
 
 CREATE TABLE IF NOT EXISTS tags (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -89,7 +287,66 @@ CREATE TABLE IF NOT EXISTS model_tags (
 """
 
 
-def _ensure_schema_v2(conn: sqlite3.Connection) -> None:
+SCHEMA_VERSION = 8
+
+_MODEL_COLUMNS_V2 = ["id", "path", "name", "type", "size_bytes", "hash_hex", "created_at", "meta_json", "extra_json"]
+
+# Additive upgrades from v2 on: target version -> (new models columns, statements)
+_MIGRATIONS: Dict[int, Tuple[List[str], List[str]]] = {
+    3: (
+        ["mtime_ns", "inode"],
+        [
+            "ALTER TABLE models ADD COLUMN mtime_ns INTEGER",
+            "ALTER TABLE models ADD COLUMN inode INTEGER",
+        ],
+    ),
+    4: (
+        [],
+        [
+            "CREATE TABLE IF NOT EXISTS hash_cache (dev INTEGER NOT NULL, ino INTEGER NOT NULL,"
+            " size_bytes INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, hash_hex TEXT NOT NULL,"
+            " updated_at INTEGER, PRIMARY KEY (dev, ino))",
+        ],
+    ),
+    5: (
+        [],
+        [
+            "CREATE INDEX IF NOT EXISTS idx_models_name ON models(name)",
+            "CREATE INDEX IF NOT EXISTS idx_models_size ON models(size_bytes)",
+            "CREATE INDEX IF NOT EXISTS idx_models_created ON models(created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_models_type_created ON models(type, created_at)",
+        ],
+    ),
+    # Existing rows stay NULL until the next scan fills them (list_item resolves NULLs on the fly)
+    6: (
+        ["ckpt_name", "lora_name"],
+        [
+            "ALTER TABLE models ADD COLUMN ckpt_name TEXT",
+            "ALTER TABLE models ADD COLUMN lora_name TEXT",
+        ],
+    ),
+    7: (
+        ["missing_since"],
+        [
+            "ALTER TABLE models ADD COLUMN missing_since INTEGER",
+            "CREATE INDEX IF NOT EXISTS idx_models_missing ON models(missing_since) WHERE missing_since IS NOT NULL",
+        ],
+    ),
+    8: (
+        [],
+        ["CREATE INDEX IF NOT EXISTS idx_models_ckpt_name ON models(ckpt_name)"],
+    ),
+}
+
+
+def _model_columns(ver: int) -> List[str]:
+    cols = list(_MODEL_COLUMNS_V2)
+    for v in range(3, ver + 1):
+        cols.extend(_MIGRATIONS[v][0])
+    return cols
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
     # Read existing version
     try:
         cur = conn.execute("SELECT version FROM schema_version LIMIT 1")
@@ -97,22 +354,28 @@ def _ensure_schema_v2(conn: sqlite3.Connection) -> None:
         ver = int(row["version"]) if row and row.get("version") is not None else None
     except sqlite3.Error:
         ver = None
-    # Check whether models table matches v2 columns
-    def _is_v2() -> bool:
+    # Check whether models table matches the columns of that version
+    def _columns_match(v: int) -> bool:
         try:
             cur2 = conn.execute("PRAGMA table_info(models)")
             cols = [r["name"] for r in cur2.fetchall()]
-            expected = ["id","path","name","type","size_bytes","hash_hex","created_at","meta_json","extra_json"]
-            return cols and cols == expected
+            return bool(cols) and cols == _model_columns(v)
         except sqlite3.Error:
             return False
-    ok = (ver == 2) and _is_v2()
-    if ok:
+    if ver is not None and 2 <= ver <= SCHEMA_VERSION and _columns_match(ver):
+        # Upgrade in place so user tags / extra data survive schema bumps
+        for v in range(ver + 1, SCHEMA_VERSION + 1):
+            for stmt in _MIGRATIONS[v][1]:
+                conn.execute(stmt)
+        if ver != SCHEMA_VERSION:
+            conn.execute("UPDATE schema_version SET version= ?", (SCHEMA_VERSION,))
         return
-    # Drop old tables and recreate (dev stage; data not valuable)
+    # Pre-v2 or unrecognised layout: drop old tables and recreate (dev stage; data not valuable)
     try:
         conn.executescript(
             """
+            DROP TABLE IF EXISTS models_fts;
+            DROP TABLE IF EXISTS hash_cache;
             DROP TABLE IF EXISTS model_tags;
             DROP TABLE IF EXISTS tags;
             DROP TABLE IF EXISTS models;
@@ -123,24 +386,161 @@ def _ensure_schema_v2(conn: sqlite3.Connection) -> None:
     except sqlite3.Error:
         pass
     conn.executescript(SCHEMA_SQL)
-    conn.execute("INSERT INTO schema_version(version) VALUES (?)", (2,))
+    conn.execute("INSERT INTO schema_version(version) VALUES (?)", (SCHEMA_VERSION,))
 
 
 def init_db() -> None:
-    conn = get_conn()
-    with conn:
-        _ensure_schema_v2(conn)
-        # ensure system tags exist
-        now = int(time.time() * 1000)
-        for t in SYSTEM_TAGS:
+    """Create or upgrade the schema. Optional: the first helper call after start (or close()) runs it."""
+    global _initialized_epoch, _init_ms
+    with _WRITE_LOCK:
+        t0 = time.perf_counter()
+        conn = _writer_conn()
+        with conn:
+            _ensure_schema(conn)
+            # ensure system tags exist
+            now = int(time.time() * 1000)
+            for t in SYSTEM_TAGS:
+                try:
+                    conn.execute("INSERT OR IGNORE INTO tags(name, created_at) VALUES (?,?)", (t, now))
+                except sqlite3.Error:
+                    pass
+            _ensure_search_index(conn)
+            _invalidate_facets()
+        _initialized_epoch = _conn_epoch
+        _init_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _ensure_initialized() -> None:
+    if _initialized_epoch != _conn_epoch:
+        init_db()
+
+
+def init_status() -> Dict[str, Any]:
+    """For /health: whether the schema check has run for the current database, and how long it took."""
+    return {"ready": _initialized_epoch == _conn_epoch, "init_ms": _init_ms}
+
+
+# --- Search index (FTS5) ---
+# models_fts mirrors name / path segments / tag names / user notes per model (rowid = models.id).
+# It is a plain derived table: every write helper that changes one of those inputs calls
+# _fts_refresh() for the affected ids inside its own transaction.
+
+# Tokenizer of the live index: 'trigram' (substring match, sqlite >= 3.34), 'unicode61'
+# (token prefix match) or None when this sqlite build has no FTS5 (LIKE fallback).
+_fts_tokenizer: Optional[str] = None
+
+
+def _ensure_search_index(conn: sqlite3.Connection) -> None:
+    global _fts_tokenizer
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='models_fts'").fetchone()
+    if row:
+        _fts_tokenizer = "trigram" if "trigram" in (row["sql"] or "") else "unicode61"
+    else:
+        _fts_tokenizer = None
+        for tok in ("trigram", "unicode61"):
             try:
-                conn.execute("INSERT OR IGNORE INTO tags(name, created_at) VALUES (?,?)", (t, now))
+                conn.execute(f"CREATE VIRTUAL TABLE models_fts USING fts5(name, path, tags, notes, tokenize='{tok}')")
             except sqlite3.Error:
-                pass
+                continue
+            _fts_tokenizer = tok
+            break
+        if _fts_tokenizer is None:
+            return
+    indexed = conn.execute("SELECT COUNT(1) AS c FROM models_fts").fetchone()["c"]
+    total = conn.execute("SELECT COUNT(1) AS c FROM models").fetchone()["c"]
+    if indexed != total:
+        _fts_rebuild(conn)
+
+
+def _fts_notes(extra_json: Optional[str]) -> str:
+    if not extra_json:
+        return ""
+    try:
+        extra = json.loads(extra_json)
+    except Exception:
+        return ""
+    if not isinstance(extra, dict):
+        return ""
+    desc = extra.get("description")
+    return desc if isinstance(desc, str) else ""
+
+
+def _fts_refresh(conn: sqlite3.Connection, model_ids: Iterable[int]) -> None:
+    """Re-derive the search rows of the given models (rows of deleted models are dropped)."""
+    if _fts_tokenizer is None:
+        return
+    ids = [int(i) for i in model_ids]
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        placeholders = ",".join(["?"] * len(chunk))
+        conn.execute(f"DELETE FROM models_fts WHERE rowid IN ({placeholders})", chunk)
+        cur = conn.execute(
+            f"""SELECT m.id, m.name, m.path, m.extra_json,
+                       (SELECT group_concat(t.name, ' ') FROM model_tags mt JOIN tags t ON mt.tag_id=t.id
+                        WHERE mt.model_id=m.id) AS tag_names
+                FROM models m WHERE m.id IN ({placeholders})""",
+            chunk,
+        )
+        conn.executemany(
+            "INSERT INTO models_fts(rowid, name, path, tags, notes) VALUES(?,?,?,?,?)",
+            [
+                (r["id"], r["name"] or "", (r["path"] or "").replace("\\", "/").replace("/", " "),
+                 r["tag_names"] or "", _fts_notes(r["extra_json"]))
+                for r in cur.fetchall()
+            ],
+        )
+
+
+def _fts_rebuild(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM models_fts")
+    ids = [int(r["id"]) for r in conn.execute("SELECT id FROM models").fetchall()]
+    _fts_refresh(conn, ids)
+
+
+@_synchronized
+def rebuild_search_index() -> None:
+    """Repopulate models_fts from scratch (after bulk edits that bypassed the helpers)."""
+    conn = get_conn()
+    if _fts_tokenizer is None:
+        return
+    with conn:
+        _fts_rebuild(conn)
+
+
+def _search_terms(q: str) -> List[str]:
+    return [t.replace('"', "") for t in (q or "").split() if t.replace('"', "")]
+
+
+def _fts_match_expr(q: str) -> Optional[str]:
+    """FTS5 MATCH expression requiring every term of q, or None when the index can't serve q."""
+    terms = _search_terms(q)
+    if not terms or _fts_tokenizer is None:
+        return None
+    if _fts_tokenizer == "trigram":
+        # trigram can only use the index for terms of 3+ characters
+        if any(len(t) < 3 for t in terms):
+            return None
+        return " ".join(f'"{t}"' for t in terms)
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def _search_where(q: str) -> Tuple[str, List[Any]]:
+    """WHERE fragment on models m for a free-text query (FTS when possible, LIKE otherwise)."""
+    expr = _fts_match_expr(q)
+    if expr is not None:
+        return "m.id IN (SELECT rowid FROM models_fts WHERE models_fts MATCH ?)", [expr]
+    parts: List[str] = []
+    args: List[Any] = []
+    for t in _search_terms(q) or [q]:
+        parts.append("(m.name LIKE ? OR m.path LIKE ?)")
+        like = f"%{t}%"
+        args.extend([like, like])
+    return " AND ".join(parts), args
 
 
 # --- Tag helpers ---
 
+@_synchronized
 def get_or_create_tag_id(name: str) -> int:
     name = name.strip().lower()
     if not name:
@@ -156,12 +556,14 @@ def get_or_create_tag_id(name: str) -> int:
         return int(cur.lastrowid)
 
 
+@_reader
 def list_tags() -> List[Dict[str, Any]]:
     conn = get_conn()
     cur = conn.execute("SELECT id, name, color, created_at FROM tags ORDER BY name ASC")
     return list(cur.fetchall())
 
 
+@_synchronized
 def create_tag(name: str, color: Optional[str] = None) -> Dict[str, Any]:
     tid = get_or_create_tag_id(name)
     if color is not None:
@@ -171,6 +573,7 @@ def create_tag(name: str, color: Optional[str] = None) -> Dict[str, Any]:
     return cur.fetchone()
 
 
+@_synchronized
 def update_tag(tag_id: int, name: Optional[str] = None, color: Optional[str] = None) -> Dict[str, Any]:
     if name is None and color is None:
         cur = get_conn().execute("SELECT id, name, color, created_at FROM tags WHERE id=?", (tag_id,))
@@ -196,6 +599,7 @@ def update_tag(tag_id: int, name: Optional[str] = None, color: Optional[str] = N
     return row
 
 
+@_synchronized
 def delete_tag(tag_id: int) -> None:
     with get_conn():
         get_conn().execute("DELETE FROM tags WHERE id= ?", (tag_id,))
@@ -203,8 +607,11 @@ def delete_tag(tag_id: int) -> None:
 
 # --- Model helpers ---
 
+@_synchronized
 def upsert_model(*, path: str, name: str, type_: str, size_bytes: int,
-                 hash_hex: str, created_at_ms: int, meta_json: Optional[str] = None) -> int:
+                 hash_hex: str, created_at_ms: int, meta_json: Optional[str] = None,
+                 mtime_ns: Optional[int] = None, inode: Optional[int] = None,
+                 ckpt_name: Optional[str] = None, lora_name: Optional[str] = None) -> int:
     # Relaxed: allow any type string (from first-level subdir of models root); upstream should pass 'other' when unknown
     conn = get_conn()
     now = int(time.time() * 1000)
@@ -216,14 +623,17 @@ def upsert_model(*, path: str, name: str, type_: str, size_bytes: int,
         old_type = row["type"] if row else None
         if row:
             conn.execute(
-                "UPDATE models SET name=?, type=?, size_bytes=?, hash_hex=?, meta_json=? WHERE id= ?",
-                (name, type_, size_bytes, hash_hex, meta_json, old_id),
+                "UPDATE models SET name=?, type=?, size_bytes=?, hash_hex=?, meta_json=?, mtime_ns=?, inode=?,"
+                " ckpt_name=?, lora_name=?, missing_since=NULL WHERE id= ?",
+                (name, type_, size_bytes, hash_hex, meta_json, mtime_ns, inode, ckpt_name, lora_name, old_id),
             )
             model_id = old_id
         else:
             cur2 = conn.execute(
-                "INSERT INTO models(path, name, type, size_bytes, hash_hex, created_at, meta_json, extra_json)\n                 VALUES(?,?,?,?,?,?,?,?)",
-                (path, name, type_, size_bytes, hash_hex, created_at_ms, meta_json, None),
+                "INSERT INTO models(path, name, type, size_bytes, hash_hex, created_at, meta_json, extra_json, mtime_ns, inode,"
+                " ckpt_name, lora_name) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)",
+                (path, name, type_, size_bytes, hash_hex, created_at_ms, meta_json, None, mtime_ns, inode,
+                 ckpt_name, lora_name),
             )
             model_id = int(cur2.lastrowid)
             old_type = None
@@ -236,9 +646,86 @@ def upsert_model(*, path: str, name: str, type_: str, size_bytes: int,
                 "DELETE FROM model_tags WHERE model_id= ? AND tag_id IN (SELECT id FROM tags WHERE name= ?)",
                 (model_id, old_type),
             )
+        _fts_refresh(conn, [model_id])
+        _touch([model_id])
     return model_id
 
 
+def _resolve_tag_ids(conn: sqlite3.Connection, names: Iterable[str]) -> Dict[str, int]:
+    """{name: id} for the given tag names, creating missing ones inside the caller's transaction."""
+    wanted = {n.strip().lower() for n in names if n and n.strip()}
+    out: Dict[str, int] = {}
+    if not wanted:
+        return out
+    now = int(time.time() * 1000)
+    conn.executemany("INSERT OR IGNORE INTO tags(name, created_at) VALUES(?,?)", [(n, now) for n in wanted])
+    placeholders = ",".join(["?"] * len(wanted))
+    for r in conn.execute(f"SELECT id, name FROM tags WHERE name IN ({placeholders})", list(wanted)).fetchall():
+        out[r["name"]] = int(r["id"])
+    return out
+
+
+@_synchronized
+def upsert_models_bulk(records: Iterable[Dict[str, Any]], commit_every: int = 500) -> Dict[str, int]:
+    """Bulk form of upsert_model for scans: {path: model_id}.
+
+    Each record carries upsert_model's keyword arguments. Rows are written in
+    transactions of commit_every records; type tags are resolved once per transaction.
+    """
+    recs = list(records)
+    ids: Dict[str, int] = {}
+    conn = get_conn()
+    step = max(1, int(commit_every))
+    for start in range(0, len(recs), step):
+        batch = recs[start:start + step]
+        with conn:
+            type_ids = _resolve_tag_ids(conn, (r["type_"] for r in batch))
+            existing: Dict[str, Tuple[int, str]] = {}
+            for cstart in range(0, len(batch), _IN_CHUNK):
+                paths = [r["path"] for r in batch[cstart:cstart + _IN_CHUNK]]
+                placeholders = ",".join(["?"] * len(paths))
+                for row in conn.execute(f"SELECT id, path, type FROM models WHERE path IN ({placeholders})", paths).fetchall():
+                    existing[row["path"]] = (int(row["id"]), row["type"])
+            updates = []
+            links = []
+            type_changes = []
+            for r in batch:
+                hit = existing.get(r["path"])
+                if hit:
+                    mid, old_type = hit
+                    updates.append((r["name"], r["type_"], r["size_bytes"], r["hash_hex"], r.get("meta_json"),
+                                    r.get("mtime_ns"), r.get("inode"), r.get("ckpt_name"), r.get("lora_name"), mid))
+                    if old_type and old_type != r["type_"]:
+                        type_changes.append((mid, old_type))
+                else:
+                    cur = conn.execute(
+                        "INSERT INTO models(path, name, type, size_bytes, hash_hex, created_at, meta_json, extra_json, mtime_ns, inode,"
+                        " ckpt_name, lora_name) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)",
+                        (r["path"], r["name"], r["type_"], r["size_bytes"], r["hash_hex"], r["created_at_ms"],
+                         r.get("meta_json"), None, r.get("mtime_ns"), r.get("inode"), r.get("ckpt_name"), r.get("lora_name")),
+                    )
+                    mid = int(cur.lastrowid)
+                ids[r["path"]] = mid
+                tid = type_ids.get(r["type_"].strip().lower())
+                if tid is not None:
+                    links.append((mid, tid))
+            conn.executemany(
+                "UPDATE models SET name=?, type=?, size_bytes=?, hash_hex=?, meta_json=?, mtime_ns=?, inode=?,"
+                " ckpt_name=?, lora_name=?, missing_since=NULL WHERE id= ?",
+                updates,
+            )
+            conn.executemany("INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)", links)
+            # Drop the previous type tag where the type changed (other user tags stay)
+            conn.executemany(
+                "DELETE FROM model_tags WHERE model_id= ? AND tag_id IN (SELECT id FROM tags WHERE name= ?)",
+                type_changes,
+            )
+            _fts_refresh(conn, [ids[r["path"]] for r in batch])
+            _touch(ids[r["path"]] for r in batch)
+    return ids
+
+
+@_synchronized
 def set_model_tags(model_id: int, add_names: Iterable[str] = (), remove_names: Iterable[str] = (), ensure_type: Optional[str] = None) -> List[str]:
     conn = get_conn()
     add_ids = [get_or_create_tag_id(n) for n in add_names]
@@ -261,6 +748,8 @@ def set_model_tags(model_id: int, add_names: Iterable[str] = (), remove_names: I
         if ensure_type:
             type_tid = get_or_create_tag_id(ensure_type)
             conn.execute("INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)", (model_id, type_tid))
+        _fts_refresh(conn, [model_id])
+        _touch([model_id])
         # Return tag names
         cur = conn.execute(
             "SELECT t.name FROM model_tags mt JOIN tags t ON mt.tag_id=t.id WHERE mt.model_id= ? ORDER BY t.name",
@@ -269,6 +758,104 @@ def set_model_tags(model_id: int, add_names: Iterable[str] = (), remove_names: I
         return [r["name"] for r in cur.fetchall()]
 
 
+class Fingerprint(NamedTuple):
+    """What a scan needs to decide whether an indexed file changed since it was last seen."""
+    id: int
+    size_bytes: Optional[int]
+    mtime_ns: Optional[int]
+    inode: Optional[int]
+    type: str
+    hash_hex: str
+    ckpt_name: Optional[str] = None
+    lora_name: Optional[str] = None
+    # Set while the row is kept for a file that has gone (see retire_models)
+    missing_since: Optional[int] = None
+
+    def matches(self, st: os.stat_result) -> bool:
+        return (self.size_bytes == st.st_size and self.mtime_ns == st.st_mtime_ns
+                and self.inode == st.st_ino)
+
+
+@_reader
+def load_fingerprints() -> Dict[str, Fingerprint]:
+    """All indexed files keyed by path, loaded in one pass at scan start."""
+    cur = get_conn().execute("SELECT id, path, size_bytes, mtime_ns, inode, type, hash_hex, ckpt_name, lora_name,"
+                             " missing_since FROM models")
+    return {
+        r["path"]: Fingerprint(int(r["id"]), r["size_bytes"], r["mtime_ns"], r["inode"], r["type"], r["hash_hex"] or "",
+                               r["ckpt_name"], r["lora_name"], r["missing_since"])
+        for r in cur.fetchall()
+    }
+
+
+@_reader
+def get_fingerprint(path: str) -> Optional[Fingerprint]:
+    r = get_conn().execute(
+        "SELECT id, size_bytes, mtime_ns, inode, type, hash_hex, ckpt_name, lora_name, missing_since"
+        " FROM models WHERE path= ?", (path,)
+    ).fetchone()
+    if not r:
+        return None
+    return Fingerprint(int(r["id"]), r["size_bytes"], r["mtime_ns"], r["inode"], r["type"], r["hash_hex"] or "",
+                       r["ckpt_name"], r["lora_name"], r["missing_since"])
+
+
+# --- Hash cache ---
+# One row per file identity (st_dev, st_ino). An entry is only valid while size and mtime_ns
+# still match, so a rename or move on the same filesystem reuses the hash, and an edit does not.
+
+HashCacheEntry = Tuple[int, int, int, int, str]  # (dev, ino, size_bytes, mtime_ns, hash_hex)
+
+
+@_reader
+def load_hash_cache() -> Dict[Tuple[int, int], Tuple[int, int, str]]:
+    """{(dev, ino): (size_bytes, mtime_ns, hash_hex)} for a whole scan."""
+    cur = get_conn().execute("SELECT dev, ino, size_bytes, mtime_ns, hash_hex FROM hash_cache")
+    return {(int(r["dev"]), int(r["ino"])): (int(r["size_bytes"]), int(r["mtime_ns"]), r["hash_hex"]) for r in cur.fetchall()}
+
+
+@_reader
+def get_cached_hash(dev: int, ino: int, size_bytes: int, mtime_ns: int) -> Optional[str]:
+    r = get_conn().execute(
+        "SELECT hash_hex FROM hash_cache WHERE dev= ? AND ino= ? AND size_bytes= ? AND mtime_ns= ?",
+        (dev, ino, size_bytes, mtime_ns),
+    ).fetchone()
+    return r["hash_hex"] if r else None
+
+
+def _put_cached_hashes(conn: sqlite3.Connection, entries: Iterable[HashCacheEntry]) -> None:
+    now = int(time.time() * 1000)
+    conn.executemany(
+        "INSERT OR REPLACE INTO hash_cache(dev, ino, size_bytes, mtime_ns, hash_hex, updated_at) VALUES(?,?,?,?,?,?)",
+        [(d, i, sz, mt, h, now) for d, i, sz, mt, h in entries],
+    )
+
+
+@_synchronized
+def put_cached_hashes(entries: Iterable[HashCacheEntry]) -> None:
+    entries = list(entries)
+    if not entries:
+        return
+    conn = get_conn()
+    with conn:
+        _put_cached_hashes(conn, entries)
+
+
+@_synchronized
+def set_hashes(pairs: Iterable[Tuple[str, str]], cache: Iterable[HashCacheEntry] = ()) -> int:
+    """Store computed hashes [(path, hash_hex)] (plus their hash_cache entries) in one transaction."""
+    rows = [(h, p) for p, h in pairs]
+    cache = list(cache)
+    if not rows and not cache:
+        return 0
+    conn = get_conn()
+    with conn:
+        cur = conn.executemany("UPDATE models SET hash_hex= ? WHERE path= ?", rows)
+        _put_cached_hashes(conn, cache)
+    return int(cur.rowcount or 0)
+
+
+@_reader
 def get_model_by_id(model_id: int) -> Optional[Dict[str, Any]]:
     conn = get_conn()
     cur = conn.execute("SELECT * FROM models WHERE id= ?", (model_id,))
@@ -276,12 +863,38 @@ def get_model_by_id(model_id: int) -> Optional[Dict[str, Any]]:
     return row
 
 
+@_reader
 def get_model_by_path(path: str) -> Optional[Dict[str, Any]]:
     conn = get_conn()
     cur = conn.execute("SELECT * FROM models WHERE path= ?", (path,))
     return cur.fetchone()
 
 
+@_reader
+def find_models_by_ckpt_name(ckpt_name: str) -> List[Dict[str, Any]]:
+    """Present models indexed under this ComfyUI ckpt_name (an idx_models_ckpt_name seek), oldest first."""
+    if not ckpt_name:
+        return []
+    cur = get_conn().execute(
+        "SELECT * FROM models WHERE ckpt_name= ? AND missing_since IS NULL ORDER BY id", (ckpt_name,)
+    )
+    return cur.fetchall()
+
+
+@_reader
+def unnamed_checkpoints() -> List[Dict[str, Any]]:
+    """Present checkpoint rows without a stored ckpt_name (indexed before v6 or outside ComfyUI);
+    read through idx_models_type, for callers that resolve the name themselves."""
+    # Types as in utils.is_checkpoint_type; unary + keeps the planner off idx_models_ckpt_name,
+    # where NULL is every non-checkpoint row
+    cur = get_conn().execute(
+        "SELECT * FROM models WHERE type IN ('checkpoint', 'checkpoints') AND +ckpt_name IS NULL"
+        " AND missing_since IS NULL ORDER BY id"
+    )
+    return cur.fetchall()
+
+
+@_reader
 def list_model_tags(model_id: int) -> List[str]:
     cur = get_conn().execute(
         "SELECT t.name FROM model_tags mt JOIN tags t ON mt.tag_id=t.id WHERE mt.model_id= ? ORDER BY t.name",
@@ -290,16 +903,332 @@ def list_model_tags(model_id: int) -> List[str]:
     return [r["name"] for r in cur.fetchall()]
 
 
-def query_models(*, q: Optional[str] = None, type_: Optional[str] = None, dir_path: Optional[str] = None,
-                 tags: Optional[List[str]] = None, tags_mode: Literal['all', 'any'] = 'all',
-                 limit: int = 50, offset: int = 0, sort: str = 'created', order: Literal['asc', 'desc'] = 'desc') -> Tuple[List[Dict[str, Any]], int]:
+# Keep IN (...) lists under SQLITE_MAX_VARIABLE_NUMBER on older sqlite builds (999)
+_IN_CHUNK = 500
+
+
+@_reader
+def list_tags_for_models(model_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Batched list_model_tags: {model_id: [tag names sorted]} for all ids in one pass."""
+    return _tags_for_models(get_conn(), model_ids)
+
+
+def _tags_for_models(conn: sqlite3.Connection, model_ids: Iterable[int]) -> Dict[int, List[str]]:
+    ids = [int(i) for i in model_ids]
+    out: Dict[int, List[str]] = {i: [] for i in ids}
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        placeholders = ",".join(["?"] * len(chunk))
+        cur = conn.execute(
+            f"SELECT mt.model_id AS mid, t.name FROM model_tags mt JOIN tags t ON mt.tag_id=t.id"
+            f" WHERE mt.model_id IN ({placeholders}) ORDER BY t.name",
+            chunk,
+        )
+        for r in cur.fetchall():
+            out[int(r["mid"])].append(r["name"])
+    return out
+
+
+def _tagged_model_ids(conn: sqlite3.Connection, tag_id: int) -> List[int]:
+    return [int(r["model_id"]) for r in conn.execute("SELECT model_id FROM model_tags WHERE tag_id= ?", (tag_id,)).fetchall()]
+
+
+@_synchronized
+def update_model_extra(model_id: int, extra: Dict[str, Any]) -> None:
+    conn = get_conn()
+    with conn:
+        conn.execute("UPDATE models SET extra_json=? WHERE id= ?", (json.dumps(extra, ensure_ascii=False), model_id))
+        _fts_refresh(conn, [model_id])
+
+
+@_reader
+def models_by_hash(hashes: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """{hash_hex: [{id, type, extra_json}]} of indexed models with those content hashes."""
+    wanted = sorted({h for h in hashes if h})
+    out: Dict[str, List[Dict[str, Any]]] = {}
     conn = get_conn()
-    where = []
+    for start in range(0, len(wanted), _IN_CHUNK):
+        chunk = wanted[start:start + _IN_CHUNK]
+        placeholders = ",".join(["?"] * len(chunk))
+        for r in conn.execute(f"SELECT id, hash_hex, type, extra_json FROM models WHERE hash_hex IN ({placeholders})", chunk):
+            out.setdefault(r["hash_hex"], []).append({"id": int(r["id"]), "type": r["type"], "extra_json": r["extra_json"]})
+    return out
+
+
+@_synchronized
+def apply_catalog_updates(updates: Iterable[Tuple[int, Optional[Dict[str, Any]], Iterable[str]]]) -> int:
+    """Bulk import step: for each (model_id, extra or None to keep, tag names to add), in one
+    transaction. Tags are only added, never removed. Returns the number of models touched."""
+    updates = list(updates)
+    if not updates:
+        return 0
+    conn = get_conn()
+    with conn:
+        tag_ids = _resolve_tag_ids(conn, (t for _, _, tags in updates for t in tags))
+        conn.executemany(
+            "UPDATE models SET extra_json=? WHERE id= ?",
+            [(json.dumps(extra, ensure_ascii=False), mid) for mid, extra, _ in updates if extra is not None],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)",
+            [(mid, tag_ids[t.strip().lower()]) for mid, _, tags in updates for t in tags
+             if t and t.strip().lower() in tag_ids],
+        )
+        ids = sorted({mid for mid, _, _ in updates})
+        _fts_refresh(conn, ids)
+        _touch(ids)
+    return len(ids)
+
+
+@_synchronized
+def set_missing_tag_colors(colors: Dict[str, str]) -> None:
+    """Give existing tags the color from colors[name] where they have none yet."""
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            "UPDATE tags SET color=? WHERE name= ? AND (color IS NULL OR color = '')",
+            [(c, n.strip().lower()) for n, c in colors.items() if n and c],
+        )
+
+
+@_synchronized
+def delete_model(model_id: int) -> None:
+    """Remove the model record (and its tag links); the file on disk is left untouched."""
+    conn = get_conn()
+    with conn:
+        conn.execute("DELETE FROM models WHERE id= ?", (model_id,))
+        _fts_refresh(conn, [model_id])
+        _touch([model_id])
+
+
+@_synchronized
+def delete_models(model_ids: Iterable[int]) -> int:
+    """Remove many model records in one transaction; returns the number of rows deleted."""
+    ids = list(model_ids)
+    if not ids:
+        return 0
+    conn = get_conn()
+    with conn:
+        return _delete_model_ids(conn, ids)
+
+
+def _delete_model_ids(conn: sqlite3.Connection, ids: List[int]) -> int:
+    removed = 0
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        ph = ",".join(["?"] * len(chunk))
+        removed += conn.execute(f"DELETE FROM models WHERE id IN ({ph})", chunk).rowcount
+    _fts_refresh(conn, ids)
+    _touch(ids)
+    return removed
+
+
+def _annotated_ids(conn: sqlite3.Connection, ids: List[int]) -> Set[int]:
+    """Those of the given models that carry user data: extra (notes, images, params) or non-type tags."""
+    out: Set[int] = set()
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK]
+        ph = ",".join(["?"] * len(chunk))
+        out.update(int(r["id"]) for r in conn.execute(
+            f"""SELECT m.id FROM models m WHERE m.id IN ({ph}) AND (
+                  (m.extra_json IS NOT NULL AND m.extra_json NOT IN ('', '{{}}', 'null'))
+                  OR EXISTS (SELECT 1 FROM model_tags mt JOIN tags t ON mt.tag_id=t.id
+                             WHERE mt.model_id=m.id AND t.name != lower(m.type)))""",
+            chunk,
+        ))
+    return out
+
+
+@_synchronized
+def retire_models(model_ids: Iterable[int]) -> Tuple[int, List[int]]:
+    """Rows whose files are gone: rows with user tags/extra are marked missing (hidden from listings
+    until a scan finds the file again), the others are deleted.
+
+    Returns (rows newly marked missing, deleted ids); the caller removes the deleted rows' media.
+    """
+    ids = sorted({int(i) for i in model_ids})
+    if not ids:
+        return 0, []
+    conn = get_conn()
+    now = int(time.time() * 1000)
+    marked = 0
+    with conn:
+        annotated = _annotated_ids(conn, ids)
+        keep = sorted(annotated)
+        drop = [i for i in ids if i not in annotated]
+        for start in range(0, len(keep), _IN_CHUNK):
+            chunk = keep[start:start + _IN_CHUNK]
+            ph = ",".join(["?"] * len(chunk))
+            marked += conn.execute(
+                f"UPDATE models SET missing_since= ? WHERE missing_since IS NULL AND id IN ({ph})", [now, *chunk]
+            ).rowcount
+        _touch(keep)
+        if drop:
+            _delete_model_ids(conn, drop)
+    return marked, drop
+
+
+@_synchronized
+def move_models(moves: Iterable[Tuple[int, Dict[str, Any]]]) -> Tuple[int, List[int]]:
+    """Point rows at their files' new locations: [(model id, upsert_model kwargs of the new path)].
+
+    The row keeps its id, so tags, extra and uploaded images (named after the id) follow the
+    file. A row already indexed at the new path (e.g. added by the same scan) is replaced,
+    unless it is itself moved away in the same call (swapped names).
+    Returns (rows moved, ids of the replaced rows).
+    """
+    moves = list(moves)
+    if not moves:
+        return 0, []
+    conn = get_conn()
+    moved = 0
+    dropped: List[int] = []
+    touched: List[int] = []
+    with conn:
+        type_ids = _resolve_tag_ids(conn, (r["type_"] for _, r in moves))
+        # Park every moving row on a placeholder path first, so no row is mistaken for a replaced one
+        # (model paths are absolute, so '<moving>:<id>' never collides with one)
+        conn.executemany("UPDATE models SET path= '<moving>:' || id WHERE id= ?", [(mid,) for mid, _ in moves])
+        for mid, r in moves:
+            row = conn.execute("SELECT type FROM models WHERE id= ?", (mid,)).fetchone()
+            if not row:
+                continue
+            dup = conn.execute("SELECT id FROM models WHERE path= ? AND id != ?", (r["path"], mid)).fetchone()
+            if dup:
+                conn.execute("DELETE FROM models WHERE id= ?", (dup["id"],))
+                dropped.append(int(dup["id"]))
+            # The new location may not be hashed yet; the row's hash still describes the same content
+            conn.execute(
+                "UPDATE models SET path=?, name=?, type=?, size_bytes=?, hash_hex=COALESCE(NULLIF(?, ''), hash_hex),"
+                " meta_json=?, mtime_ns=?, inode=?, ckpt_name=?, lora_name=?, missing_since=NULL WHERE id= ?",
+                (r["path"], r["name"], r["type_"], r["size_bytes"], r["hash_hex"], r.get("meta_json"),
+                 r.get("mtime_ns"), r.get("inode"), r.get("ckpt_name"), r.get("lora_name"), mid),
+            )
+            if row["type"] != r["type_"]:
+                conn.execute(
+                    "DELETE FROM model_tags WHERE model_id= ? AND tag_id IN (SELECT id FROM tags WHERE name= ?)",
+                    (mid, row["type"]),
+                )
+            tid = type_ids.get(r["type_"].strip().lower())
+            if tid is not None:
+                conn.execute("INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)", (mid, tid))
+            touched.append(mid)
+            moved += 1
+        _fts_refresh(conn, touched + dropped)
+        _touch(touched + dropped)
+    return moved, dropped
+
+
+@_reader
+def missing_model_for(rec: Dict[str, Any]) -> Optional[int]:
+    """Id of a row kept as missing whose file rec (upsert_model kwargs) appears to be:
+    same inode, size and mtime (renamed on the same filesystem), or same content hash."""
+    r = get_conn().execute(
+        "SELECT id FROM models WHERE missing_since IS NOT NULL AND path != ?"
+        " AND ((inode= ? AND size_bytes= ? AND mtime_ns= ?) OR (hash_hex != '' AND hash_hex= ?))"
+        " ORDER BY missing_since DESC LIMIT 1",
+        (rec["path"], rec.get("inode"), rec["size_bytes"], rec.get("mtime_ns"), rec.get("hash_hex") or ""),
+    ).fetchone()
+    return int(r["id"]) if r else None
+
+
+@_synchronized
+def retire_models_by_path(paths: Iterable[str] = (), prefixes: Iterable[str] = ()) -> Tuple[int, List[int]]:
+    """retire_models by exact path and/or by directory prefix (e.g. a folder moved out of a root)."""
+    conn = get_conn()
+    ids: List[int] = []
+    plist = list(paths)
+    for start in range(0, len(plist), _IN_CHUNK):
+        chunk = plist[start:start + _IN_CHUNK]
+        ph = ",".join(["?"] * len(chunk))
+        ids.extend(r["id"] for r in conn.execute(f"SELECT id FROM models WHERE path IN ({ph})", chunk))
+    for prefix in prefixes:
+        if not prefix:
+            continue
+        # A range rather than LIKE (paths may contain % and _) or substr() (no index use):
+        # idx_models_path seeks straight to the directory's rows
+        ids.extend(r["id"] for r in conn.execute(
+            "SELECT id FROM models WHERE path >= ? AND path < ?", (prefix, _prefix_end(prefix))))
+    return retire_models(ids)
+
+
+def _prefix_end(prefix: str) -> str:
+    """Smallest string above every string starting with prefix (BINARY collation: code point order)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# sort key -> column (v2: mtime maps to created_at)
+_SORT_COLUMNS = {
+    'created': 'm.created_at',
+    'name': 'm.name',
+    'mtime': 'm.created_at',
+    'size': 'm.size_bytes',
+    'type': 'm.type',
+}
+
+# Totals per (filter, generation): paging through one listing runs its COUNT once
+_TOTALS_MAX = 64
+_totals: "OrderedDict[Tuple[str, Tuple[Any, ...]], Tuple[Tuple[int, int], int]]" = OrderedDict()
+_TOTALS_LOCK = threading.Lock()
+
+
+def generation() -> Tuple[int, int]:
+    """Token that changes whenever the catalog does: (data_version of the probe connection, which
+    moves on every commit by the writer or another process; connection epoch, see close())."""
+    global _probe
+    with _PROBE_LOCK:
+        if _probe is None:
+            _writer_conn()
+            _probe = _open(read_only=True)
+        dv = _probe.execute("PRAGMA data_version").fetchone()["data_version"]
+        return int(dv), _conn_epoch
+
+
+def _encode_cursor(sort: str, order: str, value: Any, model_id: int) -> str:
+    raw = json.dumps([sort, order, value, model_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str, sort: str, order: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        c_sort, c_order, value, model_id = json.loads(raw)
+        model_id = int(model_id)
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    # Sort keys are text or numbers; anything else would only fail later, in the query (500)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError("invalid cursor")
+    if c_sort != sort or c_order != order:
+        raise ValueError("cursor does not match sort/order")
+    return value, model_id
+
+
+def _keyset_where(col: str, desc: bool, value: Any, model_id: int) -> Tuple[str, List[Any]]:
+    """Rows strictly after (value, model_id) in ORDER BY col, m.id (same direction for both).
+    A plain row-value comparison so SQLite can seek the sort index; sort keys are never NULL
+    (the scanner always writes name/size_bytes, created_at/type are NOT NULL)."""
+    return f"({col}, m.id) {'<' if desc else '>'} (?, ?)", [value, model_id]
+
+
+class _ModelsQuery(NamedTuple):
+    page_sql: str  # without LIMIT/OFFSET
+    page_args: List[Any]
+    count_sql: str
+    count_args: List[Any]
+    ranked: bool  # sorted by FTS relevance (rows carry fts_rank)
+    order_col: str
+    sort_key: str
+    order_key: str
+    offset: int
+
+
+def _models_query(q: Optional[str], type_: Optional[str], tags: Optional[List[str]], tags_mode: str,
+                  offset: int, sort: str, order: str, cursor: Optional[str]) -> _ModelsQuery:
+    """SQL of one query_models listing; raises ValueError for a bad cursor."""
+    # Rows kept for files that have gone are not listed (see retire_models)
+    where = ["m.missing_since IS NULL"]
     args: List[Any] = []
-    if q:
-        where.append("(m.name LIKE ? OR m.path LIKE ?)")
-        like = f"%{q}%"
-        args.extend([like, like])
     if type_:
         where.append("m.type= ?")
         args.append(type_)
@@ -321,59 +1250,204 @@ def query_models(*, q: Optional[str] = None, type_: Optional[str] = None, dir_pa
                 where.append(f"EXISTS (SELECT 1 FROM model_tags mt JOIN tags tg ON mt.tag_id=tg.id WHERE mt.model_id=m.id AND tg.name IN ({placeholders}))")
                 args.extend(tags)
 
+    # Free-text search; sort='relevance' joins the bm25 score (the join itself restricts to matches)
+    match = _fts_match_expr(q) if (q and sort == 'relevance') else None
+    page_where, page_args = list(where), list(args)
+    if q:
+        sw, sargs = _search_where(q)
+        where.insert(0, sw)
+        args[0:0] = sargs
+        if match is not None:
+            # weights per column (name, path, tags, notes): name hits first, then tags, then notes
+            base_sql = ("SELECT m.*, f.rank AS fts_rank FROM models m"
+                        " JOIN (SELECT rowid AS fid, bm25(models_fts, 10.0, 1.0, 5.0, 2.0) AS rank"
+                        " FROM models_fts WHERE models_fts MATCH ?) f ON f.fid = m.id")
+            page_args.insert(0, match)
+        else:
+            page_where, page_args = list(where), list(args)
+
+    if match is not None:
+        sort_key, order_key, order_col, desc = 'relevance', 'asc', 'f.rank', False
+    else:
+        sort_key = sort if sort in _SORT_COLUMNS else 'created'
+        order_key = 'asc' if order.lower() == 'asc' else 'desc'
+        order_col, desc = _SORT_COLUMNS[sort_key], order_key == 'desc'
+    if cursor:
+        value, after_id = _decode_cursor(cursor, sort_key, order_key)
+        kw, kargs = _keyset_where(order_col, desc, value, after_id)
+        page_where.append(kw)
+        page_args.extend(kargs)
+        offset = 0
+
+    if page_where:
+        base_sql += " WHERE " + " AND ".join(page_where)
     if where:
-        base_sql += " WHERE " + " AND ".join(where)
         count_sql += " WHERE " + " AND ".join(where)
 
-    # sort mapping (v2: mtime maps to created_at)
-    sort_map = {
-        'created': 'm.created_at',
-        'name': 'm.name',
-        'mtime': 'm.created_at',
-        'size': 'm.size_bytes',
-        'type': 'm.type',
-    }
-    order_col = sort_map.get(sort, 'm.created_at')
-    order_dir = 'ASC' if order.lower() == 'asc' else 'DESC'
+    # id breaks ties so every row has a unique position for the cursor
+    d = 'DESC' if desc else 'ASC'
+    base_sql += f" ORDER BY {order_col} {d}, m.id {d}"
+    return _ModelsQuery(base_sql, page_args, count_sql, args, match is not None, order_col, sort_key, order_key,
+                        max(0, int(offset)))
 
-    base_sql += f" ORDER BY {order_col} {order_dir} LIMIT ? OFFSET ?"
-    args_with_page = list(args) + [int(limit), int(offset)]
 
-    cur = conn.execute(base_sql, tuple(args_with_page))
-    items = list(cur.fetchall())
+def _next_cursor(mq: _ModelsQuery, last: Dict[str, Any]) -> str:
+    key_value = last["fts_rank"] if mq.ranked else last[mq.order_col[2:]]
+    return _encode_cursor(mq.sort_key, mq.order_key, key_value, int(last["id"]))
 
-    cur2 = conn.execute(count_sql, tuple(args))
-    total = int(cur2.fetchone()["c"]) if cur2 else 0
 
-    return items, total
+def _count_models(conn: sqlite3.Connection, mq: _ModelsQuery) -> int:
+    key = (mq.count_sql, tuple(mq.count_args))
+    gen = generation()
+    with _TOTALS_LOCK:
+        hit = _totals.get(key)
+        if hit is not None and hit[0] == gen:
+            _totals.move_to_end(key)
+    if hit is not None and hit[0] == gen:
+        return hit[1]
+    total = int(conn.execute(mq.count_sql, tuple(mq.count_args)).fetchone()["c"])
+    with _TOTALS_LOCK:
+        _totals[key] = (gen, total)
+        while len(_totals) > _TOTALS_MAX:
+            _totals.popitem(last=False)
+    return total
 
 
-# --- New: Tag queries by type and facets ---
-
-def types_with_counts() -> List[Dict[str, Any]]:
-    """Return available model types with counts (no zero-fill)."""
+@_reader
+def query_models(*, q: Optional[str] = None, type_: Optional[str] = None, dir_path: Optional[str] = None,
+                 tags: Optional[List[str]] = None, tags_mode: Literal['all', 'any'] = 'all',
+                 limit: int = 50, offset: int = 0, sort: str = 'created', order: Literal['asc', 'desc'] = 'desc',
+                 with_tags: bool = False, cursor: Optional[str] = None,
+                 with_total: bool = True) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
+    """Return (page rows, total, next_cursor).
+
+    Pass the previous page's next_cursor to continue after it (keyset; offset is ignored then);
+    next_cursor is None on the last page. with_total=False skips the count (total is None);
+    otherwise it is cached until the next write. with_tags=True also fills row["tags"] in one lookup.
+    Raises ValueError for a malformed cursor or one issued for another sort/order.
+    """
     conn = get_conn()
-    cur = conn.execute("SELECT type AS name, COUNT(1) AS cnt FROM models GROUP BY type ORDER BY name ASC")
-    rows = list(cur.fetchall())
-    return [{"name": r["name"], "count": int(r["cnt"]) } for r in rows]
+    mq = _models_query(q, type_, tags, tags_mode, offset, sort, order, cursor)
+    # one extra row tells whether another page exists
+    limit = max(0, int(limit))
+    cur = conn.execute(mq.page_sql + " LIMIT ? OFFSET ?", tuple(mq.page_args + [limit + 1, mq.offset]))
+    items = list(cur.fetchall())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        if items:
+            next_cursor = _next_cursor(mq, items[-1])
+    if mq.ranked:
+        for m in items:
+            m.pop("fts_rank", None)
+    if with_tags and items:
+        tag_map = _tags_for_models(conn, (int(m["id"]) for m in items))
+        for m in items:
+            m["tags"] = tag_map.get(int(m["id"]), [])
+
+    total = _count_models(conn, mq) if with_total else None
+    return items, total, next_cursor
+
+
+class ModelStream:
+    """One query_models page read incrementally (see stream_models).
+
+    Iterating yields the rows (with tags) batch by batch off one cursor, all within a single
+    read transaction, so a long listing sees one snapshot and never holds more than a batch.
+    next_cursor and total are set once iteration has finished. Use it on the thread that
+    created it and close() it if iteration is abandoned.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, mq: _ModelsQuery, limit: Optional[int],
+                 with_tags: bool, with_total: bool, batch: int):
+        self._conn = conn
+        self._mq = mq
+        self._limit = limit
+        self._with_tags = with_tags
+        self._with_total = with_total
+        self._batch = max(1, int(batch))
+        self._open = False
+        self.next_cursor: Optional[str] = None
+        self.total: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        mq = self._mq
+        sql, args = mq.page_sql, list(mq.page_args)
+        if self._limit is not None or mq.offset:
+            # LIMIT -1 is SQLite's "no limit"; one extra row tells whether another page exists
+            sql += " LIMIT ? OFFSET ?"
+            args += [self._limit + 1 if self._limit is not None else -1, mq.offset]
+        self._conn.execute("BEGIN")
+        self._open = True
+        try:
+            cur = self._conn.execute(sql, tuple(args))
+            sent = 0
+            last = None
+            while True:
+                rows = cur.fetchmany(self._batch)
+                if self._limit is not None and sent + len(rows) > self._limit:
+                    rows = rows[:self._limit - sent]
+                    if rows or last is not None:
+                        self.next_cursor = _next_cursor(mq, rows[-1] if rows else last)
+                    cur.close()
+                if not rows:
+                    break
+                if self._with_tags:
+                    tag_map = _tags_for_models(self._conn, (int(m["id"]) for m in rows))
+                for m in rows:
+                    if mq.ranked:
+                        m.pop("fts_rank", None)
+                    if self._with_tags:
+                        m["tags"] = tag_map.get(int(m["id"]), [])
+                    yield m
+                sent += len(rows)
+                last = rows[-1]
+                if self.next_cursor is not None:
+                    break
+            if self._with_total:
+                self.total = _count_models(self._conn, mq)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._open:
+            self._open = False
+            self._conn.commit()
+
+
+def stream_models(*, q: Optional[str] = None, type_: Optional[str] = None,
+                  tags: Optional[List[str]] = None, tags_mode: Literal['all', 'any'] = 'all',
+                  limit: Optional[int] = None, offset: int = 0, sort: str = 'created',
+                  order: Literal['asc', 'desc'] = 'desc', with_tags: bool = False,
+                  cursor: Optional[str] = None, with_total: bool = True, batch: int = _IN_CHUNK) -> ModelStream:
+    """Streaming form of query_models for bulk listings: same filters, sort and cursors, but rows
+    are produced as they come off the cursor. limit=None streams every matching row.
+    Raises ValueError for a bad cursor before anything is read."""
+    _ensure_initialized()
+    mq = _models_query(q, type_, tags, tags_mode, offset, sort, order, cursor)
+    lim = None if limit is None else max(0, int(limit))
+    return ModelStream(_reader_conn(), mq, lim, with_tags, with_total, batch)
 
 
-def _first_level_dir(path: str, roots: List[str]) -> str:
-    apath = os.path.abspath(path)
-    for r in roots:
-        rabs = os.path.abspath(r)
+# --- New: Tag queries by type and facets ---
+
+def _facet_conn() -> sqlite3.Connection:
+    # Notice commits from other processes, but only when the writer is idle (never wait for it)
+    if _WRITE_LOCK.acquire(blocking=False):
         try:
-            common = os.path.commonpath([os.path.normcase(rabs), os.path.normcase(apath)])
-        except Exception:
-            continue
-        if common == os.path.normcase(rabs):
-            rel = os.path.relpath(apath, rabs)
-            parts = [p for p in rel.replace('\\','/').split('/') if p and p not in ('.','..')]
-            if parts:
-                return parts[0].strip().lower()
-    return 'other'
+            _check_external_writes(_writer_conn())
+        finally:
+            _WRITE_LOCK.release()
+    return get_conn()
+
+
+@_reader
+def types_with_counts() -> List[Dict[str, Any]]:
+    """Return available model types with counts (no zero-fill)."""
+    return _facets.types_with_counts(_facet_conn())
 
 
+@_synchronized
 def migrate_types_by_roots(model_roots: List[str]) -> int:
     """Recompute model type by first-level dir under provided roots; update tags accordingly. Return updated count."""
     if not model_roots:
@@ -381,17 +1455,18 @@ def migrate_types_by_roots(model_roots: List[str]) -> int:
     roots = [os.path.abspath(p) for p in model_roots if isinstance(p, str) and os.path.isdir(p)]
     if not roots:
         return 0
+    matcher = RootMatcher(roots)
     conn = get_conn()
     cur = conn.execute("SELECT id, path, type FROM models")
     rows = list(cur.fetchall())
     updated = 0
-    now = int(time.time() * 1000)
+    changed: List[int] = []
     with conn:
         for row in rows:
             mid = int(row['id'])
             old_path = row['path']
             old_type = row['type']
-            new_type = _first_level_dir(old_path, roots)
+            new_type = matcher.infer_type(old_path)
             if new_type != old_type:
                 conn.execute("UPDATE models SET type= ? WHERE id= ?", (new_type, mid))
                 # Update tags: remove old type tag, add new type tag
@@ -399,89 +1474,33 @@ def migrate_types_by_roots(model_roots: List[str]) -> int:
                     conn.execute("DELETE FROM model_tags WHERE model_id= ? AND tag_id IN (SELECT id FROM tags WHERE name= ?)", (mid, old_type))
                 new_type_tid = get_or_create_tag_id(new_type)
                 conn.execute("INSERT OR IGNORE INTO model_tags(model_id, tag_id) VALUES(?,?)", (mid, new_type_tid))
+                changed.append(mid)
                 updated += 1
+        _fts_refresh(conn, changed)
+        _touch(changed)
     return updated
 
 
+@_reader
 def list_tags_by_type(type_: str) -> List[Dict[str, Any]]:
     """List tags used by models of given type, excluding the type tag itself."""
-    conn = get_conn()
-    cur = conn.execute("""
-        SELECT t.id, t.name, t.color, COUNT(DISTINCT mt.model_id) AS count
-        FROM tags t
-        JOIN model_tags mt ON t.id = mt.tag_id
-        JOIN models m ON mt.model_id = m.id
-        WHERE m.type = ? AND t.name != ?
-        GROUP BY t.id, t.name, t.color
-        ORDER BY count DESC, t.name ASC
-    """, (type_, type_))
-    return [{"id": r["id"], "name": r["name"], "color": r["color"], "count": r["count"]} for r in cur.fetchall()]
+    return _facets.tags_by_type(_facet_conn(), type_)
 
 
+@_reader
 def tag_facets(*, type_: Optional[str] = None, q: Optional[str] = None,
                selected: Optional[List[str]] = None, mode: Literal['all', 'any'] = 'all') -> List[Dict[str, Any]]:
-    """Return tag facets for current filter."""
-    conn = get_conn()
-
-    # Build base WHERE
-    base_where = []
-    args = []
-
-    if type_:
-        base_where.append("m.type = ?")
-        args.append(type_)
-
+    """Return tag facets for current filter (bitmap intersections; only q still reads the tables)."""
+    conn = _facet_conn()
+    matches = None
     if q:
-        base_where.append("(m.name LIKE ? OR m.path LIKE ?)")
-        like = f"%{q}%"
-        args.extend([like, like])
-
-    # Apply already selected tags
-    if selected:
-        selected = [t.strip().lower() for t in selected if t and t.strip()]
-        if selected:
-            if mode == 'all':
-                # All selected tags must be present
-                for i, tag in enumerate(selected):
-                    alias = f"mt_sel_{i}"
-                    base_where.append(f"""
-                        EXISTS (
-                            SELECT 1 FROM model_tags {alias} 
-                            JOIN tags t_sel_{i} ON {alias}.tag_id = t_sel_{i}.id 
-                            WHERE {alias}.model_id = m.id AND t_sel_{i}.name = ?
-                        )
-                    """)
-                    args.append(tag)
-            else:
-                # At least one of the selected tags must be present
-                placeholders = ",".join(["?"] * len(selected))
-                base_where.append(f"""
-                    EXISTS (
-                        SELECT 1 FROM model_tags mt_sel 
-                        JOIN tags t_sel ON mt_sel.tag_id = t_sel.id 
-                        WHERE mt_sel.model_id = m.id AND t_sel.name IN ({placeholders})
-                    )
-                """)
-                args.extend(selected)
-
-    where_clause = " AND ".join(base_where) if base_where else "1=1"
-
-    # Query tag counts
-    sql = f"""
-        SELECT t.id, t.name, t.color, COUNT(DISTINCT m.id) AS count
-        FROM tags t
-        JOIN model_tags mt ON t.id = mt.tag_id
-        JOIN models m ON mt.model_id = m.id
-        WHERE {where_clause}
-        GROUP BY t.id, t.name, t.color
-        HAVING count > 0
-        ORDER BY count DESC, t.name ASC
-    """
-
-    cur = conn.execute(sql, args)
-    return [{"id": r["id"], "name": r["name"], "color": r["color"], "count": r["count"]} for r in cur.fetchall()]
+        sw, sargs = _search_where(q)
+        matches = [int(r["id"]) for r in conn.execute(f"SELECT m.id FROM models m WHERE {sw}", sargs)]
+    selected = [t.strip().lower() for t in (selected or []) if t and t.strip()]
+    return _facets.tag_facets(conn, type_, selected, mode, matches)
 
 
+@_reader
 def list_tags() -> List[Dict[str, Any]]:
     """List all tags with their usage counts."""
     conn = get_conn()
@@ -496,6 +1515,7 @@ def list_tags() -> List[Dict[str, Any]]:
              "created_at": r["created_at"], "count": r["count"]} for r in cur.fetchall()]
 
 
+@_synchronized
 def create_tag(name: str, color: Optional[str] = None) -> Dict[str, Any]:
     """Create a new tag."""
     name = name.strip().lower()
@@ -524,6 +1544,7 @@ def create_tag(name: str, color: Optional[str] = None) -> Dict[str, Any]:
         return dict(cur.fetchone())
 
 
+@_synchronized
 def update_tag(tag_id: int, name: Optional[str] = None, color: Optional[str] = None) -> Dict[str, Any]:
     """Update an existing tag."""
     conn = get_conn()
@@ -554,12 +1575,16 @@ def update_tag(tag_id: int, name: Optional[str] = None, color: Optional[str] = N
             sql = f"UPDATE tags SET {', '.join(updates)} WHERE id = ?"
             args.append(tag_id)
             conn.execute(sql, args)
+            if name is not None and name != existing["name"]:
+                _fts_refresh(conn, _tagged_model_ids(conn, tag_id))
+            _invalidate_facets()
 
         # Return updated tag
         cur = conn.execute("SELECT * FROM tags WHERE id = ?", (tag_id,))
         return dict(cur.fetchone())
 
 
+@_synchronized
 def delete_tag(tag_id: int) -> None:
     """Delete a tag and all its associations."""
     conn = get_conn()
@@ -577,5 +1602,8 @@ def delete_tag(tag_id: int) -> None:
             raise ValueError(f"Cannot delete system tag '{tag_name}'")
 
         # Delete relations and the tag itself
+        affected = _tagged_model_ids(conn, tag_id)
         conn.execute("DELETE FROM model_tags WHERE tag_id = ?", (tag_id,))
         conn.execute("DELETE FROM tags WHERE id = ?", (tag_id,))
+        _fts_refresh(conn, affected)
+        _invalidate_facets()
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""Resident facet index: model-id bitmaps per type and per tag.
+
+Bitmaps are Python ints (bit i = model id i), so intersections, unions and
+counts run in C over machine words. db.py owns the single FacetIndex and keeps
+it current: small writes touch() the affected model ids, which are re-read in
+one batch before the next facet query; bulk or tag-level writes invalidate()
+and the next query rebuilds from the tables. db.py publishes those calls while
+holding commit_guard() across the commit. A query reads the tables without that
+lock and swaps its result in only if no write was published while it read, so
+it never keeps committed rows without the touches that go with them, and a
+rebuild never blocks a commit.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    _popcount = int.bit_count  # type: ignore[attr-defined]
+except AttributeError:  # Python < 3.10
+    def _popcount(x: int) -> int:
+        return bin(x).count("1")
+
+# Touching more ids than this between queries is cheaper to answer with a rebuild
+_MAX_TOUCHED = 5000
+
+
+def bitmap(ids: Iterable[int]) -> int:
+    """Build a bitmap in O(n) (OR-ing 1 << i per id would copy the int every time)."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _group(rows: Iterable[Tuple[Any, int]]) -> Dict[Any, List[int]]:
+    out: Dict[Any, List[int]] = {}
+    for key, mid in rows:
+        out.setdefault(key, []).append(mid)
+    return out
+
+
+class _Maps:
+    """One consistent set of bitmaps; replaced as a whole, never changed in place."""
+    __slots__ = ("all", "types", "tags", "tag_info", "tag_ids")
+
+    def __init__(self, types: Dict[str, int], tags: Dict[int, int],
+                 tag_info: Dict[int, Tuple[str, Optional[str]]]) -> None:
+        self.types = types
+        self.tags = tags
+        self.tag_info = tag_info
+        self.tag_ids = {name: tid for tid, (name, _) in tag_info.items()}
+        self.all = 0
+        for bm in types.values():
+            self.all |= bm
+
+
+# Refresh attempts built outside the lock before one is built under it (so writers cannot starve it)
+_UNLOCKED_ATTEMPTS = 3
+
+
+class FacetIndex:
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._maps = _Maps({}, {}, {})
+        self._stale = True
+        self._touched: Set[int] = set()
+        # Bumped by every touch()/invalidate(); a refresh built from older tables is not swapped in
+        self._epoch = 0
+
+    # --- maintenance (called by db write paths) ---
+    def touch(self, model_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._epoch += 1
+            if self._stale:
+                return
+            self._touched.update(int(i) for i in model_ids)
+            if len(self._touched) > _MAX_TOUCHED:
+                self._stale = True
+                self._touched.clear()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._stale = True
+            self._touched.clear()
+
+    def commit_guard(self) -> threading.RLock:
+        """Lock to hold while committing a write and publishing its touch()/invalidate()."""
+        return self._lock
+
+    def _refresh(self, conn: sqlite3.Connection) -> _Maps:
+        """Current maps, rebuilt first if writes landed since the last refresh.
+
+        The tables are read outside the lock so writers (which take it in commit_guard()) are not
+        held up by a rebuild; the result is swapped in only if no write was published meanwhile.
+        """
+        for attempt in range(_UNLOCKED_ATTEMPTS + 1):
+            with self._lock:
+                if not self._stale and not self._touched:
+                    return self._maps
+                stale, touched, epoch, maps = self._stale, list(self._touched), self._epoch, self._maps
+                if attempt == _UNLOCKED_ATTEMPTS:
+                    # Writes kept landing: build under the lock this time
+                    return self._swap(self._rebuild(conn) if stale else self._apply(conn, maps, touched))
+            fresh = self._rebuild(conn) if stale else self._apply(conn, maps, touched)
+            with self._lock:
+                if self._epoch == epoch:
+                    return self._swap(fresh)
+        raise AssertionError("unreachable")
+
+    def _swap(self, maps: _Maps) -> _Maps:
+        # Caller holds self._lock
+        self._maps = maps
+        self._stale = False
+        self._touched.clear()
+        return maps
+
+    @staticmethod
+    def _load_tag_info(conn: sqlite3.Connection) -> Dict[int, Tuple[str, Optional[str]]]:
+        rows = conn.execute("SELECT id, name, color FROM tags").fetchall()
+        return {int(r["id"]): (r["name"], r["color"]) for r in rows}
+
+    def _rebuild(self, conn: sqlite3.Connection) -> _Maps:
+        # Rows kept for gone files (models.missing_since) are in no type, so no count includes them
+        types = _group((r["type"], int(r["id"]))
+                       for r in conn.execute("SELECT id, type FROM models WHERE missing_since IS NULL"))
+        tags = _group((int(r["tag_id"]), int(r["model_id"]))
+                      for r in conn.execute("SELECT model_id, tag_id FROM model_tags"))
+        return _Maps({t: bitmap(ids) for t, ids in types.items()},
+                     {t: bitmap(ids) for t, ids in tags.items()},
+                     self._load_tag_info(conn))
+
+    def _apply(self, conn: sqlite3.Connection, maps: _Maps, ids: List[int]) -> _Maps:
+        # Clear every touched bit once, then OR back whatever the tables say now (deleted ids stay clear)
+        keep = ~bitmap(ids)
+        new_types = {k: bm & keep for k, bm in maps.types.items()}
+        new_tags = {k: bm & keep for k, bm in maps.tags.items()}
+        types: Dict[str, List[int]] = {}
+        tags: Dict[int, List[int]] = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            ph = ",".join(["?"] * len(chunk))
+            for r in conn.execute(f"SELECT id, type FROM models WHERE id IN ({ph}) AND missing_since IS NULL", chunk):
+                types.setdefault(r["type"], []).append(int(r["id"]))
+            for r in conn.execute(f"SELECT model_id, tag_id FROM model_tags WHERE model_id IN ({ph})", chunk):
+                tags.setdefault(int(r["tag_id"]), []).append(int(r["model_id"]))
+        for t, tids in types.items():
+            new_types[t] = new_types.get(t, 0) | bitmap(tids)
+        for t, mids in tags.items():
+            new_tags[t] = new_tags.get(t, 0) | bitmap(mids)
+        return _Maps({k: bm for k, bm in new_types.items() if bm},
+                     {k: bm for k, bm in new_tags.items() if bm},
+                     self._load_tag_info(conn))
+
+    # --- queries (each counts over one immutable _Maps, so no lock is held while counting) ---
+    @staticmethod
+    def _counts(maps: _Maps, base: int, exclude: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = []
+        for tid, bm in maps.tags.items():
+            c = _popcount(bm & base)
+            if not c:
+                continue
+            name, color = maps.tag_info.get(tid, (None, None))
+            if name is None or name == exclude:
+                continue
+            out.append({"id": tid, "name": name, "color": color, "count": c})
+        out.sort(key=lambda r: (-r["count"], r["name"]))
+        return out
+
+    def types_with_counts(self, conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        maps = self._refresh(conn)
+        return [{"name": t, "count": _popcount(bm)} for t, bm in sorted(maps.types.items())]
+
+    def tags_by_type(self, conn: sqlite3.Connection, type_: str) -> List[Dict[str, Any]]:
+        maps = self._refresh(conn)
+        return self._counts(maps, maps.types.get(type_, 0), exclude=type_)
+
+    def tag_facets(self, conn: sqlite3.Connection, type_: Optional[str], selected: List[str], mode: str,
+                   matches: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Tag counts over the models matching type, search hits (ids) and selected tags."""
+        hits = bitmap(matches) if matches is not None else None
+        maps = self._refresh(conn)
+        base = maps.types.get(type_, 0) if type_ else maps.all
+        if hits is not None:
+            base &= hits
+        if selected:
+            sel = [maps.tags.get(maps.tag_ids.get(name, -1), 0) for name in selected]
+            if mode == 'all':
+                for bm in sel:
+                    base &= bm
+            else:
+                any_bm = 0
+                for bm in sel:
+                    any_bm |= bm
+                base &= any_bm
+        return self._counts(maps, base)
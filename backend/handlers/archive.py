@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+from .. import archive
+from ..utils import json_dumps_bytes
+
+
+def _media_param(raw_query: str) -> bool:
+    return parse_qs(raw_query or "").get("media", ["1"])[0] not in ("0", "false")
+
+
+class _BodyReader:
+    """The request body as a file object that stops at Content-Length (tarfile reads ahead)."""
+
+    def __init__(self, rfile, length: int):
+        self._rfile = rfile
+        self.remaining = length
+
+    def read(self, n: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        n = self.remaining if n is None or n < 0 else min(n, self.remaining)
+        data = self._rfile.read(n)
+        self.remaining -= len(data)
+        if not data:
+            self.remaining = 0
+        return data
+
+
+def export(handler: BaseHTTPRequestHandler, raw_query: str) -> None:
+    """GET /export[?media=0]: the catalog archive (see archive.py), streamed as it is written."""
+    name = time.strftime("hikaze_mm_catalog_%Y%m%d_%H%M%S.tar")
+    handler._set_headers(200, "application/x-tar", headers={  # type: ignore[attr-defined]
+        "Content-Disposition": f'attachment; filename="{name}"',
+    })
+    # No Content-Length: the body ends when the connection closes
+    handler.close_connection = True  # type: ignore[attr-defined]
+    archive.export_archive(handler.wfile, media=_media_param(raw_query))
+
+
+def import_(handler: BaseHTTPRequestHandler, raw_query: str) -> None:
+    """POST /import[?media=0] with an archive from /export as the body; applies it by hash_hex."""
+    try:
+        length = int(handler.headers.get("Content-Length", "0"))  # type: ignore[attr-defined]
+    except Exception:
+        length = 0
+    if length <= 0:
+        handler._set_headers(400)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": "empty body"}}))
+        return
+    body = _BodyReader(handler.rfile, length)
+    try:
+        counts = archive.import_archive(body, media=_media_param(raw_query))
+    except ValueError as e:
+        handler._set_headers(400)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": str(e)}}))
+        return
+    except OSError as e:
+        handler._set_headers(500)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "WRITE_ERROR", "message": str(e)}}))
+        return
+    finally:
+        # Whatever the archive reader left unread would be parsed as the next request
+        if body.remaining > 0:
+            handler.close_connection = True  # type: ignore[attr-defined]
+    handler._set_headers(200)  # type: ignore[attr-defined]
+    handler.wfile.write(json_dumps_bytes(counts))
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Conditional GET + response cache for read endpoints.
+
+Responses are keyed by (path, query) within one catalog generation (db.generation(),
+which moves on every write, plus roots.names_version(), which moves when ComfyUI's
+folders do: rows indexed without ckpt_name/lora_name get them from the live folder
+list at render time), so nothing is ever invalidated explicitly: the first
+request after a write misses, everything before it can be answered from memory or,
+when the client already holds the current ETag, with a bodyless 304.
+"""
+from __future__ import annotations
+
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from typing import Callable, Optional, Tuple
+
+from .. import db, roots
+
+# GET endpoints whose body is a pure function of (path, query, catalog contents)
+CACHEABLE_PATHS = {"/types", "/tags", "/tags/by-type", "/tags/facets", "/models", "/models/lookup"}
+_CACHEABLE_RE = re.compile(r"^/models/\d+(/extra|/params)?$")
+
+_MAX_ENTRIES = 512
+_MAX_BYTES = 32 * 1024 * 1024
+
+# Generations restart with the process; the epoch keeps an old ETag from matching new data
+_EPOCH = f"{int(time.time() * 1000):x}-{os.getpid():x}"
+
+Entry = Tuple[int, str, bytes]  # (status, content type, body)
+Generation = Tuple[int, ...]
+
+
+def is_cacheable(path: str) -> bool:
+    return path in CACHEABLE_PATHS or bool(_CACHEABLE_RE.match(path))
+
+
+class ResponseCache:
+    """LRU of rendered responses for the current generation, bounded by count and bytes."""
+
+    def __init__(self, max_entries: int = _MAX_ENTRIES, max_bytes: int = _MAX_BYTES):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[Tuple[str, str], Entry]" = OrderedDict()
+        self._bytes = 0
+        self._gen: Optional[Generation] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def _sync(self, gen: Generation) -> None:
+        # Entries of an older generation can never be served again
+        if gen != self._gen:
+            self._items.clear()
+            self._bytes = 0
+            self._gen = gen
+
+    def get(self, gen: Generation, key: Tuple[str, str]) -> Optional[Entry]:
+        with self._lock:
+            self._sync(gen)
+            hit = self._items.get(key)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return hit
+
+    def put(self, gen: Generation, key: Tuple[str, str], entry: Entry) -> None:
+        size = len(entry[2])
+        if size > self._max_bytes // 4:
+            return
+        with self._lock:
+            self._sync(gen)
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+            self._items[key] = entry
+            self._bytes += size
+            while self._items and (len(self._items) > self._max_entries or self._bytes > self._max_bytes):
+                _, ev = self._items.popitem(last=False)
+                self._bytes -= len(ev[2])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits,
+                    "misses": self.misses, "not_modified": self.not_modified}
+
+
+_cache = ResponseCache()
+
+
+def stats() -> dict:
+    return _cache.stats()
+
+
+def _generation() -> Generation:
+    return (*db.generation(), roots.names_version())
+
+
+def _etag(gen: Generation) -> str:
+    return '"' + "-".join([_EPOCH] + [str(g) for g in gen]) + '"'
+
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison, as If-None-Match requires
+    return any(t.strip().removeprefix("W/") == etag for t in header.split(","))
+
+
+def serve(handler: BaseHTTPRequestHandler, path: str, query: str, render: Callable[[], None]) -> None:
+    """Answer a cacheable GET: 304 on a current ETag, else a cached or freshly rendered 200.
+
+    render() is the endpoint's normal handler; its output is captured (see ApiHandler._set_headers).
+    """
+    gen = _generation()
+    etag = _etag(gen)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(handler.headers.get("If-None-Match"), etag):
+        with _cache._lock:
+            _cache.not_modified += 1
+        handler._set_headers(304, headers=headers)  # type: ignore[attr-defined]
+        return
+    key = (path, query)
+    entry = _cache.get(gen, key)
+    if entry is None:
+        out, real = io.BytesIO(), handler.wfile
+        handler._capture = {}  # type: ignore[attr-defined]
+        handler.wfile = out
+        try:
+            render()
+        finally:
+            captured = handler._capture  # type: ignore[attr-defined]
+            handler._capture = None  # type: ignore[attr-defined]
+            handler.wfile = real
+        entry = (captured.get("code", 200), captured.get("content_type", "application/json; charset=utf-8"),
+                 out.getvalue())
+        if entry[0] != 200:
+            handler._set_headers(entry[0], entry[1])  # type: ignore[attr-defined]
+            handler.wfile.write(entry[2])
+            return
+        # Only store what was rendered against this generation (a write may have landed meanwhile)
+        if _generation() == gen:
+            _cache.put(gen, key, entry)
+        else:
+            headers = {"Cache-Control": "no-store"}
+    code, ctype, body = entry
+    handler._set_headers(code, ctype, headers=headers)  # type: ignore[attr-defined]
+    handler.wfile.write(body)
@@ -9,7 +9,8 @@ from http.server import BaseHTTPRequestHandler
 from typing import Iterable, List, Literal, Optional
 from urllib.parse import parse_qs
 
-from .. import db
+from .. import api, db, thumbs
+from ..config import DEFAULT_MAX_UPLOAD_MB
 from ..paths import MEDIA_DIR
 from ..utils import (
     json_dumps_bytes,
@@ -18,6 +19,16 @@ from ..utils import (
     is_checkpoint_type,
 )
 
+# Request bodies are copied to disk in pieces of this size rather than read whole
+_UPLOAD_CHUNK = 1024 * 1024
+# Streamed /models bodies go to the socket whenever this much has been encoded
+_STREAM_FLUSH = 64 * 1024
+
+
+def is_stream(raw_query: str) -> bool:
+    """GET /models?stream=1: body written while rows are read (not cached, see list_models)."""
+    return parse_qs(raw_query or "").get("stream", ["0"])[0] not in ("0", "false", "")
+
 
 def types_with_counts(handler: BaseHTTPRequestHandler) -> None:
     handler._set_headers(200)  # type: ignore[attr-defined]
@@ -36,49 +47,63 @@ def list_models(handler: BaseHTTPRequestHandler, raw_query: str) -> None:
     tags_mode_vals = qs.get("tags_mode", ["all"]) or ["all"]
     tags_mode_str = str(tags_mode_vals[0]).lower()
     tm: Literal['all', 'any'] = 'any' if tags_mode_str == 'any' else 'all'
-    limit = int(qs.get("limit", ["50"])[0])
+    stream = is_stream(raw_query)
+    # A stream without a limit returns every matching row
+    limit_raw = qs.get("limit", [None if stream else "50"])[0]
+    limit = int(limit_raw) if limit_raw is not None else None
     offset = int(qs.get("offset", ["0"])[0])
-    sort = qs.get("sort", ["created"])[0]
+    # Searches default to relevance ranking; plain listings to newest first
+    sort = qs.get("sort", [None])[0] or ("relevance" if q else "created")
     order_str = qs.get("order", ["desc"])[0]
     ordv: Literal['asc', 'desc'] = 'asc' if order_str == 'asc' else 'desc'
 
-    items, total = db.query_models(
-        q=q, type_=type_, dir_path=None, tags=tags_list or None, tags_mode=tm, limit=limit, offset=offset, sort=sort, order=ordv
-    )
-    out = []
-    for m in items:
-        try:
-            meta = json.loads(m.get("meta_json") or "null")
-        except Exception:
-            meta = None
-        try:
-            extra = json.loads(m.get("extra_json") or "null")
-        except Exception:
-            extra = None
-        tags = db.list_model_tags(int(m["id"]))
-        ckpt_name = None
-        lora_name = None
-        if is_checkpoint_type(m.get("type")):
-            ckpt_name = calc_ckpt_name(m.get("path") or "")
-        if (m.get("type") or "").strip().lower() in ("lora", "loras"):
-            lora_name = calc_rel_in_domain(m.get("path") or "", "loras")
-        out.append({
-            "id": m["id"],
-            "path": m["path"],
-            "name": m.get("name"),
-            "type": m.get("type"),
-            "size_bytes": m.get("size_bytes"),
-            "hash_hex": m.get("hash_hex"),
-            "created_at": m.get("created_at"),
-            "tags": tags,
-            "meta": meta,
-            "extra": extra,
-            "images": (extra or {}).get("images") if isinstance(extra, dict) else None,
-            "ckpt_name": ckpt_name,
-            "lora_name": lora_name,
-        })
+    # Keyset paging: pass back next_cursor from the previous page instead of offset
+    cursor = qs.get("cursor", [None])[0] or None
+    with_total = qs.get("count", ["1"])[0] not in ("0", "false")
+
+    try:
+        if stream:
+            rows = db.stream_models(
+                q=q, type_=type_, tags=tags_list or None, tags_mode=tm, limit=limit, offset=offset, sort=sort, order=ordv,
+                with_tags=True, cursor=cursor, with_total=with_total,
+            )
+        else:
+            items, total, next_cursor = db.query_models(
+                q=q, type_=type_, dir_path=None, tags=tags_list or None, tags_mode=tm, limit=limit, offset=offset, sort=sort, order=ordv,
+                with_tags=True, cursor=cursor, with_total=with_total,
+            )
+    except ValueError as e:
+        handler._set_headers(400)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": str(e)}}))
+        return
+    if stream:
+        _write_stream(handler, rows)
+        return
+    out = [api.list_item(m) for m in items]
+    handler._set_headers(200)  # type: ignore[attr-defined]
+    handler.wfile.write(json_dumps_bytes({"items": out, "total": total, "next_cursor": next_cursor}))
+
+
+def _write_stream(handler: BaseHTTPRequestHandler, rows: "db.ModelStream") -> None:
+    """Same JSON document as the buffered listing, encoded and sent a few rows at a time."""
     handler._set_headers(200)  # type: ignore[attr-defined]
-    handler.wfile.write(json_dumps_bytes({"items": out, "total": total}))
+    # No Content-Length: the body ends when the connection closes
+    handler.close_connection = True  # type: ignore[attr-defined]
+    buf = bytearray(b'{"items":[')
+    sep = b""
+    try:
+        for m in rows:
+            buf += sep
+            buf += json_dumps_bytes(api.list_item(m))
+            sep = b","
+            if len(buf) >= _STREAM_FLUSH:
+                handler.wfile.write(buf)
+                buf.clear()
+        buf += b'],"total":' + json_dumps_bytes(rows.total)
+        buf += b',"next_cursor":' + json_dumps_bytes(rows.next_cursor) + b"}"
+        handler.wfile.write(buf)
+    finally:
+        rows.close()
 
 
 def get_model(handler: BaseHTTPRequestHandler, mid: int) -> None:
@@ -98,9 +123,9 @@ def get_model(handler: BaseHTTPRequestHandler, mid: int) -> None:
     tags = db.list_model_tags(mid)
     out = {**model, "tags": tags, "meta": meta, "extra": extra}
     try:
-        if is_checkpoint_type(out.get("type")):
+        if out.get("ckpt_name") is None and is_checkpoint_type(out.get("type")):
             out["ckpt_name"] = calc_ckpt_name(out.get("path") or "")
-        if (out.get("type") or "").strip().lower() in ("lora", "loras"):
+        if out.get("lora_name") is None and (out.get("type") or "").strip().lower() in ("lora", "loras"):
             out["lora_name"] = calc_rel_in_domain(out.get("path") or "", "loras")
     except Exception:
         pass
@@ -125,36 +150,42 @@ def get_extra(handler: BaseHTTPRequestHandler, mid: int) -> None:
 
 
 def get_params(handler: BaseHTTPRequestHandler, mid: int) -> None:
-    model = db.get_model_by_id(mid)
-    if not model:
+    params = api.model_params(mid)
+    if params is None:
         handler._set_headers(404)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "model not found"}}))
         return
-    try:
-        meta = json.loads(model.get("meta_json") or "{}")
-    except Exception:
-        meta = {}
-    try:
-        extra = json.loads(model.get("extra_json") or "{}")
-    except Exception:
-        extra = {}
-    params = {}
-    if isinstance(extra, dict):
-        if "params" in extra and isinstance(extra["params"], dict):
-            params.update(extra["params"])  # prefer user-extended params
-        if "prompts" in extra and isinstance(extra["prompts"], dict):
-            params.update(extra["prompts"])  # include prompt/negative
-    if isinstance(meta, dict) and "params" in meta and isinstance(meta["params"], dict):
-        for k, v in meta["params"].items():
-            params.setdefault(k, v)
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes(params))
 
 
+def lookup(handler: BaseHTTPRequestHandler, raw_query: str) -> None:
+    """Exact single-model lookup by absolute path or ComfyUI ckpt_name, with merged params included.
+
+    Lets the loader nodes resolve their selection in one request (an index seek on path or
+    ckpt_name) instead of a fuzzy search followed by a /params round trip.
+    """
+    qs = parse_qs(raw_query or "")
+    path = qs.get("path", [None])[0]
+    ckpt_name = qs.get("ckpt_name", [None])[0]
+    if not path and not ckpt_name:
+        handler._set_headers(400)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": "path or ckpt_name required"}}))
+        return
+    item = api.lookup_model(path=path, ckpt_name=ckpt_name)
+    if not item:
+        handler._set_headers(404)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "model not found"}}))
+        return
+    handler._set_headers(200)  # type: ignore[attr-defined]
+    handler.wfile.write(json_dumps_bytes(item))
+
+
 def refresh(handler: BaseHTTPRequestHandler, scanner, data: dict) -> None:
     mid = data.get("id")
     mpath = data.get("path")
     compute_hash = bool(data.get("compute_hash", False))
+    rehash = bool(data.get("rehash", False))
     if mid is not None and not mpath:
         m = db.get_model_by_id(int(mid))
         if not m:
@@ -166,7 +197,7 @@ def refresh(handler: BaseHTTPRequestHandler, scanner, data: dict) -> None:
         handler._set_headers(400)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": "id or path required"}}))
         return
-    ok = scanner.refresh_one(mpath, compute_hash=compute_hash) if scanner else False
+    ok = scanner.refresh_one(mpath, compute_hash=compute_hash, rehash=rehash) if scanner else False
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes({"refreshed": bool(ok)}))
 
@@ -203,13 +234,32 @@ def update_extra(handler: BaseHTTPRequestHandler, mid: int, data: dict) -> None:
     if not isinstance(current, dict) or not isinstance(data, dict):
         current = {}
     current.update(data)
-    with db.get_conn():
-        db.get_conn().execute("UPDATE models SET extra_json=? WHERE id= ?", (json.dumps(current, ensure_ascii=False), mid))
+    db.update_model_extra(mid, current)
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes(current))
 
 
-def upload_image(handler: BaseHTTPRequestHandler, mid: int) -> None:
+def _read_body_to(handler: BaseHTTPRequestHandler, length: int, path: str) -> bool:
+    """Copy exactly `length` request-body bytes to `path` in fixed-size chunks; False if the client hung up early."""
+    remaining = length
+    with open(path, "wb") as f:
+        while remaining > 0:
+            chunk = handler.rfile.read(min(_UPLOAD_CHUNK, remaining))  # type: ignore[attr-defined]
+            if not chunk:
+                return False
+            f.write(chunk)
+            remaining -= len(chunk)
+    return True
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def upload_image(handler: BaseHTTPRequestHandler, mid: int, max_bytes: Optional[int] = None) -> None:
     model = db.get_model_by_id(mid)
     if not model:
         handler._set_headers(404)  # type: ignore[attr-defined]
@@ -223,7 +273,15 @@ def upload_image(handler: BaseHTTPRequestHandler, mid: int) -> None:
         handler._set_headers(400)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": "empty body"}}))
         return
-    raw = handler.rfile.read(length)  # type: ignore[attr-defined]
+    if max_bytes is None:
+        max_bytes = DEFAULT_MAX_UPLOAD_MB * 1024 * 1024
+    if length > max_bytes:
+        # The body is left unread, so the connection cannot be reused
+        handler.close_connection = True  # type: ignore[attr-defined]
+        handler._set_headers(413)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "PAYLOAD_TOO_LARGE",
+                                                        "message": f"image exceeds {max_bytes // (1024 * 1024)} MB"}}))
+        return
     orig_name = handler.headers.get("X-Filename") or "upload.bin"  # type: ignore[attr-defined]
     base = os.path.basename(orig_name)
     safe = re.sub(r"[^A-Za-z0-9._-]", "_", base)
@@ -234,13 +292,25 @@ def upload_image(handler: BaseHTTPRequestHandler, mid: int) -> None:
         pass
     out_name = f"model_{mid}_{ts}_{safe}"
     out_path = os.path.join(MEDIA_DIR, out_name)
+    # Stream into a hidden temp file and rename it into place, so readers never see a partial image
+    tmp_path = os.path.join(MEDIA_DIR, f".{out_name}.part")
     try:
-        with open(out_path, "wb") as f:
-            f.write(raw)
+        complete = _read_body_to(handler, length, tmp_path)
+        if complete:
+            os.replace(tmp_path, out_path)
     except Exception as e:
+        _discard(tmp_path)
         handler._set_headers(500)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"error": {"code": "WRITE_ERROR", "message": str(e)}}))
         return
+    if not complete:
+        _discard(tmp_path)
+        handler.close_connection = True  # type: ignore[attr-defined]
+        handler._set_headers(400)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "VALIDATION_ERROR", "message": "incomplete body"}}))
+        return
+    # Pre-render the grid-size variant so the first card render does not wait for it
+    thumbs.warm(out_path)
     image_url = f"/media/{out_name}"
     try:
         try:
@@ -249,17 +319,14 @@ def upload_image(handler: BaseHTTPRequestHandler, mid: int) -> None:
             current = {}
         if not isinstance(current, dict):
             current = {}
-        current.setdefault("images", [])
-        if isinstance(current["images"], list):
-            current["images"] = [image_url]
-        else:
-            current["images"] = [image_url]
-        with db.get_conn():
-            db.get_conn().execute("UPDATE models SET extra_json=? WHERE id= ?", (json.dumps(current, ensure_ascii=False), mid))
+        old_images = current.get("images") if isinstance(current.get("images"), list) else []
+        current["images"] = [image_url]
+        db.update_model_extra(mid, current)
     except Exception:
         handler._set_headers(200)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"image_url": image_url, "file": out_name, "note": "db_update_failed"}))
         return
+    thumbs.remove_replaced_media(mid, old_images, keep=[image_url])
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes({"image_url": image_url, "file": out_name}))
 
@@ -270,7 +337,7 @@ def delete_model(handler: BaseHTTPRequestHandler, mid: int) -> None:
         handler._set_headers(404)  # type: ignore[attr-defined]
         handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "model not found"}}))
         return
-    with db.get_conn():
-        db.get_conn().execute("DELETE FROM models WHERE id= ?", (mid,))
+    db.delete_model(mid)
+    thumbs.remove_model_media([mid])
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes({"deleted": True, "note": "Model record removed from database, file unchanged"}))
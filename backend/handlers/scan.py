@@ -13,13 +13,15 @@ def get_status(handler: BaseHTTPRequestHandler, scanner) -> None:
     handler.wfile.write(json_dumps_bytes(status))
 
 
-essential_scan_payload_keys = ("paths", "full")
+essential_scan_payload_keys = ("paths", "full", "rehash")
 
 
 def start(handler: BaseHTTPRequestHandler, scanner, data: dict) -> None:
     paths = data.get("paths")
     full = bool(data.get("full", False))
-    started = scanner.start(paths=paths, full=full) if scanner else False
+    # rehash: re-read every file even where a hash is stored or cached (repairs wrong hashes)
+    rehash = bool(data.get("rehash", False))
+    started = scanner.start(paths=paths, full=full, rehash=rehash) if scanner else False
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes({"started": started}))
 
@@ -29,3 +31,23 @@ def stop(handler: BaseHTTPRequestHandler, scanner) -> None:
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes({"stopped": stopped}))
 
+
+
+def watch_status(handler: BaseHTTPRequestHandler, scanner) -> None:
+    status = scanner.watch_status() if scanner else {"running": False}
+    handler._set_headers(200)  # type: ignore[attr-defined]
+    handler.wfile.write(json_dumps_bytes(status))
+
+
+def watch(handler: BaseHTTPRequestHandler, scanner, data: dict) -> None:
+    """Turn watch mode on/off for this process: {"enabled": bool, "paths"?: [...]}."""
+    enabled = bool(data.get("enabled", True))
+    if not scanner:
+        changed = False
+    elif enabled:
+        changed = scanner.watch_start(roots=data.get("paths"))
+    else:
+        changed = scanner.watch_stop()
+    status = scanner.watch_status() if scanner else {"running": False}
+    handler._set_headers(200)  # type: ignore[attr-defined]
+    handler.wfile.write(json_dumps_bytes({"changed": changed, "watch": status}))
@@ -1,28 +1,144 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import email.utils
 import os
+import re
 from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional, Tuple
 
+from .. import thumbs
 from ..paths import WEB_DIR, MEDIA_DIR
 from ..utils import json_dumps_bytes
 
+# Uploads are written once under a unique name (model_<id>_<ms>_<file>) and never modified
+_IMMUTABLE_MEDIA_RE = re.compile(r"^model_\d+_\d+_[^/]+$")
+_CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# Web assets keep their names across releases: always revalidate (cheap with the validators below)
+_CACHE_REVALIDATE = "no-cache"
 
-def serve_web_file(handler: BaseHTTPRequestHandler, rel: str) -> None:
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _not_found(handler: BaseHTTPRequestHandler, head_only: bool = False) -> None:
+    handler._set_headers(404)  # type: ignore[attr-defined]
+    if not head_only:
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
+
+
+def _validators(st: os.stat_result) -> Tuple[str, str]:
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    return etag, email.utils.formatdate(st.st_mtime, usegmt=True)
+
+
+def _not_modified(handler: BaseHTTPRequestHandler, etag: str, st: os.stat_result) -> bool:
+    inm = handler.headers.get("If-None-Match")
+    if inm is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return inm.strip() == "*" or any(t.strip().removeprefix("W/") == etag for t in inm.split(","))
+    ims = handler.headers.get("If-Modified-Since")
+    if ims:
+        try:
+            since = email.utils.parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        return int(st.st_mtime) <= int(since)
+    return False
+
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Single byte range -> (start, end inclusive); None = serve whole file; (-1, -1) = unsatisfiable."""
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None  # multi-range or malformed: a full 200 is a valid answer
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+    else:
+        # suffix range: last N bytes
+        n = int(m.group(2))
+        if n == 0:
+            return (-1, -1)
+        start, end = max(0, size - n), size - 1
+    if start >= size or end < start:
+        return (-1, -1)
+    return start, min(end, size - 1)
+
+
+def _send_file(handler: BaseHTTPRequestHandler, full_path: str, ct: str, cache_control: str,
+               head_only: bool = False) -> None:
+    """Send a file with validators, 304/206/416 handling and a zero-copy body (socket.sendfile)."""
+    try:
+        f = open(full_path, "rb")
+    except OSError:
+        handler._set_headers(500)  # type: ignore[attr-defined]
+        handler.wfile.write(json_dumps_bytes({"error": {"code": "READ_ERROR", "message": "cannot read file"}}))
+        return
+    with f:
+        st = os.fstat(f.fileno())
+        etag, last_modified = _validators(st)
+        headers: Dict[str, str] = {
+            "ETag": etag,
+            "Last-Modified": last_modified,
+            "Cache-Control": cache_control,
+            "Accept-Ranges": "bytes",
+        }
+        if _not_modified(handler, etag, st):
+            handler._set_headers(304, ct, headers=headers)  # type: ignore[attr-defined]
+            return
+        size = st.st_size
+        rng = _parse_range(handler.headers.get("Range"), size)
+        if rng is not None:
+            if_range = handler.headers.get("If-Range")
+            if if_range and if_range.strip() not in (etag, last_modified):
+                rng = None  # the client's partial copy is stale: send it all
+        if rng == (-1, -1):
+            headers["Content-Range"] = f"bytes */{size}"
+            headers["Content-Length"] = "0"
+            handler._set_headers(416, ct, headers=headers)  # type: ignore[attr-defined]
+            return
+        if rng is not None:
+            start, end = rng
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            code = 206
+        else:
+            start, end = 0, size - 1
+            code = 200
+        count = end - start + 1 if size else 0
+        headers["Content-Length"] = str(count)
+        handler._set_headers(code, ct, headers=headers)  # type: ignore[attr-defined]
+        if head_only or count <= 0:
+            return
+        try:
+            handler.wfile.flush()
+            # os.sendfile where the platform has it, a buffered send loop otherwise
+            handler.connection.sendfile(f, start, count)  # type: ignore[attr-defined]
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-transfer (e.g. scrolled the preview out of view)
+
+
+def _resolve(base_dir: str, rel: str) -> Optional[str]:
+    safe_rel = os.path.normpath(rel)
+    if safe_rel.startswith(".."):
+        return None
+    base = os.path.abspath(base_dir)
+    full_path = os.path.join(base, safe_rel)
+    if os.path.commonpath([base, os.path.abspath(full_path)]) != base:
+        return None
+    return full_path
+
+
+def serve_web_file(handler: BaseHTTPRequestHandler, rel: str, head_only: bool = False) -> None:
     rel = rel.replace("\\", "/").lstrip("/")
     if not rel:
         rel = "index.html"
-    safe_rel = os.path.normpath(rel)
-    if safe_rel.startswith(".."):
-        handler._set_headers(404)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
-        return
-    full_path = os.path.join(WEB_DIR, safe_rel)
-    if os.path.isdir(full_path):
+    full_path = _resolve(WEB_DIR, rel)
+    if full_path is not None and os.path.isdir(full_path):
         full_path = os.path.join(full_path, "index.html")
-    if not (os.path.exists(full_path) and os.path.commonpath([WEB_DIR, os.path.abspath(full_path)]) == WEB_DIR):
-        handler._set_headers(404)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
+    if full_path is None or not os.path.isfile(full_path):
+        _not_found(handler, head_only)
         return
     ext = os.path.splitext(full_path)[1].lower()
     ct = {
@@ -38,31 +154,16 @@ def serve_web_file(handler: BaseHTTPRequestHandler, rel: str) -> None:
         ".svg": "image/svg+xml",
         ".webp": "image/webp",
     }.get(ext, "application/octet-stream")
-    try:
-        with open(full_path, "rb") as f:
-            data = f.read()
-        handler._set_headers(200, ct)  # type: ignore[attr-defined]
-        handler.wfile.write(data)
-    except Exception:
-        handler._set_headers(500)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "READ_ERROR", "message": "cannot read file"}}))
+    _send_file(handler, full_path, ct, _CACHE_REVALIDATE, head_only)
 
 
-def serve_media_file(handler: BaseHTTPRequestHandler, rel: str) -> None:
+def serve_media_file(handler: BaseHTTPRequestHandler, rel: str, head_only: bool = False,
+                     size: Optional[int] = None) -> None:
+    """Serve an uploaded image; ?size=N returns the cached thumbnail bucket for N (original if none)."""
     rel = rel.replace("\\", "/").lstrip("/")
-    safe_rel = os.path.normpath(rel)
-    if safe_rel.startswith(".."):
-        handler._set_headers(404)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
-        return
-    full_path = os.path.join(MEDIA_DIR, safe_rel)
-    if os.path.isdir(full_path):
-        handler._set_headers(404)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
-        return
-    if not (os.path.exists(full_path) and os.path.commonpath([os.path.abspath(MEDIA_DIR), os.path.abspath(full_path)]) == os.path.abspath(MEDIA_DIR)):
-        handler._set_headers(404)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "NOT_FOUND", "message": "file not found"}}))
+    full_path = _resolve(MEDIA_DIR, rel)
+    if full_path is None or not os.path.isfile(full_path):
+        _not_found(handler, head_only)
         return
     ext = os.path.splitext(full_path)[1].lower()
     ct = {
@@ -73,12 +174,9 @@ def serve_media_file(handler: BaseHTTPRequestHandler, rel: str) -> None:
         ".webp": "image/webp",
         ".svg": "image/svg+xml",
     }.get(ext, "application/octet-stream")
-    try:
-        with open(full_path, "rb") as f:
-            data = f.read()
-        handler._set_headers(200, ct)  # type: ignore[attr-defined]
-        handler.wfile.write(data)
-    except Exception:
-        handler._set_headers(500)  # type: ignore[attr-defined]
-        handler.wfile.write(json_dumps_bytes({"error": {"code": "READ_ERROR", "message": "cannot read file"}}))
-
+    immutable = _IMMUTABLE_MEDIA_RE.match(os.path.basename(full_path)) is not None
+    if size:
+        thumb = thumbs.get(full_path, size)
+        if thumb is not None:
+            full_path, ct = thumb, thumbs.content_type(thumb)
+    _send_file(handler, full_path, ct, _CACHE_IMMUTABLE if immutable else _CACHE_REVALIDATE, head_only)
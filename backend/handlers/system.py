@@ -3,18 +3,20 @@ from __future__ import annotations
 
 from http.server import BaseHTTPRequestHandler
 
+from .. import db, lora_cache
+from ..db import SCHEMA_VERSION
 from ..utils import json_dumps_bytes
 
 
-SCHEMA_VERSION = 2
-
-
-def health(handler: BaseHTTPRequestHandler, version: str, scanner) -> None:
+def health(handler: BaseHTTPRequestHandler, version: str, scanner, startup=None) -> None:
     payload = {
         "status": "ok",
         "version": version,
-        "db": {"ready": True},
+        # ready turns true after the first catalog request ran the schema check
+        "db": db.init_status(),
+        "startup": startup or {},
         "scanning": scanner.status() if scanner else {"running": False, "progress": 0},
+        "lora_cache": lora_cache.stats(),
     }
     handler._set_headers(200)  # type: ignore[attr-defined]
     handler.wfile.write(json_dumps_bytes(payload))
@@ -6,13 +6,14 @@ import os
 import re
 import sys
 from http.server import SimpleHTTPRequestHandler
-from typing import Literal
+from typing import Dict, Literal, Optional
 from urllib.parse import parse_qs, urlparse
 
 # Runtime context, injected by server.py via set_context
 _cfg = None  # type: ignore
 _scanner = None  # type: ignore
 _version: str = "unknown"
+_startup = None  # type: ignore
 
 try:
     # Running in package environment
@@ -25,6 +26,10 @@ try:
         serve_media_file as _serve_media_file,
     )  # type: ignore
     from .handlers import system as h_system, scan as h_scan, tags as h_tags, models as h_models  # type: ignore
+    from .handlers import cache as h_cache  # type: ignore
+    from .handlers import archive as h_archive  # type: ignore
+    from . import thumbs as _thumbs  # type: ignore
+    from . import lora_cache as _lora_cache  # type: ignore
     from .permissions import check_permission as _check_permission  # type: ignore
 except Exception:
     # Local imports fallback when running as a plain script
@@ -47,7 +52,11 @@ except Exception:
     _handlers_scan = _load_local("hikaze_mm_handlers_scan", os.path.join("handlers", "scan.py"))
     _handlers_tags = _load_local("hikaze_mm_handlers_tags", os.path.join("handlers", "tags.py"))
     _handlers_models = _load_local("hikaze_mm_handlers_models", os.path.join("handlers", "models.py"))
+    _handlers_cache = _load_local("hikaze_mm_handlers_cache", os.path.join("handlers", "cache.py"))
+    _handlers_archive = _load_local("hikaze_mm_handlers_archive", os.path.join("handlers", "archive.py"))
     _perms = _load_local("hikaze_mm_permissions", "permissions.py")
+    _thumbs = _load_local("hikaze_mm_thumbs", "thumbs.py")
+    _lora_cache = _load_local("hikaze_mm_lora_cache", "lora_cache.py")
 
     _json_dumps = _utils.json_dumps_bytes
     _json_loads = _utils.json_loads_bytes
@@ -57,36 +66,61 @@ except Exception:
     h_scan = _handlers_scan
     h_tags = _handlers_tags
     h_models = _handlers_models
+    h_cache = _handlers_cache
+    h_archive = _handlers_archive
     _check_permission = _perms.check_permission
 
 
-def set_context(cfg, scanner, version: str = "unknown") -> None:
+def set_context(cfg, scanner, version: str = "unknown", startup=None) -> None:
     """Injected by server.py to set runtime context.
 
     Args:
         cfg: AppConfig instance
         scanner: Scanner instance
         version: version string
+        startup: server.py's startup timing dict (reported by /health)
     """
-    global _cfg, _scanner, _version
+    global _cfg, _scanner, _version, _startup
     _cfg = cfg
     _scanner = scanner
     _version = version or "unknown"
+    _startup = startup
+    _thumbs.set_cache_limit(getattr(cfg, "thumb_cache_mb", _thumbs.DEFAULT_CACHE_MB))
+    _lora_cache.set_budget(getattr(cfg, "lora_cache_mb", _lora_cache.DEFAULT_BUDGET_MB))
     # Sync to handler's server_version
     ApiHandler.server_version = f"HikazeMM/{_version}"
 
 
+def _size_param(query: str) -> Optional[int]:
+    try:
+        size = int(parse_qs(query).get("size", ["0"])[0])
+    except ValueError:
+        return None
+    return size if size > 0 else None
+
+
 class ApiHandler(SimpleHTTPRequestHandler):
     # Will be updated in set_context
     server_version = "HikazeMM/unknown"
+    # Set by handlers.cache while rendering a response into its buffer instead of the socket
+    _capture = None
 
-    def _set_headers(self, code: int, content_type: str = "application/json; charset=utf-8"):
+    def _set_headers(self, code: int, content_type: str = "application/json; charset=utf-8",
+                     headers: Optional[Dict[str, str]] = None):
+        if self._capture is not None:
+            self._capture.update(code=code, content_type=content_type)
+            return
         self.send_response(code)
         self.send_header("Content-Type", content_type)
-        self.send_header("Cache-Control", "no-store")
+        out = {"Cache-Control": "no-store"}
+        if headers:
+            out.update(headers)
+        for k, v in out.items():
+            self.send_header(k, v)
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET,POST,PATCH,PUT,DELETE,OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type,Accept,X-Filename")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type,Accept,X-Filename,If-None-Match")
+        self.send_header("Access-Control-Expose-Headers", "ETag,Content-Disposition")
         self.end_headers()
 
     def do_OPTIONS(self):  # noqa: N802
@@ -96,8 +130,15 @@ class ApiHandler(SimpleHTTPRequestHandler):
         parsed = urlparse(self.path)
         path = parsed.path or "/"
 
+        # Catalog reads: ETag/304 and a per-generation response cache (streamed listings bypass it)
+        if h_cache.is_cacheable(path) and not (path == "/models" and h_models.is_stream(parsed.query)):
+            h_cache.serve(self, path, parsed.query, lambda: self._get(parsed, path))
+            return
+        self._get(parsed, path)
+
+    def _get(self, parsed, path: str) -> None:
         if path == "/health":
-            h_system.health(self, _version, _scanner)
+            h_system.health(self, _version, _scanner, _startup)
             return
 
         if path == "/version":
@@ -108,6 +149,10 @@ class ApiHandler(SimpleHTTPRequestHandler):
             h_scan.get_status(self, _scanner)
             return
 
+        if path == "/scan/watch":
+            h_scan.watch_status(self, _scanner)
+            return
+
         # New: list all types with counts
         if path == "/types":
             h_models.types_with_counts(self)
@@ -142,6 +187,10 @@ class ApiHandler(SimpleHTTPRequestHandler):
             h_models.list_models(self, parsed.query)
             return
 
+        if path == "/models/lookup":
+            h_models.lookup(self, parsed.query)
+            return
+
         m = re.match(r"^/models/(\d+)$", path)
         if m:
             h_models.get_model(self, int(m.group(1)))
@@ -161,6 +210,10 @@ class ApiHandler(SimpleHTTPRequestHandler):
             h_tags.list_all(self)
             return
 
+        if path == "/export":
+            h_archive.export(self, parsed.query)
+            return
+
         # static: /web/*
         if path == "/":
             self.send_response(301)
@@ -179,15 +232,31 @@ class ApiHandler(SimpleHTTPRequestHandler):
             return
         if path.startswith("/media/"):
             rel = path[len("/media/"):]
-            _serve_media_file(self, rel)
+            _serve_media_file(self, rel, size=_size_param(parsed.query))
             return
 
         self._set_headers(404)
         self.wfile.write(_json_dumps({"error": {"code": "NOT_FOUND", "message": "not found"}}))
 
+    def do_HEAD(self):  # noqa: N802
+        """Headers only for static/media files (size, validators); the inherited directory listing is never served."""
+        parsed = urlparse(self.path)
+        path = parsed.path or "/"
+        if path in ("/web", "/web/") or path.startswith("/web/"):
+            _serve_web_file(self, path[len("/web/"):] if path.startswith("/web/") else "", head_only=True)
+            return
+        if path.startswith("/media/"):
+            _serve_media_file(self, path[len("/media/"):], head_only=True, size=_size_param(parsed.query))
+            return
+        self._set_headers(405)
+
     def do_POST(self):  # noqa: N802
         parsed = urlparse(self.path)
         path = parsed.path or "/"
+        # The archive body is streamed into the importer, not read and parsed as JSON
+        if path == "/import":
+            h_archive.import_(self, parsed.query)
+            return
         length = int(self.headers.get("Content-Length", "0"))
         body = self.rfile.read(length) if length > 0 else b""
         data = _json_loads(body) or {}
@@ -200,6 +269,10 @@ class ApiHandler(SimpleHTTPRequestHandler):
             h_scan.stop(self, _scanner)
             return
 
+        if path == "/scan/watch":
+            h_scan.watch(self, _scanner, data)
+            return
+
         if path == "/tags":
             h_tags.create(self, name=data.get("name"), color=data.get("color"))
             return
@@ -245,7 +318,8 @@ class ApiHandler(SimpleHTTPRequestHandler):
             self._set_headers(404)
             self.wfile.write(_json_dumps({"error": {"code": "NOT_FOUND", "message": "not found"}}))
             return
-        h_models.upload_image(self, int(m.group(1)))
+        max_mb = getattr(_cfg, "max_upload_mb", None)
+        h_models.upload_image(self, int(m.group(1)), max_bytes=max_mb * 1024 * 1024 if max_mb else None)
 
     def do_DELETE(self):  # noqa: N802
         """
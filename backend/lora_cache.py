@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""LRU of loaded LoRA state dicts, shared by the loader nodes of this process.
+
+Entries are keyed by file path and only reused while (mtime, size) still match, so an
+overwritten LoRA is read again. The total tensor size is bounded by a memory budget
+(lora_cache_mb); a single file larger than the budget is passed through uncached.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+DEFAULT_BUDGET_MB = 1024
+
+
+def state_size(sd: Any) -> int:
+    """Bytes held by the tensors of a state dict (0 for anything that is not one)."""
+    total = 0
+    if isinstance(sd, dict):
+        for v in sd.values():
+            n = getattr(v, "nbytes", None)
+            if n is None and hasattr(v, "numel"):
+                try:
+                    n = v.numel() * v.element_size()
+                except Exception:
+                    n = 0
+            total += int(n or 0)
+    return total
+
+
+class LoraCache:
+    def __init__(self, budget_mb: int = DEFAULT_BUDGET_MB):
+        self._lock = threading.Lock()
+        # path -> ((mtime_ns, size), state dict, bytes)
+        self._items: "OrderedDict[str, Tuple[Tuple[int, int], Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._budget = max(0, int(budget_mb)) * 1024 * 1024
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def set_budget(self, mb: int) -> None:
+        with self._lock:
+            self._budget = max(0, int(mb)) * 1024 * 1024
+            self._shrink()
+
+    def get(self, path: str, load: Callable[[str], Any]) -> Any:
+        """State dict of the LoRA at path: cached if the file is unchanged, else load(path)."""
+        key = os.path.normcase(os.path.abspath(path))
+        st = os.stat(path)
+        ident = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if item[0] == ident:
+                    self._items.move_to_end(key)
+                    self._hits += 1
+                    return item[1]
+                # Rewritten on disk since it was cached
+                self._drop(key)
+            self._misses += 1
+        sd = load(path)
+        size = state_size(sd)
+        with self._lock:
+            if 0 < size <= self._budget:
+                if key in self._items:
+                    self._drop(key)
+                self._items[key] = (ident, sd, size)
+                self._bytes += size
+                self._shrink()
+        return sd
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._items.pop(key)
+        self._bytes -= size
+
+    def _shrink(self) -> None:
+        while self._items and self._bytes > self._budget:
+            _, (_, _, size) = self._items.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "budget_bytes": self._budget,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_cache = LoraCache()
+get = _cache.get
+set_budget = _cache.set_budget
+stats = _cache.stats
+clear = _cache.clear
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Model file metadata extraction (header-only reads, no torch)"""
+from __future__ import annotations
+
+import json
+import math
+import struct
+from typing import Any, Dict, List, Optional
+
+# One read of this size covers the header of nearly every LoRA and most checkpoints;
+# larger headers cost exactly one more read of the remainder.
+_HEADER_PROBE = 256 * 1024
+# safetensors caps the JSON header at 100 MB; anything larger is not a valid file
+_MAX_HEADER = 100 * 1024 * 1024
+_MAX_TRIGGER_WORDS = 20
+
+_TRAINING_KEYS = {
+    "ss_num_epochs": "epochs",
+    "ss_max_train_steps": "steps",
+    "ss_num_train_images": "images",
+    "ss_resolution": "resolution",
+    "ss_learning_rate": "learning_rate",
+    "ss_optimizer": "optimizer",
+    "ss_training_started_at": "started_at",
+    "ss_training_finished_at": "finished_at",
+}
+
+
+def read_safetensors_header(path: str) -> Optional[Dict[str, Any]]:
+    """Return the parsed JSON header of a .safetensors file, or None if it is not one."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER_PROBE)
+            if len(head) < 8:
+                return None
+            (n,) = struct.unpack("<Q", head[:8])
+            if n < 2 or n > _MAX_HEADER:
+                return None
+            raw = head[8:8 + n]
+            if len(raw) < n:
+                raw += f.read(n - len(raw))
+                if len(raw) < n:
+                    return None
+        header = json.loads(raw.decode("utf-8"))
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+    return header if isinstance(header, dict) else None
+
+
+def _num(v: Any) -> Any:
+    # metadata values are always strings; surface numbers as numbers where they parse
+    if not isinstance(v, str):
+        return v
+    try:
+        return int(v)
+    except ValueError:
+        pass
+    try:
+        f = float(v)
+    except ValueError:
+        return v
+    # "nan"/"inf" parse too, but would be written out as invalid JSON
+    return f if math.isfinite(f) else v
+
+
+def _trigger_words(meta: Dict[str, str]) -> List[str]:
+    words: List[str] = []
+    phrase = meta.get("modelspec.trigger_phrase")
+    if isinstance(phrase, str):
+        words.extend(w.strip() for w in phrase.split(",") if w.strip())
+    freq_raw = meta.get("ss_tag_frequency")
+    if isinstance(freq_raw, str) and freq_raw:
+        try:
+            freq = json.loads(freq_raw)
+        except ValueError:
+            freq = None
+        if isinstance(freq, dict):
+            counts: Dict[str, int] = {}
+            for tags in freq.values():
+                if not isinstance(tags, dict):
+                    continue
+                for tag, c in tags.items():
+                    t = str(tag).strip()
+                    if t:
+                        counts[t] = counts.get(t, 0) + (int(c) if isinstance(c, (int, float)) else 0)
+            words.extend(t for t, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0])))
+    seen = set()
+    out = []
+    for w in words:
+        if w.lower() not in seen:
+            seen.add(w.lower())
+            out.append(w)
+        if len(out) >= _MAX_TRIGGER_WORDS:
+            break
+    return out
+
+
+def normalize_safetensors_meta(header: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a safetensors header to the subset stored in models.meta_json."""
+    meta = header.get("__metadata__")
+    meta = meta if isinstance(meta, dict) else {}
+    out: Dict[str, Any] = {
+        "format": "safetensors",
+        "tensor_count": sum(1 for k in header if k != "__metadata__"),
+    }
+    title = meta.get("modelspec.title") or meta.get("ss_output_name")
+    if title:
+        out["title"] = title
+    if meta.get("modelspec.architecture"):
+        out["architecture"] = meta["modelspec.architecture"]
+    base = meta.get("ss_base_model_version") or meta.get("ss_sd_model_name") or meta.get("modelspec.architecture")
+    if base:
+        out["base_model"] = base
+    network = {k: _num(meta[src]) for src, k in (("ss_network_module", "module"), ("ss_network_dim", "dim"),
+                                                   ("ss_network_alpha", "alpha")) if meta.get(src)}
+    if network:
+        out["network"] = network
+    training = {k: _num(meta[src]) for src, k in _TRAINING_KEYS.items() if meta.get(src) not in (None, "", "None")}
+    if training:
+        out["training"] = training
+    words = _trigger_words(meta)
+    if words:
+        out["trigger_words"] = words
+    # Generation-relevant subset, merged (below user params) by /models/{id}/params
+    params = {}
+    if base:
+        params["base_model"] = base
+    if words:
+        params["trigger_words"] = ", ".join(words)
+    if params:
+        out["params"] = params
+    return out
+
+
+def extract_meta_json(path: str) -> Optional[str]:
+    """meta_json value for a model file, or None when the format carries no readable metadata."""
+    if not path.lower().endswith(".safetensors"):
+        return None
+    header = read_safetensors_header(path)
+    if header is None:
+        return None
+    return json.dumps(normalize_safetensors_meta(header), ensure_ascii=False)
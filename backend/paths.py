@@ -12,3 +12,6 @@ WEB_DIR = os.path.join(_BASE_DIR, "web")
 
 # Media assets directory
 MEDIA_DIR = os.path.join(_BASE_DIR, "data", "images")
+
+# Generated preview thumbnails (disposable cache, see thumbs.py)
+THUMBS_DIR = os.path.join(_BASE_DIR, "data", "thumbs")
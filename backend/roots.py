@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Precompiled model-root matching.
+
+Classifying a file used to abspath/normcase/commonpath it against every root in turn.
+RootMatcher compiles the roots once into a trie of normalized path components, so one
+walk down the file's components finds its root, type and root-relative name.
+
+Where roots are nested (the default models/ root and a ComfyUI models/checkpoints root),
+the first root in configured order wins, as the per-root loops did, so existing rows
+keep their type.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Trie key of the terminal entry (order, root, mapped type); path components are strings
+_END = None
+
+
+class RootMatch(NamedTuple):
+    root: str
+    # Type of a root that is itself a typed directory (AppConfig.root_type_map), else None
+    mapped_type: Optional[str]
+    # '/'-separated path below the root ('' for the root itself)
+    rel: str
+
+    @property
+    def type(self) -> str:
+        """Model type: the mapped type, else the first-level directory under the root."""
+        if self.mapped_type:
+            return self.mapped_type
+        first = self.rel.split("/", 1)[0].strip().lower()
+        return first or "other"
+
+
+def _parts(path: str) -> Tuple[List[str], List[str]]:
+    """(components of the absolute path, same components normcased)."""
+    ap = os.path.abspath(path)
+    return ap.split(os.sep), os.path.normcase(ap).split(os.sep)
+
+
+class RootMatcher:
+    def __init__(self, roots: Iterable[str], type_map: Optional[Dict[str, str]] = None):
+        rmap = type_map or {}
+        self._trie: Dict[Any, Any] = {}
+        for order, r in enumerate(roots or []):
+            if not isinstance(r, str) or not r:
+                continue
+            rabs = os.path.abspath(r)
+            key = os.path.normcase(rabs)
+            node = self._trie
+            for part in key.split(os.sep):
+                if part:
+                    node = node.setdefault(part, {})
+            # A root listed twice keeps its first position
+            node.setdefault(_END, (order, rabs, rmap.get(key)))
+
+    def match(self, path: str) -> Optional[RootMatch]:
+        try:
+            parts, keys = _parts(path)
+        except Exception:
+            return None
+        node = self._trie
+        best = None
+        depth = 0
+        # Empty components (leading '/', drive-root separators) are not trie levels
+        for i, part in enumerate(keys):
+            if not part:
+                continue
+            node = node.get(part)
+            if node is None:
+                break
+            end = node.get(_END)
+            if end is not None and (best is None or end[0] < best[0]):
+                best, depth = end, i + 1
+        if best is None:
+            return None
+        rel = "/".join(p for p in parts[depth:] if p)
+        return RootMatch(best[1], best[2], rel)
+
+    def infer_type(self, path: str) -> str:
+        m = self.match(path)
+        return m.type if m is not None else "other"
+
+    def rel_name(self, path: str) -> str:
+        """Name relative to the matching root, falling back to the file name (ComfyUI style)."""
+        m = self.match(path)
+        if m is not None and m.rel:
+            return m.rel
+        return os.path.basename(os.path.abspath(path))
+
+
+# --- Cached matchers ---
+
+_lock = threading.Lock()
+# Each matcher is kept with a snapshot of the roots it was built from
+_config_matcher: Optional[Tuple[Tuple[str, ...], Dict[str, str], RootMatcher]] = None
+# domain -> (ComfyUI folder snapshot, matcher)
+_domain_matchers: Dict[str, Tuple[Tuple[str, ...], RootMatcher]] = {}
+_folder_paths_mod: Any = None
+# Bumped whenever a domain matcher is rebuilt, i.e. when names derived from folder_paths may change
+_names_version = 0
+_folder_paths_tried = False
+
+
+def for_config(cfg) -> RootMatcher:
+    """Matcher for cfg.model_roots / cfg.root_type_map, rebuilt only when those change."""
+    global _config_matcher
+    roots = tuple(getattr(cfg, "model_roots", None) or ())
+    rmap = getattr(cfg, "root_type_map", None) or {}
+    hit = _config_matcher
+    if hit is not None and hit[0] == roots and hit[1] == rmap:
+        return hit[2]
+    matcher = RootMatcher(roots, rmap)
+    with _lock:
+        _config_matcher = (roots, dict(rmap), matcher)
+    return matcher
+
+
+def _folder_paths():
+    # ComfyUI's folder_paths, imported once; None outside ComfyUI
+    global _folder_paths_mod, _folder_paths_tried
+    if not _folder_paths_tried:
+        mod = sys.modules.get("folder_paths")
+        if mod is None:
+            try:
+                import folder_paths as mod  # type: ignore
+            except Exception:
+                mod = None
+        _folder_paths_mod = mod
+        _folder_paths_tried = True
+    return _folder_paths_mod
+
+
+def for_domain(domain: str) -> Optional[RootMatcher]:
+    """Matcher over ComfyUI's folders for a domain ("checkpoints", "loras"); None outside ComfyUI.
+
+    Rebuilt when ComfyUI's folder list for the domain changes (e.g. a node registers a path).
+    """
+    global _names_version
+    fp = _folder_paths()
+    if fp is None:
+        return None
+    entry = (getattr(fp, "folder_names_and_paths", None) or {}).get(domain)
+    # Read the registry entry directly: get_folder_paths copies the list on every call
+    if isinstance(entry, (list, tuple)) and entry:
+        folders = tuple(entry[0] or ())
+    else:
+        try:
+            folders = tuple(fp.get_folder_paths(domain))
+        except Exception:
+            return None
+    hit = _domain_matchers.get(domain)
+    if hit is not None and hit[0] == folders:
+        return hit[1]
+    matcher = RootMatcher(folders)
+    with _lock:
+        _domain_matchers[domain] = (folders, matcher)
+        _names_version += 1
+    return matcher
+
+
+def names_version() -> int:
+    """Changes whenever ComfyUI's checkpoint or LoRA folders do (so do names computed from them)."""
+    for domain in ("checkpoints", "loras"):
+        for_domain(domain)
+    return _names_version
+
+
+def comfy_names(path: str, type_: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(ckpt_name, lora_name) ComfyUI loaders use for a file of the given type; None where n/a."""
+    t = (type_ or "").strip().lower()
+    ckpt_name = lora_name = None
+    try:
+        if t in ("checkpoint", "checkpoints"):
+            m = for_domain("checkpoints")
+            ckpt_name = m.rel_name(path) if m is not None else None
+        elif t in ("lora", "loras"):
+            m = for_domain("loras")
+            lora_name = m.rel_name(path) if m is not None else None
+    except Exception:
+        pass
+    return ckpt_name, lora_name
@@ -3,14 +3,17 @@ from __future__ import annotations
 
 import hashlib
 import os
+import queue
 import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 try:
-    from . import db  # type: ignore
+    from . import db, metadata, thumbs, watcher  # type: ignore
     from .config import AppConfig  # type: ignore
+    from .roots import comfy_names, for_config as root_matcher  # type: ignore
 except Exception:
     # Fallback for script-run context
     import importlib.util, sys as _sys
@@ -27,7 +30,13 @@ except Exception:
 
     _config = _load_local("hikaze_mm_config", "config.py")
     db = _load_local("hikaze_mm_db", "db.py")
+    metadata = _load_local("hikaze_mm_metadata", "metadata.py")
+    thumbs = _load_local("hikaze_mm_thumbs", "thumbs.py")
+    watcher = _load_local("hikaze_mm_watcher", "watcher.py")
+    _roots = _load_local("hikaze_mm_roots", "roots.py")
     AppConfig = _config.AppConfig
+    comfy_names = _roots.comfy_names
+    root_matcher = _roots.for_config
 
 
 SUPPORTED_EXTS = {
@@ -38,6 +47,11 @@ SUPPORTED_EXTS = {
     "upscale": {".pth", ".pt"},
     "ultralytics": {".pt"},
 }
+_MODEL_EXTS = {e for s in SUPPORTED_EXTS.values() for e in s} | {".safetensors", ".ckpt", ".pth", ".pt", ".bin"}
+
+
+def is_model_file(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in _MODEL_EXTS
 
 KEYWORDS = [
     ("embedding", ("embedding", "embeddings")),
@@ -74,7 +88,30 @@ class ScanStats:
     updated: int = 0
     skipped: int = 0
     errors: int = 0
+    # rows whose files were not found under the scanned roots (deleted or moved away):
+    # moved = found again under another path, missing = kept for their annotations, removed = deleted
+    moved: int = 0
+    missing: int = 0
+    removed: int = 0
     by_type: Dict[str, int] = field(default_factory=dict)
+    # full scans: 'index' (walk + upsert) then 'hash'
+    phase: str = "index"
+    hash_files: int = 0
+    hashed: int = 0
+    bytes_total: int = 0
+    bytes_hashed: int = 0
+
+
+# Scan records are persisted in transactions of this many rows by the writer thread
+_WRITE_BATCH = 500
+
+# Hashes are flushed to the DB in groups of this many files (or after _HASH_FLUSH_SEC)
+_HASH_BATCH = 64
+_HASH_FLUSH_SEC = 2.0
+
+
+class _ScanStopped(Exception):
+    pass
 
 
 class Scanner:
@@ -87,41 +124,40 @@ class Scanner:
         self._stats = ScanStats()
         self._last_error: Optional[str] = None
         self._last_started_ms: Optional[int] = None
+        self._hash_started: Optional[float] = None
+        self._hash_workers = max(1, int(getattr(cfg, "hash_workers", 4) or 4))
+        self._hash_buffer = max(1, int(getattr(cfg, "hash_buffer_mb", 8) or 8)) * 1024 * 1024
+        self._watcher = None
 
     def _infer_type_by_roots(self, path: str) -> str:
-        apath = os.path.abspath(path)
-        roots = self._cfg.model_roots or []
-        rmap = getattr(self._cfg, 'root_type_map', {}) or {}
-        for r in roots:
-            try:
-                rabs = os.path.abspath(r)
-                common = os.path.commonpath([os.path.normcase(rabs), os.path.normcase(apath)])
-            except Exception:
-                continue
-            if common == os.path.normcase(rabs):
-                # If the root itself is a typed directory, return mapped type directly
-                mt = rmap.get(os.path.normcase(rabs))
-                if mt:
-                    return mt
-                # Otherwise infer by first-level subdirectory name
-                rel = os.path.relpath(apath, rabs)
-                parts = [p for p in rel.replace('\\','/').split('/') if p and p not in ('.','..')]
-                if parts:
-                    return parts[0].strip().lower()
-        return 'other'
+        # Mapped type of a typed root, else the first-level subdirectory name (see roots.py)
+        return root_matcher(self._cfg).infer_type(path)
 
     # public status API
     def status(self) -> Dict[str, object]:
         with self._lock:
+            st = self._stats
+            bytes_per_sec = 0.0
+            eta_sec = None
+            if self._hash_started is not None and st.bytes_hashed:
+                elapsed = max(1e-6, time.monotonic() - self._hash_started)
+                bytes_per_sec = st.bytes_hashed / elapsed
+                if self._running and st.phase == "hash":
+                    eta_sec = int(max(0, st.bytes_total - st.bytes_hashed) / bytes_per_sec)
             return {
                 "running": self._running,
-                "progress": 0 if self._stats.total == 0 else int(self._stats.processed * 100 / max(1, self._stats.total)),
-                "stats": self._stats.__dict__,
+                "progress": 0 if st.total == 0 else int(st.processed * 100 / max(1, st.total)),
+                "stats": dict(st.__dict__, by_type=dict(st.by_type)),
+                "hashing": {
+                    "progress": 0 if st.bytes_total == 0 else int(st.bytes_hashed * 100 / st.bytes_total),
+                    "bytes_per_sec": int(bytes_per_sec),
+                    "eta_sec": eta_sec,
+                },
                 "last_error": self._last_error,
                 "last_started": self._last_started_ms,
             }
 
-    def start(self, paths: Optional[List[str]] = None, full: bool = False) -> bool:
+    def start(self, paths: Optional[List[str]] = None, full: bool = False, rehash: bool = False) -> bool:
         with self._lock:
             if self._running:
                 return False
@@ -130,12 +166,14 @@ class Scanner:
             self._stats = ScanStats()
             self._last_error = None
             self._last_started_ms = int(time.time() * 1000)
+            self._hash_started = None
         if paths is None:
             paths = self._cfg.model_roots or []
         # normalize
         paths = [os.path.abspath(p) for p in paths if p and os.path.isdir(p)]
-        # full=True indicates deep refresh: includes hash recomputation
-        self._thread = threading.Thread(target=self._run, args=(paths, full), daemon=True)
+        # full=True indicates deep refresh: also hashes every file whose hash is not known yet;
+        # rehash=True (implies full) reads every file again, ignoring stored and cached hashes
+        self._thread = threading.Thread(target=self._run, args=(paths, full or rehash, rehash), daemon=True)
         self._thread.start()
         return True
 
@@ -143,35 +181,128 @@ class Scanner:
         self._stop.set()
         return True
 
-    def refresh_one(self, path: str, compute_hash: bool = False) -> bool:
-        """Public API: refresh a single file (update indexed props; optionally recompute hash). Return success flag."""
+    def refresh_one(self, path: str, compute_hash: bool = False, rehash: bool = False) -> bool:
+        """Public API: refresh a single file (update indexed props; optionally compute a missing hash,
+        reusing the hash cache before reading the file; rehash=True always reads the file and
+        replaces the stored and cached hash). Return success flag."""
         try:
             if not os.path.isfile(path):
                 return False
-            self._process_file(path, compute_hash=compute_hash)
+            self._process_file(path, compute_hash=compute_hash, rehash=rehash)
             return True
         except Exception:
             return False
 
+    # watch mode: keep the index live from filesystem events instead of scheduled walks
+    is_model_file = staticmethod(is_model_file)
+
+    def watch_start(self, roots: Optional[List[str]] = None) -> bool:
+        with self._lock:
+            if self._watcher is not None and self._watcher.running:
+                return False
+            w = watcher.Watcher(self, roots if roots is not None else (self._cfg.model_roots or []),
+                                debounce_sec=getattr(self._cfg, "watch_debounce_sec", 2.0),
+                                poll_sec=getattr(self._cfg, "watch_poll_sec", 30))
+            self._watcher = w
+        w.start()
+        return True
+
+    def watch_stop(self) -> bool:
+        with self._lock:
+            w, self._watcher = self._watcher, None
+        if w is None:
+            return False
+        w.stop()
+        return True
+
+    def watch_status(self) -> Dict[str, object]:
+        w = self._watcher
+        return w.status() if w is not None else {"running": False}
+
+    def iter_model_files(self, roots: Iterable[str]) -> List[str]:
+        return list(self._iter_files(roots))
+
+    def move_paths(self, pairs: Iterable[Tuple[str, str]]) -> int:
+        """Apply renames seen by the watcher: [(old path, new path)]. The old path's row is pointed
+        at the new one, keeping its id, tags and extra; an unindexed source is indexed as a new file.
+        Returns the number of files indexed."""
+        moves: List[Tuple[int, Dict[str, object]]] = []
+        indexed = 0
+        for src, dst in pairs:
+            try:
+                if not os.path.isfile(dst):
+                    continue
+                fp = db.get_fingerprint(src)
+                if fp is None:
+                    indexed += int(self.refresh_one(dst))
+                    continue
+                # known={}: build the full record for the new path, whatever is indexed there now
+                rec, _ = self._build_record(dst, compute_hash=False, known={})
+                if rec is not None:
+                    moves.append((fp.id, rec))
+            except Exception:
+                continue
+        return indexed + self._apply_moves(moves)
+
+    def remove_paths(self, paths: Iterable[str] = (), prefixes: Iterable[str] = ()) -> int:
+        """Retire index rows for files (or whole directories) that left the model roots (see db.retire_models)."""
+        missing, deleted = db.retire_models_by_path(paths, prefixes)
+        thumbs.remove_model_media(deleted)
+        return missing + len(deleted)
+
     # core
-    def _run(self, roots: List[str], full: bool):
+    def _run(self, roots: List[str], full: bool, rehash: bool = False):
         try:
+            # One bulk read of everything already indexed; unchanged files then cost no DB access
+            known = db.load_fingerprints()
+            hash_cache = db.load_hash_cache()
+            new_cache: List[db.HashCacheEntry] = []
             # Pre-count files
-            files = list(self._iter_files(roots))
+            walk_errors: List[str] = []
+            files = list(self._iter_files(roots, walk_errors))
             with self._lock:
                 self._stats.total = len(files)
-            for path in files:
-                if self._stop.is_set():
-                    break
-                try:
-                    # In full mode compute hashes; default is no hash computation
-                    self._process_file(path, compute_hash=full)
-                except Exception:
-                    with self._lock:
-                        self._stats.errors += 1
-                finally:
-                    with self._lock:
-                        self._stats.processed += 1
+            unhashed: List[str] = []
+            # Records of paths not indexed before: a vanished row may be one of them under a new name
+            added: Dict[str, Dict[str, object]] = {}
+            # Discovery (stat + classify) runs here while a writer thread persists records in batches
+            records: "queue.Queue" = queue.Queue(maxsize=_WRITE_BATCH * 4)
+            writer = threading.Thread(target=self._write_records, args=(records,), name="hikaze-mm-scan-writer", daemon=True)
+            writer.start()
+            try:
+                for path in files:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        # Index first; full mode then hashes whatever the cache could not resolve
+                        rec, hash_hex = self._build_record(path, compute_hash=False, known=known,
+                                                           hash_cache=hash_cache, cache_out=new_cache)
+                        if rec is not None:
+                            records.put(rec)
+                            if path not in known:
+                                added[path] = rec
+                        if not hash_hex:
+                            unhashed.append(path)
+                    except Exception:
+                        with self._lock:
+                            self._stats.errors += 1
+                    finally:
+                        with self._lock:
+                            self._stats.processed += 1
+            finally:
+                records.put(None)
+                writer.join()
+            db.put_cached_hashes(new_cache)
+            # Only a walk that ran to completion says anything about which files are gone
+            if not self._stop.is_set():
+                self._reconcile(roots, known, set(files), walk_errors, added)
+            if full and not self._stop.is_set():
+                # Indexing still trusted the cache; a forced rehash re-reads everything it walked
+                found: Dict[str, str] = {}
+                self._hash_all(files if rehash else unhashed, found)
+                # New files that only now have a hash may be moved copies of rows kept as missing
+                self._adopt_missing(dict(rec, hash_hex=found[p]) for p, rec in added.items()
+                                    if not rec["hash_hex"] and p in found)
         except Exception as e:
             with self._lock:
                 self._last_error = str(e)
@@ -179,13 +310,90 @@ class Scanner:
             with self._lock:
                 self._running = False
 
-    def _iter_files(self, roots: Iterable[str]) -> Iterable[str]:
-        exts = {e for s in SUPPORTED_EXTS.values() for e in s}
-        exts.update({".safetensors", ".ckpt", ".pth", ".pt", ".bin"})
+    def _reconcile(self, roots: Iterable[str], known: Dict[str, "db.Fingerprint"], seen: set,
+                   walk_errors: List[str], added: Dict[str, Dict[str, object]]) -> None:
+        """Settle rows under the scanned roots that this walk did not find (set difference, no stat calls).
+
+        A row whose file was added under another path in this pass (renamed or moved) takes that
+        path over, keeping its id, tags, extra and images. The others are retired: kept as missing
+        when they carry annotations, else deleted together with their uploaded media.
+        """
+        prefixes = []
+        for root in roots:
+            root_abs = os.path.abspath(root)
+            # An unreachable root (unmounted drive, network share) walks as empty; never read that as deletions
+            if os.path.isdir(root_abs):
+                prefixes.append(root_abs.rstrip(os.sep) + os.sep)
+        if not prefixes:
+            return
+        under = tuple(prefixes)
+        unreadable = tuple(d.rstrip(os.sep) + os.sep for d in walk_errors)
+        stale = [fp for path, fp in known.items()
+                 if path not in seen and path.startswith(under) and not (unreadable and path.startswith(unreadable))]
+        # Rows kept as missing by earlier passes may turn up here too, wherever they used to be
+        elsewhere = [fp for path, fp in known.items()
+                     if fp.missing_since is not None and path not in seen and not path.startswith(under)]
+        moves = self._pair(stale + elsewhere, added)
+        self._apply_moves(moves)
+        moved_ids = {mid for mid, _ in moves}
+        missing, deleted = db.retire_models(fp.id for fp in stale if fp.id not in moved_ids)
+        thumbs.remove_model_media(deleted)
+        with self._lock:
+            self._stats.missing += missing
+            self._stats.removed += len(deleted)
+
+    @staticmethod
+    def _pair(gone: List["db.Fingerprint"], added: Dict[str, Dict[str, object]]) -> List[Tuple[int, Dict[str, object]]]:
+        """Match vanished rows to new records by (inode, size, mtime), else by hash; matched records
+        are taken out of added."""
+        if not gone or not added:
+            return []
+        by_ident: Dict[Tuple[object, object, object], str] = {}
+        by_hash: Dict[str, List[str]] = {}
+        for path, rec in added.items():
+            if rec.get("inode") is not None:
+                by_ident.setdefault((rec["inode"], rec["size_bytes"], rec["mtime_ns"]), path)
+            if rec.get("hash_hex"):
+                by_hash.setdefault(str(rec["hash_hex"]), []).append(path)
+        moves: List[Tuple[int, Dict[str, object]]] = []
+        for fp in gone:
+            hit = None
+            if fp.inode is not None and fp.mtime_ns is not None:
+                hit = by_ident.get((fp.inode, fp.size_bytes, fp.mtime_ns))
+            if (hit is None or hit not in added) and fp.hash_hex:
+                hit = next((p for p in by_hash.get(fp.hash_hex, ()) if p in added), None)
+            if hit is not None and hit in added:
+                moves.append((fp.id, added.pop(hit)))
+        return moves
+
+    def _apply_moves(self, moves: List[Tuple[int, Dict[str, object]]]) -> int:
+        if not moves:
+            return 0
+        moved, replaced = db.move_models(moves)
+        thumbs.remove_model_media(replaced)
+        with self._lock:
+            self._stats.moved += moved
+            # Each move also indexed its new path as a new file
+            self._stats.added -= moved
+        return moved
+
+    def _adopt_missing(self, recs: Iterable[Dict[str, object]]) -> None:
+        moves = []
+        for rec in recs:
+            mid = db.missing_model_for(rec)
+            if mid is not None:
+                moves.append((mid, rec))
+        self._apply_moves(moves)
+
+    def _iter_files(self, roots: Iterable[str], walk_errors: Optional[List[str]] = None) -> Iterable[str]:
         visited: set[str] = set()
         for root in roots:
             root_abs = os.path.abspath(root)
-            for dirpath, dirnames, filenames in os.walk(root_abs, followlinks=True):
+            def onerror(e: OSError, _root=root_abs) -> None:
+                if walk_errors is not None:
+                    walk_errors.append(e.filename or _root)
+
+            for dirpath, dirnames, filenames in os.walk(root_abs, onerror=onerror, followlinks=True):
                 # De-dup: use realpath to prevent link loops
                 try:
                     rp = os.path.realpath(dirpath)
@@ -208,42 +416,218 @@ class Scanner:
                     kept.append(d)
                 dirnames[:] = kept
                 for fn in filenames:
-                    ext = os.path.splitext(fn)[1].lower()
-                    if ext in exts:
+                    if is_model_file(fn):
                         yield os.path.join(dirpath, fn)
 
-    def _sha256_file(self, path: str) -> str:
+    def _write_records(self, records: "queue.Queue") -> None:
+        batch: List[Dict[str, object]] = []
+
+        def flush() -> None:
+            if not batch:
+                return
+            try:
+                db.upsert_models_bulk(batch, commit_every=_WRITE_BATCH)
+            except Exception as e:
+                with self._lock:
+                    self._stats.errors += len(batch)
+                    self._last_error = str(e)
+            batch.clear()
+
+        while True:
+            rec = records.get()
+            if rec is None:
+                break
+            batch.append(rec)
+            if len(batch) >= _WRITE_BATCH:
+                flush()
+        flush()
+
+    def _hash_all(self, files: List[str], found: Optional[Dict[str, str]] = None) -> None:
+        """Hash stage of a full scan: a bounded pool of readers, results persisted in batches
+        (and collected into found, when given)."""
+        todo_st: List[Tuple[str, os.stat_result]] = []
+        for path in files:
+            try:
+                todo_st.append((path, os.stat(path)))
+            except OSError:
+                continue
+        with self._lock:
+            self._stats.phase = "hash"
+            self._stats.hash_files = len(todo_st)
+            self._stats.bytes_total = sum(int(st.st_size) for _, st in todo_st)
+            self._hash_started = time.monotonic()
+
+        def progress(n: int) -> None:
+            with self._lock:
+                self._stats.bytes_hashed += n
+
+        pending: List[Tuple[str, str]] = []
+        pending_cache: List[db.HashCacheEntry] = []
+        last_flush = time.monotonic()
+
+        def flush() -> None:
+            nonlocal last_flush
+            if pending:
+                db.set_hashes(pending, pending_cache)
+                pending.clear()
+                pending_cache.clear()
+            last_flush = time.monotonic()
+
+        todo = iter(todo_st)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self._hash_workers, thread_name_prefix="hikaze-mm-hash") as pool:
+            while True:
+                # Keep a couple of files queued per worker; never materialise thousands of futures
+                while len(in_flight) < self._hash_workers * 2 and not self._stop.is_set():
+                    nxt = next(todo, None)
+                    if nxt is None:
+                        break
+                    fut = pool.submit(self._sha256_file, nxt[0], progress, self._stop)
+                    in_flight[fut] = nxt
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, timeout=_HASH_FLUSH_SEC, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    path, st = in_flight.pop(fut)
+                    try:
+                        digest = fut.result()
+                        pending.append((path, digest))
+                        if found is not None:
+                            found[path] = digest
+                        pending_cache.append(self._cache_entry(st, digest))
+                        with self._lock:
+                            self._stats.hashed += 1
+                    except _ScanStopped:
+                        pass
+                    except Exception:
+                        with self._lock:
+                            self._stats.errors += 1
+                if len(pending) >= _HASH_BATCH or time.monotonic() - last_flush >= _HASH_FLUSH_SEC:
+                    flush()
+        flush()
+
+    def _sha256_file(self, path: str, on_progress: Optional[Callable[[int], None]] = None,
+                     stop: Optional[threading.Event] = None) -> str:
         h = hashlib.sha256()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(1024 * 1024), b""):
-                h.update(chunk)
+        # Large reads into one reused buffer; both readinto and sha256.update release the GIL,
+        # so several of these run truly in parallel from the hash pool
+        buf = bytearray(self._hash_buffer)
+        view = memoryview(buf)
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                n = f.readinto(view)
+                if not n:
+                    break
+                h.update(view[:n])
+                if on_progress is not None:
+                    on_progress(n)
+                if stop is not None and stop.is_set():
+                    raise _ScanStopped(path)
         return h.hexdigest()
 
-    def _process_file(self, path: str, compute_hash: bool):
+    @staticmethod
+    def _cache_entry(st: os.stat_result, hash_hex: str) -> "db.HashCacheEntry":
+        return (int(st.st_dev), int(st.st_ino), int(st.st_size), int(st.st_mtime_ns), hash_hex)
+
+    def _cached_hash(self, st: os.stat_result, hash_cache: Optional[Dict[Tuple[int, int], Tuple[int, int, str]]]) -> str:
+        if hash_cache is None:
+            try:
+                return db.get_cached_hash(int(st.st_dev), int(st.st_ino), int(st.st_size), int(st.st_mtime_ns)) or ""
+            except Exception:
+                return ""
+        hit = hash_cache.get((int(st.st_dev), int(st.st_ino)))
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        return ""
+
+    def _process_file(self, path: str, compute_hash: bool, rehash: bool = False) -> str:
+        """Index one file right away; return its hash ('' when unknown and not computed)."""
+        rec, hash_hex = self._build_record(path, compute_hash, rehash=rehash)
+        if rec is None:
+            return hash_hex
+        # A file new to the index may be one whose row was kept as missing (moved while not watched)
+        mid = db.missing_model_for(rec) if db.get_fingerprint(path) is None else None
+        if mid is not None:
+            db.move_models([(mid, rec)])
+        else:
+            db.upsert_model(**rec)
+        return hash_hex
+
+    def _build_record(self, path: str, compute_hash: bool, known: Optional[Dict[str, "db.Fingerprint"]] = None,
+                      hash_cache: Optional[Dict[Tuple[int, int], Tuple[int, int, str]]] = None,
+                      cache_out: Optional[List["db.HashCacheEntry"]] = None,
+                      rehash: bool = False) -> Tuple[Optional[Dict[str, object]], str]:
+        """Classify one file; return (upsert_model kwargs or None when unchanged, hash).
+
+        In scans, known/hash_cache are the bulk-loaded tables and new hash-cache entries are
+        appended to cache_out for one write at the end; single refreshes hit the DB directly.
+        rehash=True reads the file even when the row or the hash cache already has a hash.
+        """
         st = os.stat(path)
         name = os.path.basename(path)
         size_bytes = int(st.st_size)
         # New classification: first try root mapping or first-level dir under models root
         type_ = self._infer_type_by_roots(path)
-        # Lazy: do not compute hash by default; reuse existing when possible
-        hash_hex = ""
-        if compute_hash:
-            hash_hex = self._sha256_file(path)
+        # ComfyUI loader names are stored with the row instead of being resolved per listing
+        ckpt_name, lora_name = comfy_names(path, type_)
+        if known is not None:
+            fp = known.get(path)
         else:
             try:
-                existing = db.get_model_by_path(path)
+                fp = db.get_fingerprint(path)
             except Exception:
-                existing = None
-            if existing:
-                hash_hex = (existing.get("hash_hex") or "")
-        db.upsert_model(
+                fp = None
+        unchanged = fp is not None and fp.matches(st)
+        cached = self._cached_hash(st, hash_cache)
+
+        def remember(h: str) -> None:
+            if not h or h == cached:
+                return
+            if cache_out is not None:
+                cache_out.append(self._cache_entry(st, h))
+            else:
+                db.put_cached_hashes([self._cache_entry(st, h)])
+
+        if (not rehash and unchanged and fp.missing_since is None and fp.type == type_ and (fp.ckpt_name, fp.lora_name) == (ckpt_name, lora_name)
+                and (fp.hash_hex or not (compute_hash or cached))):
+            remember(fp.hash_hex)
+            with self._lock:
+                self._stats.skipped += 1
+                self._stats.by_type[type_] = self._stats.by_type.get(type_, 0) + 1
+            return None, fp.hash_hex
+        # Hash resolution, cheapest first: the row's own hash while the content is unchanged
+        # (rows indexed before fingerprints existed have no mtime yet: trust a matching size once),
+        # then the identity cache (renames/moves), and only then read the file if asked to
+        hash_hex = self._sha256_file(path) if rehash else ""
+        if not hash_hex and fp is not None and (unchanged or (fp.mtime_ns is None and fp.size_bytes == size_bytes)):
+            hash_hex = fp.hash_hex
+        if not hash_hex:
+            hash_hex = cached
+        if not hash_hex and compute_hash:
+            hash_hex = self._sha256_file(path)
+        remember(hash_hex)
+        # Only new/changed files reach here, so the header is read at most once per content change
+        try:
+            meta_json = metadata.extract_meta_json(path)
+        except Exception:
+            meta_json = None
+        rec = dict(
             path=path,
             name=name,
             type_=type_,
             size_bytes=size_bytes,
             hash_hex=hash_hex,
             created_at_ms=int(time.time() * 1000),
-            meta_json=None,
+            meta_json=meta_json,
+            mtime_ns=int(st.st_mtime_ns),
+            inode=int(st.st_ino),
+            ckpt_name=ckpt_name,
+            lora_name=lora_name,
         )
         with self._lock:
+            if fp is None:
+                self._stats.added += 1
+            else:
+                self._stats.updated += 1
             self._stats.by_type[type_] = self._stats.by_type.get(type_, 0) + 1
+        return rec, hash_hex
@@ -5,13 +5,16 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import queue
 import sys
+import threading
+import time
 from http.server import HTTPServer
-from typing import Optional
+from typing import Any, Dict, Optional
 
 try:
-    from .config import AppConfig  # type: ignore
-    from . import db  # type: ignore
+    from .config import AppConfig, DEFAULT_WORKERS, DEFAULT_QUEUE_SIZE  # type: ignore
+    from . import api, archive, db  # type: ignore
     from .scanner import Scanner  # type: ignore
     # New: import the split-out HTTP handler
     from .http_handler import ApiHandler, set_context  # type: ignore
@@ -33,11 +36,15 @@ except Exception:
 
     _config = _load_local("hikaze_mm_config", "config.py")
     db = _load_local("hikaze_mm_db", "db.py")
+    api = _load_local("hikaze_mm_api", "api.py")
+    archive = _load_local("hikaze_mm_archive", "archive.py")
     _scanner_mod = _load_local("hikaze_mm_scanner", "scanner.py")
     # New: locally load http_handler
     _http_handler = _load_local("hikaze_mm_http_handler", "http_handler.py")
 
     AppConfig = _config.AppConfig
+    DEFAULT_WORKERS = _config.DEFAULT_WORKERS
+    DEFAULT_QUEUE_SIZE = _config.DEFAULT_QUEUE_SIZE
     Scanner = _scanner_mod.Scanner
     # New: bind http_handler symbols
     ApiHandler = _http_handler.ApiHandler
@@ -48,62 +55,193 @@ VERSION = "0.2.0"
 _cfg: Optional[AppConfig] = None
 _scanner: Optional[Scanner] = None
 
+# Startup progress, reported by /health: state is starting | ready | failed
+_startup: Dict[str, Any] = {"state": "starting"}
+# Set once the server is listening (the plugin starts it in the background instead of sleeping)
+ready = threading.Event()
+
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    """Block until the server accepts connections (or timeout); True if it does."""
+    return ready.wait(timeout) and _startup.get("state") == "ready"
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands accepted connections to a fixed pool of worker threads.
+
+    Connections wait in a bounded queue; once it is full new connections get an
+    immediate 503 instead of piling up behind slow requests.
+    """
+
+    request_queue_size = 128  # listen backlog; the real admission limit is the work queue
+
+    _BUSY_RESPONSE = (
+        b"HTTP/1.0 503 Service Unavailable\r\n"
+        b"Content-Type: application/json; charset=utf-8\r\n"
+        b"Retry-After: 1\r\n"
+        b"Connection: close\r\n"
+        b"\r\n"
+        b'{"error":{"code":"BUSY","message":"server busy, retry later"}}'
+    )
+
+    def __init__(self, server_address, handler_cls, workers: int = 8, queue_size: int = 64):
+        super().__init__(server_address, handler_cls)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            t = threading.Thread(target=self._worker, name=f"hikaze-mm-http-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def process_request(self, request, client_address):
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            try:
+                request.sendall(self._BUSY_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        for _ in self._workers:
+            self._queue.put(None)
+
+
+def make_server(host: str, port: int, workers: int = 0, queue_size: int = 64) -> HTTPServer:
+    """Create the API server; workers <= 0 keeps the legacy single-threaded mode."""
+    if workers and workers > 0:
+        return PooledHTTPServer((host, port), ApiHandler, workers=workers, queue_size=queue_size)
+    return HTTPServer((host, port), ApiHandler)
+
 
 def _init_server() -> None:
     """Initialize server state"""
     global _cfg, _scanner
 
     if _cfg is None:
+        t0 = time.perf_counter()
         _cfg = AppConfig.load()
+        _startup["config_ms"] = round((time.perf_counter() - t0) * 1000, 1)
         print(f"[Hikaze MM] Config loaded: {_cfg.model_roots}")
 
     if _scanner is None:
-        db.init_db()
+        # The schema check (db.init_db) runs on the first database access, not here
+        # Nodes in this process may now read the catalog directly instead of over HTTP
+        api.set_ready()
         # Fix: Scanner requires config instance
         _scanner = Scanner(_cfg)
         print("[Hikaze MM] Scanner initialized")
+        if getattr(_cfg, "watch", False) and _scanner.watch_start():
+            print("[Hikaze MM] Watching model roots for changes")
 
     # Inject context (version, config, scanner) into ApiHandler
-    set_context(_cfg, _scanner, VERSION)
+    set_context(_cfg, _scanner, VERSION, startup=_startup)
 
 
-def main(host: str = None, port: int = None) -> None:
+def _mark_failed(e: BaseException) -> None:
+    # Only a failure before listening is a startup failure
+    if not ready.is_set():
+        _startup.update(state="failed", error=str(e))
+        ready.set()
+
+
+def main(host: str = None, port: int = None, workers: int = None, queue_size: int = None,
+         started_at: Optional[float] = None) -> None:
     """
     Start the HTTP server
 
     Args:
         host: Server bind address
         port: Server port
+        workers: Worker thread count (0 = single-threaded)
+        queue_size: Max connections waiting for a worker before answering 503
+        started_at: time.perf_counter() when the caller began starting the backend (for /health)
     """
     global _cfg
 
-    _init_server()
+    t0 = started_at if started_at is not None else time.perf_counter()
+    try:
+        _init_server()
+    except Exception as e:
+        _mark_failed(e)
+        raise
 
     if host is None:
         host = _cfg.host
     if port is None:
         port = _cfg.port
+    if workers is None:
+        workers = _cfg.workers
+    if queue_size is None:
+        queue_size = _cfg.queue_size
 
     try:
-        server = HTTPServer((host, port), ApiHandler)
-        print(f"[Hikaze MM] Server running on http://{host}:{port}")
+        server = make_server(host, port, workers=workers, queue_size=queue_size)
+        _startup.update(state="ready", ready_ms=round((time.perf_counter() - t0) * 1000, 1))
+        ready.set()
+        mode = f"{workers} workers, queue {queue_size}" if workers > 0 else "single-threaded"
+        print(f"[Hikaze MM] Server running on http://{host}:{server.server_address[1]} ({mode}, ready in {_startup['ready_ms']} ms)")
         server.serve_forever()
     except KeyboardInterrupt:
         print("[Hikaze MM] Server stopped by user")
     except OSError as e:
+        _mark_failed(e)
         if "Address already in use" in str(e):
             print(f"[Hikaze MM] Port {port} is already in use")
         else:
             print(f"[Hikaze MM] Server error: {e}")
     except Exception as e:
+        _mark_failed(e)
         print(f"[Hikaze MM] Unexpected server error: {e}")
 
 
+def run_transfer(export_path: Optional[str] = None, import_path: Optional[str] = None, media: bool = True) -> None:
+    """CLI: write the catalog archive to export_path, or apply the one at import_path (no server)."""
+    t0 = time.perf_counter()
+    if export_path:
+        tmp = export_path + ".part"
+        try:
+            with open(tmp, "wb") as f:
+                counts = archive.export_archive(f, media=media)
+            os.replace(tmp, export_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        print(f"[Hikaze MM] Exported {counts['models']} models, {counts['media']} images to {export_path}"
+              f" ({counts['skipped_unhashed']} annotated models skipped: not hashed yet)")
+    if import_path:
+        with open(import_path, "rb") as f:
+            counts = archive.import_archive(f, media=media)
+        print(f"[Hikaze MM] Imported {import_path}: {counts['matched']}/{counts['records']} records matched,"
+              f" {counts['models_updated']} models updated, {counts['media']} images")
+    print(f"[Hikaze MM] Done in {time.perf_counter() - t0:.1f}s")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hikaze Model Manager HTTP Server")
     parser.add_argument("--host", default="127.0.0.1", help="Server host (default: 127.0.0.1)")
     parser.add_argument("--port", type=int, default=8789, help="Server port (default: 8789)")
     parser.add_argument("--config", help="Config file path")
+    parser.add_argument("--workers", type=int, default=None, help="HTTP worker threads (0 = single-threaded)")
+    parser.add_argument("--queue-size", type=int, default=None, help="Max queued connections before 503")
+    parser.add_argument("--export", metavar="PATH", help="Write the catalog archive (tags, extra, images) to PATH and exit")
+    parser.add_argument("--import", dest="import_path", metavar="PATH", help="Apply a catalog archive by content hash and exit")
+    parser.add_argument("--no-media", action="store_true", help="Leave preview images out of --export/--import")
 
     args = parser.parse_args()
 
@@ -115,9 +253,19 @@ if __name__ == "__main__":
             _cfg = AppConfig(
                 host=config_data.get('host', args.host),
                 port=config_data.get('port', args.port),
-                model_roots=config_data.get('model_roots', [])
+                model_roots=config_data.get('model_roots', []),
+                workers=int(config_data.get('workers', DEFAULT_WORKERS)),
+                queue_size=int(config_data.get('queue_size', DEFAULT_QUEUE_SIZE)),
             )
         except Exception as e:
             print(f"[Hikaze MM] Warning: Failed to load config file: {e}")
 
-    main(args.host, args.port)
+    if args.export or args.import_path:
+        try:
+            run_transfer(args.export, args.import_path, media=not args.no_media)
+        except (OSError, ValueError) as e:
+            print(f"[Hikaze MM] Transfer failed: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    main(args.host, args.port, workers=args.workers, queue_size=args.queue_size)
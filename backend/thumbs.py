@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Preview thumbnails: size-bucketed WebP/JPEG variants of uploaded images, cached on disk.
+
+Pillow is optional (ComfyUI ships it); without it every request falls back to the original.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .paths import MEDIA_DIR, THUMBS_DIR  # type: ignore
+except Exception:
+    _DATA_DIR = os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)), "data")
+    MEDIA_DIR = os.path.join(_DATA_DIR, "images")
+    THUMBS_DIR = os.path.join(_DATA_DIR, "thumbs")
+
+try:
+    from PIL import Image, ImageOps, features  # type: ignore
+except Exception:  # Pillow not installed
+    Image = None  # type: ignore
+
+# Requested sizes round up to one of these (longest side, px); anything larger gets the original
+SIZES = (128, 256, 512, 1024)
+# Grid cards and the hover preview both use this bucket; uploads pre-render it
+GRID_SIZE = 512
+# Raster formats worth shrinking (SVG is vector, GIF may be animated)
+_SOURCE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp"}
+DEFAULT_CACHE_MB = 256
+
+_cache_limit = DEFAULT_CACHE_MB * 1024 * 1024
+_cache_bytes: Optional[int] = None  # lazily measured on first write
+_state_lock = threading.Lock()
+_key_locks: Dict[str, threading.Lock] = {}
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def set_cache_limit(mb: int) -> None:
+    global _cache_limit
+    _cache_limit = max(1, int(mb)) * 1024 * 1024
+
+
+def _webp() -> bool:
+    try:
+        return bool(features.check("webp"))
+    except Exception:
+        return False
+
+
+def bucket(size: int) -> Optional[int]:
+    for s in SIZES:
+        if size <= s:
+            return s
+    return None
+
+
+def content_type(thumb_path: str) -> str:
+    return "image/webp" if thumb_path.endswith(".webp") else "image/jpeg"
+
+
+def _thumb_path(src: str, size: int) -> str:
+    ext = ".webp" if _webp() else ".jpg"
+    return os.path.join(THUMBS_DIR, f"{os.path.basename(src)}.{size}{ext}")
+
+
+def variants(src: str) -> List[str]:
+    """Every cached thumbnail file of a source image (for cleanup when it is replaced)."""
+    base = os.path.basename(src) + "."
+    try:
+        return [os.path.join(THUMBS_DIR, n) for n in os.listdir(THUMBS_DIR) if n.startswith(base)]
+    except OSError:
+        return []
+
+
+def remove_replaced_media(model_id: int, old_urls, keep: Iterable[str] = ()) -> None:
+    """Delete a model's previous uploads (and their thumbnails) once its new images are recorded."""
+    keep = set(keep)
+    for url in old_urls or []:
+        if not isinstance(url, str) or url in keep or not url.startswith("/media/"):
+            continue
+        name = url[len("/media/"):]
+        # Only files uploaded or imported for this model; anything else may be shared or hand-placed
+        if "/" in name or "\\" in name or not name.startswith(f"model_{int(model_id)}_"):
+            continue
+        for p in [os.path.join(MEDIA_DIR, name)] + variants(name):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def remove_model_media(model_ids: Iterable[int]) -> int:
+    """Delete the uploads of removed models (model_<id>_* in MEDIA_DIR) and their thumbnails.
+
+    Thumbnail names start with their source's name, so one prefix test covers both directories.
+    Returns the number of uploads removed.
+    """
+    prefixes = tuple(f"model_{int(i)}_" for i in model_ids)
+    if not prefixes:
+        return 0
+    removed = 0
+    for d in (MEDIA_DIR, THUMBS_DIR):
+        try:
+            names = os.listdir(d)
+        except OSError:
+            continue
+        for n in names:
+            if not n.startswith(prefixes):
+                continue
+            try:
+                os.remove(os.path.join(d, n))
+            except OSError:
+                continue
+            if d == MEDIA_DIR:
+                removed += 1
+    return removed
+
+
+def _render(src: str, dst: str, size: int) -> None:
+    with Image.open(src) as im:
+        # JPEG can decode at 1/2..1/8 scale straight away
+        im.draft("RGB", (size, size))
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail((size, size), Image.LANCZOS)
+        tmp = f"{dst}.{threading.get_ident()}.tmp"
+        if dst.endswith(".webp"):
+            if im.mode not in ("RGB", "RGBA"):
+                im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+            im.save(tmp, "WEBP", quality=80, method=4)
+        else:
+            im.convert("RGB").save(tmp, "JPEG", quality=82, optimize=True, progressive=True)
+    os.replace(tmp, dst)
+
+
+def get(src: str, size: int) -> Optional[str]:
+    """Path of the size-bucketed thumbnail of src, rendering it on first use; None = use the original."""
+    if Image is None or os.path.splitext(src)[1].lower() not in _SOURCE_EXTS:
+        return None
+    b = bucket(size)
+    if b is None:
+        return None
+    try:
+        src_mtime = os.stat(src).st_mtime_ns
+    except OSError:
+        return None
+    dst = _thumb_path(src, b)
+    try:
+        if os.stat(dst).st_mtime_ns >= src_mtime:
+            return dst
+    except OSError:
+        pass
+    # One renderer per thumbnail; concurrent requests for it wait and then reuse the file
+    with _state_lock:
+        lock = _key_locks.setdefault(dst, threading.Lock())
+    with lock:
+        try:
+            if os.stat(dst).st_mtime_ns >= src_mtime:
+                return dst
+        except OSError:
+            pass
+        try:
+            os.makedirs(THUMBS_DIR, exist_ok=True)
+            _render(src, dst, b)
+        except Exception:
+            return None
+        finally:
+            with _state_lock:
+                _key_locks.pop(dst, None)
+    try:
+        _account(os.path.getsize(dst))
+    except OSError:
+        pass
+    return dst
+
+
+def warm(src: str, sizes: Tuple[int, ...] = (GRID_SIZE,)) -> None:
+    """Render the usual variants of a fresh upload in the background."""
+    if Image is None:
+        return
+
+    def run() -> None:
+        for s in sizes:
+            get(src, s)
+
+    threading.Thread(target=run, name="hikaze-mm-thumbs", daemon=True).start()
+
+
+def _account(added: int) -> None:
+    global _cache_bytes
+    with _state_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for _, _, size in _entries())
+        else:
+            _cache_bytes += added
+        over = _cache_bytes > _cache_limit
+    if over:
+        _evict()
+
+
+def _entries() -> List[Tuple[float, str, int]]:
+    out = []
+    try:
+        with os.scandir(THUMBS_DIR) as it:
+            for e in it:
+                if e.is_file() and not e.name.endswith(".tmp"):
+                    st = e.stat()
+                    out.append((max(st.st_atime, st.st_mtime), e.path, st.st_size))
+    except OSError:
+        pass
+    return out
+
+
+def _evict() -> None:
+    """Drop least recently used thumbnails until the cache is back under 90% of its limit."""
+    global _cache_bytes
+    entries = sorted(_entries())
+    total = sum(size for _, _, size in entries)
+    target = int(_cache_limit * 0.9)
+    for _, path, size in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
+    with _state_lock:
+        _cache_bytes = total
@@ -6,6 +6,16 @@ import json
 import os
 from typing import Any, Optional
 
+try:
+    from . import roots  # type: ignore
+except Exception:
+    # Fallback for script-run context
+    import importlib.util, sys as _sys
+    _spec = importlib.util.spec_from_file_location("hikaze_mm_roots", os.path.join(os.path.dirname(__file__), "roots.py"))
+    roots = importlib.util.module_from_spec(_spec)  # type: ignore[arg-type]
+    _sys.modules["hikaze_mm_roots"] = roots
+    _spec.loader.exec_module(roots)  # type: ignore[union-attr]
+
 
 def json_dumps_bytes(obj: Any) -> bytes:
     return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
@@ -20,48 +30,16 @@ def json_loads_bytes(data: bytes) -> Any:
 # Compute relative path under checkpoints domain (ckpt_name) to be compatible with ComfyUI official loader
 
 def calc_ckpt_name(abs_path: str) -> Optional[str]:
-    try:
-        import folder_paths  # type: ignore
-    except Exception:
-        return None
-    try:
-        ap = os.path.abspath(abs_path)
-        roots = list(folder_paths.get_folder_paths("checkpoints"))  # type: ignore
-        for r in roots:
-            try:
-                rabs = os.path.abspath(r)
-                common = os.path.commonpath([os.path.normcase(rabs), os.path.normcase(ap)])
-                if common == os.path.normcase(rabs):
-                    rel = os.path.relpath(ap, rabs).replace("\\", "/")
-                    return rel
-            except Exception:
-                continue
-        # If no root matches, fallback to filename
-        return os.path.basename(ap)
-    except Exception:
-        return None
+    return calc_rel_in_domain(abs_path, "checkpoints")
 
 
-# Generic relative path helper within a given domain
+# Generic relative path helper within a given domain (None outside ComfyUI)
 
 def calc_rel_in_domain(abs_path: str, domain: str) -> Optional[str]:
     try:
-        import folder_paths  # type: ignore
-    except Exception:
-        return None
-    try:
-        ap = os.path.abspath(abs_path)
-        roots = list(folder_paths.get_folder_paths(domain))  # type: ignore
-        for r in roots:
-            try:
-                rabs = os.path.abspath(r)
-                common = os.path.commonpath([os.path.normcase(rabs), os.path.normcase(ap)])
-                if common == os.path.normcase(rabs):
-                    rel = os.path.relpath(ap, rabs).replace("\\", "/")
-                    return rel
-            except Exception:
-                continue
-        return os.path.basename(ap)
+        matcher = roots.for_domain(domain)
+        # If no root matches, fallback to filename
+        return matcher.rel_name(abs_path) if matcher is not None else None
     except Exception:
         return None
 
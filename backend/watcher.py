@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""Live index updates: filesystem events (inotify on Linux) or periodic snapshots (elsewhere)"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Event kinds queued for the debouncer (the latest event for a path wins)
+CHANGED = "changed"        # file created/rewritten/moved in: index it
+GONE = "gone"              # file deleted/moved out: drop its row
+DIR_ADDED = "dir_added"    # directory created/moved in: index everything below it
+DIR_GONE = "dir_gone"      # directory deleted/moved out: drop every row below it
+MOVED = "moved"            # file renamed within the roots: its row follows it (id, tags, extra kept)
+DIR_MOVED = "dir_moved"    # directory renamed within the roots: the rows below it follow it
+
+# Filesystems where inotify only sees local writes; these roots are polled instead
+_NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs",
+               "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "davfs", "fuse.davfs2"}
+
+# emit(path, kind[, source path of a MOVED / DIR_MOVED])
+Emit = Callable[..., None]
+
+# IN_MOVED_FROM halves kept for pairing; a source whose IN_MOVED_TO never comes left the roots
+_MAX_MOVE_COOKIES = 1024
+
+
+def _mount_types() -> List[Tuple[str, str]]:
+    """(mount point, fstype) pairs, longest mount point first; empty off Linux."""
+    out: List[Tuple[str, str]] = []
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    # mount points escape spaces as \040
+                    out.append((parts[1].replace("\\040", " "), parts[2]))
+    except OSError:
+        return []
+    out.sort(key=lambda x: len(x[0]), reverse=True)
+    return out
+
+
+def is_network_path(path: str, mounts: Optional[List[Tuple[str, str]]] = None) -> bool:
+    mounts = _mount_types() if mounts is None else mounts
+    rp = os.path.realpath(path)
+    for mnt, fstype in mounts:
+        if rp == mnt or rp.startswith(mnt.rstrip("/") + "/"):
+            return fstype in _NETWORK_FS
+    return False
+
+
+class _InotifyBackend:
+    """Recursive inotify watches (one per directory) read with ctypes; no third-party deps."""
+
+    name = "inotify"
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    # Files are picked up once fully written (CLOSE_WRITE) or moved in; IN_MODIFY would fire per write()
+    _MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+             | IN_DELETE_SELF | IN_MOVE_SELF)
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, roots: List[str], emit: Emit, on_overflow: Callable[[], None]):
+        self._roots = roots
+        self._emit = emit
+        self._on_overflow = on_overflow
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+        self._wd_to_dir: Dict[int, str] = {}
+        self._dir_to_wd: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # cookie -> source path of an IN_MOVED_FROM waiting for its IN_MOVED_TO
+        self._moved_from: "OrderedDict[int, str]" = OrderedDict()
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux")
+
+    def watched(self) -> int:
+        with self._lock:
+            return len(self._wd_to_dir)
+
+    def _add_watch(self, d: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), self._MASK | self.IN_ONLYDIR)
+        if wd < 0:
+            return  # vanished or permission denied: the directory simply goes unwatched
+        with self._lock:
+            old = self._wd_to_dir.get(wd)
+            if old is not None:
+                self._dir_to_wd.pop(old, None)
+            self._wd_to_dir[wd] = d
+            self._dir_to_wd[d] = wd
+
+    def add_tree(self, top: str) -> None:
+        seen: Set[Tuple[int, int]] = set()
+        for dirpath, dirnames, _ in os.walk(top, followlinks=True):
+            try:
+                st = os.stat(dirpath)
+                key = (st.st_dev, st.st_ino)
+            except OSError:
+                dirnames[:] = []
+                continue
+            if key in seen:
+                dirnames[:] = []
+                continue
+            seen.add(key)
+            self._add_watch(dirpath)
+
+    def _forget_tree(self, top: str) -> None:
+        prefix = top.rstrip(os.sep) + os.sep
+        with self._lock:
+            for d in [d for d in self._dir_to_wd if d == top or d.startswith(prefix)]:
+                wd = self._dir_to_wd.pop(d)
+                self._wd_to_dir.pop(wd, None)
+
+    def run(self, stop: threading.Event) -> None:
+        for r in self._roots:
+            self.add_tree(r)
+        try:
+            while not stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    buf = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(buf)
+        finally:
+            os.close(self._fd)
+
+    def _moved_source(self, mask: int, cookie: int, path: str) -> Optional[str]:
+        """Pair the two halves of a rename: remember IN_MOVED_FROM, return its path on IN_MOVED_TO."""
+        if not cookie:
+            return None
+        if mask & self.IN_MOVED_FROM:
+            self._moved_from[cookie] = path
+            while len(self._moved_from) > _MAX_MOVE_COOKIES:
+                self._moved_from.popitem(last=False)
+            return None
+        if mask & self.IN_MOVED_TO:
+            return self._moved_from.pop(cookie, None)
+        return None
+
+    def _dispatch(self, buf: bytes) -> None:
+        off = 0
+        size = self._EVENT.size
+        while off + size <= len(buf):
+            wd, mask, cookie, nlen = self._EVENT.unpack_from(buf, off)
+            name = os.fsdecode(buf[off + size:off + size + nlen].rstrip(b"\0"))
+            off += size + nlen
+            if mask & self.IN_Q_OVERFLOW:
+                self._on_overflow()
+                continue
+            with self._lock:
+                d = self._wd_to_dir.get(wd)
+            if d is None:
+                continue
+            if mask & self.IN_IGNORED:
+                with self._lock:
+                    self._wd_to_dir.pop(wd, None)
+                    if self._dir_to_wd.get(d) == wd:
+                        self._dir_to_wd.pop(d, None)
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF) or not name:
+                continue  # reported by the parent directory's watch
+            path = os.path.join(d, name)
+            # The source half is reported as gone; the destination half, if it comes, turns it into a move
+            src = self._moved_source(mask, cookie, path)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Watch first, then let the debouncer walk it, so nothing created meanwhile is missed
+                    self.add_tree(path)
+                    if src is not None:
+                        self._emit(path, DIR_MOVED, src)
+                    else:
+                        self._emit(path, DIR_ADDED)
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    self._forget_tree(path)
+                    self._emit(path, DIR_GONE)
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                if src is not None:
+                    self._emit(path, MOVED, src)
+                else:
+                    self._emit(path, CHANGED)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self._emit(path, GONE)
+
+
+class _PollBackend:
+    """Snapshot diff of (size, mtime) every interval; no DB access and no realpath per directory."""
+
+    name = "poll"
+
+    def __init__(self, roots: List[str], emit: Emit, accept: Callable[[str], bool], interval: float):
+        self._roots = roots
+        self._emit = emit
+        self._accept = accept
+        self._interval = max(1.0, float(interval))
+        self._snapshot: Dict[str, Tuple[int, int]] = {}
+        self._dirs: Set[str] = set()
+
+    def watched(self) -> int:
+        return len(self._dirs)
+
+    def _take(self) -> Tuple[Dict[str, Tuple[int, int]], Set[str], Set[str]]:
+        """Return (files, listed dirs, dirs that could not be listed for reasons other than absence)."""
+        files: Dict[str, Tuple[int, int]] = {}
+        dirs: Set[str] = set()
+        failed: Set[str] = set()
+        seen: Set[Tuple[int, int]] = set()
+        stack = list(self._roots)
+        while stack:
+            d = stack.pop()
+            try:
+                st = os.stat(d)
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+                entries = list(os.scandir(d))
+            except FileNotFoundError:
+                continue
+            except OSError:
+                failed.add(d)
+                continue
+            dirs.add(d)
+            for e in entries:
+                try:
+                    if e.is_dir():
+                        stack.append(e.path)
+                    elif self._accept(e.name):
+                        est = e.stat()
+                        files[e.path] = (est.st_size, est.st_mtime_ns)
+                except OSError:
+                    continue
+        return files, dirs, failed
+
+    def run(self, stop: threading.Event) -> None:
+        self._snapshot, self._dirs, _ = self._take()
+        while not stop.wait(self._interval):
+            files, dirs, failed = self._take()
+            # A root that is unreachable this round (share offline) is not a mass deletion: skip the diff
+            if any(r not in dirs for r in self._roots):
+                continue
+            keep = tuple(d.rstrip(os.sep) + os.sep for d in failed)
+            for p, sig in files.items():
+                if self._snapshot.get(p) != sig:
+                    self._emit(p, CHANGED)
+            for p in self._snapshot.keys() - files.keys():
+                if keep and p.startswith(keep):
+                    files[p] = self._snapshot[p]
+                else:
+                    self._emit(p, GONE)
+            self._snapshot, self._dirs = files, dirs
+
+
+class Watcher:
+    """Debounces filesystem events and applies them to the index through the scanner.
+
+    The scanner object supplies refresh_one(path), move_paths(pairs), remove_paths(paths, prefixes),
+    iter_model_files(roots), start(paths=...) and is_model_file(name).
+    """
+
+    def __init__(self, scanner, roots: Iterable[str], debounce_sec: float = 2.0, poll_sec: float = 30.0):
+        self._scanner = scanner
+        self._roots = [os.path.abspath(r) for r in roots if r and os.path.isdir(r)]
+        self._debounce = max(0.1, float(debounce_sec))
+        self._poll_sec = poll_sec
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        # Pending MOVED / DIR_MOVED (or since-vanished) destination -> original source path
+        self._moves: Dict[str, str] = {}
+        self._threads: List[threading.Thread] = []
+        self._backends: list = []
+        self._stats = {"events": 0, "indexed": 0, "removed": 0, "rescans": 0, "errors": 0}
+        self._last_event_ms: Optional[int] = None
+        self._started_ms: Optional[int] = None
+        # Set when an overflow rescan could not start because a scan was running
+        self._rescan_pending = False
+
+    # --- lifecycle ---
+    def start(self) -> None:
+        local, remote = [], []
+        mounts = _mount_types()
+        for r in self._roots:
+            (remote if is_network_path(r, mounts) else local).append(r)
+        if local and _InotifyBackend.available():
+            try:
+                self._backends.append(_InotifyBackend(local, self._push, self._overflow))
+            except OSError:
+                remote.extend(local)
+        else:
+            remote.extend(local)
+        if remote:
+            self._backends.append(_PollBackend(remote, self._push, self._scanner.is_model_file, self._poll_sec))
+        for b in self._backends:
+            t = threading.Thread(target=self._guard, args=(b.run,), name=f"hikaze-mm-watch-{b.name}", daemon=True)
+            self._threads.append(t)
+        self._threads.append(threading.Thread(target=self._guard, args=(self._drain,),
+                                              name="hikaze-mm-watch-apply", daemon=True))
+        self._started_ms = int(time.time() * 1000)
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "running": self.running,
+                "roots": list(self._roots),
+                "backends": [{"type": b.name, "dirs": b.watched()} for b in self._backends],
+                "pending": len(self._pending),
+                "rescan_pending": self._rescan_pending,
+                "debounce_sec": self._debounce,
+                "stats": dict(self._stats),
+                "last_event": self._last_event_ms,
+                "started": self._started_ms,
+            }
+
+    def _guard(self, fn: Callable[..., None]) -> None:
+        try:
+            fn(self._stop)
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+
+    # --- event intake ---
+    def _push(self, path: str, kind: str, src: Optional[str] = None) -> None:
+        if kind == MOVED and not self._scanner.is_model_file(os.path.basename(src or "")):
+            # Renamed into a model name (e.g. a finished download): a plain arrival
+            kind, src = CHANGED, None
+        if kind in (CHANGED, GONE, MOVED) and not self._scanner.is_model_file(os.path.basename(path)):
+            # Renamed out of a model name: the GONE already queued for the source covers it
+            return
+        with self._lock:
+            due = time.monotonic() + self._debounce
+            if kind in (MOVED, DIR_MOVED):
+                # The pair replaces the GONE queued for the source; renames in a row keep the first source
+                self._pending.pop(src, None)
+                origin = self._moves.pop(src, src)
+                replaced = self._moves.get(path)
+                if replaced is not None and replaced != origin:
+                    # An earlier move onto this path was overwritten: that file is gone after all
+                    self._pending[replaced] = (GONE if kind == MOVED else DIR_GONE, due)
+                self._moves[path] = origin
+            elif kind == CHANGED and self._pending.get(path, ("",))[0] == MOVED:
+                # Written to after the rename: applying the move indexes the file as it is then
+                kind = MOVED
+            self._pending[path] = (kind, due)
+            self._stats["events"] += 1
+            self._last_event_ms = int(time.time() * 1000)
+
+    def _overflow(self) -> None:
+        # The kernel dropped events: a fingerprint rescan is cheap and catches up exactly
+        with self._lock:
+            self._rescan_pending = True
+        self._try_rescan()
+
+    def _try_rescan(self) -> None:
+        """Start the pending rescan; while another scan runs (start() returns False) it stays
+        pending and the apply loop retries, since that scan may have walked before the lost events."""
+        with self._lock:
+            if not self._rescan_pending:
+                return
+        if not self._scanner.start(paths=self._roots):
+            return
+        with self._lock:
+            self._rescan_pending = False
+            self._stats["rescans"] += 1
+
+    # --- applying ---
+    def _drain(self, stop: threading.Event) -> None:
+        while not stop.wait(min(0.5, self._debounce)):
+            self._try_rescan()
+            now = time.monotonic()
+            with self._lock:
+                due = [(p, k) for p, (k, t) in self._pending.items() if t <= now]
+                sources: Dict[str, str] = {}
+                for p, k in list(due):
+                    self._pending.pop(p, None)
+                    src = self._moves.pop(p, None)
+                    if src is None:
+                        continue
+                    if k in (MOVED, DIR_MOVED):
+                        sources[p] = src
+                    else:
+                        # Moved, then deleted or moved out: the original source is what is gone
+                        due.append((src, DIR_GONE if k in (DIR_GONE, DIR_ADDED) else GONE))
+            if due:
+                self._apply(due, sources)
+
+    def _apply(self, due: List[Tuple[str, str]], sources: Optional[Dict[str, str]] = None) -> None:
+        sources = sources or {}
+        gone = [p for p, k in due if k == GONE]
+        gone_dirs = [p.rstrip(os.sep) + os.sep for p, k in due if k == DIR_GONE]
+        changed = [p for p, k in due if k == CHANGED]
+        moves: List[Tuple[str, str]] = []
+        for p, k in due:
+            src = sources.get(p)
+            if k == DIR_ADDED or (k == DIR_MOVED and src is None):
+                changed.extend(self._scanner.iter_model_files([p]))
+            elif k == MOVED:
+                if src is not None:
+                    moves.append((src, p))
+                else:
+                    changed.append(p)
+            elif k == DIR_MOVED:
+                for f in self._scanner.iter_model_files([p]):
+                    moves.append((src + f[len(p):], f))
+                # Rows still below the old directory afterwards had no file in the new one
+                gone_dirs.append(src.rstrip(os.sep) + os.sep)
+        indexed = 0
+        if moves:
+            try:
+                indexed += self._scanner.move_paths(moves)
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+        # A path can be gone by one report and back by another (atomic replace); trust the disk
+        gone = [p for p in gone if not os.path.exists(p)]
+        gone_dirs = [d for d in gone_dirs if not os.path.isdir(d)]
+        removed = 0
+        if gone or gone_dirs:
+            try:
+                removed = self._scanner.remove_paths(gone, gone_dirs)
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+        for p in changed:
+            if self._stop.is_set():
+                break
+            if self._scanner.refresh_one(p):
+                indexed += 1
+        with self._lock:
+            self._stats["indexed"] += indexed
+            self._stats["removed"] += removed
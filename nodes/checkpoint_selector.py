@@ -11,6 +11,9 @@ from typing import Tuple, Optional, Dict, Any, List
 import os
 import time
 import json
+import hashlib
+import shutil
+import threading
 import urllib.request
 import urllib.parse
 
@@ -39,6 +42,14 @@ class HikazeCheckpointSelector:
     CATEGORY = "hikaze/loaders"
     DESCRIPTION = "通过下拉或选择器选择并加载 checkpoint（行为与官方 CheckpointLoaderSimple 对齐）。"
 
+    # Preview payloads per ckpt_name: (fetched_at monotonic, payload); rebuilt in the background once stale
+    _PAYLOAD_TTL_SEC = 30.0
+    # "No preview" (none uploaded yet, backend unreachable) is only reused briefly, then rebuilt in the foreground
+    _EMPTY_TTL_SEC = 5.0
+    _payload_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+    _payload_refreshing: set = set()
+    _payload_lock = threading.Lock()
+
     # --- Helpers for backend integration ---
     @staticmethod
     def _plugin_root_dir() -> str:
@@ -78,78 +89,98 @@ class HikazeCheckpointSelector:
             return None
 
     @staticmethod
-    def _download_to_temp(image_url: str) -> Optional[Dict[str, str]]:
+    def _backend_api():
+        """The in-process query API when the backend runs in this process, else None (use HTTP)."""
+        try:
+            from ..backend import api  # type: ignore
+        except Exception:
+            return None
+        return api if api.available() else None
+
+    @staticmethod
+    def _download_to_temp(image_url: str, local_path: Optional[str] = None) -> Optional[Dict[str, str]]:
         """
         Download an image into ComfyUI's temp directory and return {filename, subfolder, type}.
-        Supports either /media/ relative path or a full URL.
+        Supports either /media/ relative path or a full URL; with local_path the file is copied instead.
+        The file name is derived from the URL path (uploads never change in place), so repeated runs
+        reuse the copy already on disk instead of downloading a new duplicate each time.
         """
+        tmp_path = None
         try:
             # Normalize URL: if it's relative, the caller must prepend http://host:port
             base_dir = folder_paths.get_temp_directory()
             os.makedirs(base_dir, exist_ok=True)
             # Parse filename and extension
             parsed = urllib.parse.urlparse(image_url)
-            if not parsed.scheme:
+            if not parsed.scheme and not local_path:
                 # Treat as relative path (caller should pass complete base_url + rel)
                 return None
             ext = os.path.splitext(parsed.path)[1] or ".png"
-            ts = int(time.time() * 1000)
-            fname = f"hikaze_ckpt_preview_{ts}{ext}"
+            digest = hashlib.sha1(parsed.path.encode("utf-8")).hexdigest()[:16]
+            fname = f"hikaze_ckpt_preview_{digest}{ext}"
             out_path = os.path.join(base_dir, fname)
-            with urllib.request.urlopen(image_url, timeout=3.0) as resp:
-                if resp.status != 200:
-                    return None
-                raw = resp.read()
-            with open(out_path, "wb") as f:
-                f.write(raw)
-            return {"filename": fname, "subfolder": "", "type": "temp"}
+            entry = {"filename": fname, "subfolder": "", "type": "temp"}
+            if os.path.isfile(out_path) and os.path.getsize(out_path) > 0:
+                return entry
+            tmp_path = f"{out_path}.{threading.get_ident()}.part"
+            if local_path:
+                shutil.copyfile(local_path, tmp_path)
+            else:
+                with urllib.request.urlopen(image_url, timeout=3.0) as resp:
+                    if resp.status != 200:
+                        return None
+                    with open(tmp_path, "wb") as f:
+                        shutil.copyfileobj(resp, f)
+            os.replace(tmp_path, out_path)
+            return entry
         except Exception:
             return None
+        finally:
+            # A failed copy or download leaves its partial file behind otherwise
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
 
     @classmethod
-    def _find_model_by_ckpt(cls, base_url: str, ckpt_name: str) -> Optional[Dict[str, Any]]:
-        # Fuzzy query via /models?q= then match ckpt_name exactly from results
+    def _find_model_by_ckpt(cls, base_url: Optional[str], ckpt_name: str, api=None) -> Optional[Dict[str, Any]]:
+        # Exact lookup by resolved file path (ckpt_name as fallback); the reply carries merged params
         try:
-            q = urllib.parse.quote(ckpt_name)
-            url = f"{base_url}/models?q={q}&limit=50"
-            data = cls._http_get_json(url)
-            if not data or "items" not in data:
-                return None
-            for item in data.get("items", []) or []:
-                try:
-                    if (item or {}).get("ckpt_name") == ckpt_name:
-                        return item
-                except Exception:
-                    continue
+            query: Dict[str, str] = {"ckpt_name": ckpt_name}
+            try:
+                query["path"] = cls._resolve_ckpt_path(ckpt_name)
+            except Exception:
+                pass
+            if api is not None:
+                return api.lookup_model(path=query.get("path"), ckpt_name=ckpt_name)
+            data = cls._http_get_json(f"{base_url}/models/lookup?{urllib.parse.urlencode(query)}")
+            return data if isinstance(data, dict) and "id" in data else None
         except Exception:
             return None
-        return None
 
-    @classmethod
-    def _get_prompts_text(cls, base_url: str, mid: int) -> Optional[str]:
-        try:
-            url = f"{base_url}/models/{mid}/params"
-            params = cls._http_get_json(url)
-            if not isinstance(params, dict):
-                return None
-            pos = params.get("prompt") or params.get("positive") or ""
-            neg = params.get("negative") or params.get("negative_prompt") or ""
-            # Only assemble when present
-            lines: List[str] = []
-            if pos:
-                lines.append(f"Positive: {pos}")
-            if neg:
-                lines.append(f"Negative: {neg}")
-            if not lines:
-                return None
-            return "\n".join(lines)
-        except Exception:
+    @staticmethod
+    def _prompts_text(params: Any) -> Optional[str]:
+        if not isinstance(params, dict):
+            return None
+        pos = params.get("prompt") or params.get("positive") or ""
+        neg = params.get("negative") or params.get("negative_prompt") or ""
+        # Only assemble when present
+        lines: List[str] = []
+        if pos:
+            lines.append(f"Positive: {pos}")
+        if neg:
+            lines.append(f"Negative: {neg}")
+        if not lines:
             return None
+        return "\n".join(lines)
 
     @classmethod
     def _build_ui_payload(cls, ckpt_name: str) -> Optional[Dict[str, Any]]:
-        base_url = cls._load_backend_base_url()
-        model = cls._find_model_by_ckpt(base_url, ckpt_name)
+        # Same process as the backend: query the catalog directly; otherwise go through its HTTP API
+        api = cls._backend_api()
+        base_url = None if api is not None else cls._load_backend_base_url()
+        model = cls._find_model_by_ckpt(base_url, ckpt_name, api=api)
         if not model:
             return None
         ui: Dict[str, Any] = {}
@@ -161,7 +192,12 @@ class HikazeCheckpointSelector:
                 if isinstance(it, str) and it:
                     first_url = it
                     break
-            if first_url:
+            local = api.media_path(first_url) if (first_url and api is not None) else None
+            if local:
+                img_entry = cls._download_to_temp(first_url, local_path=local)
+                if img_entry:
+                    ui["images"] = [img_entry]
+            elif first_url:
                 rel = first_url
                 # Build full URL (compatible with already-absolute URLs)
                 if rel.startswith("http://") or rel.startswith("https://"):
@@ -169,21 +205,52 @@ class HikazeCheckpointSelector:
                 else:
                     if not rel.startswith("/"):
                         rel = "/" + rel
-                    full = f"{base_url}{rel}"
+                    full = f"{base_url or cls._load_backend_base_url()}{rel}"
                 img_entry = cls._download_to_temp(full)
                 if img_entry:
                     ui["images"] = [img_entry]
         # prompts
-        try:
-            mid = int(model.get("id"))
-        except Exception:
-            mid = None  # type: ignore
-        if mid is not None:
-            txt = cls._get_prompts_text(base_url, mid)
-            if txt:
-                ui["text"] = (txt,)
+        txt = cls._prompts_text(model.get("params"))
+        if txt:
+            ui["text"] = (txt,)
         return ui or None
 
+    @classmethod
+    def _cached_ui_payload(cls, ckpt_name: str) -> Optional[Dict[str, Any]]:
+        """Preview payload for ckpt_name, served from the per-process cache.
+
+        Only the first execution for a checkpoint waits on the backend. Later ones return the cached
+        payload at once; a stale entry is rebuilt on a background thread for the next run.
+        """
+        now = time.monotonic()
+        with cls._payload_lock:
+            entry = cls._payload_cache.get(ckpt_name)
+            if entry is not None and entry[1] is None and now - entry[0] > cls._EMPTY_TTL_SEC:
+                entry = None
+            refresh = (entry is not None and now - entry[0] > cls._PAYLOAD_TTL_SEC
+                       and ckpt_name not in cls._payload_refreshing)
+            if refresh:
+                cls._payload_refreshing.add(ckpt_name)
+        if entry is None:
+            payload = cls._build_ui_payload(ckpt_name)
+            with cls._payload_lock:
+                cls._payload_cache[ckpt_name] = (time.monotonic(), payload)
+            return payload
+        if refresh:
+            def run() -> None:
+                try:
+                    payload = cls._build_ui_payload(ckpt_name)
+                    with cls._payload_lock:
+                        cls._payload_cache[ckpt_name] = (time.monotonic(), payload)
+                except Exception:
+                    pass
+                finally:
+                    with cls._payload_lock:
+                        cls._payload_refreshing.discard(ckpt_name)
+
+            threading.Thread(target=run, name="hikaze-ckpt-preview", daemon=True).start()
+        return entry[1]
+
     @staticmethod
     def _resolve_ckpt_path(ckpt_name: str) -> str:
         return folder_paths.get_full_path_or_raise("checkpoints", ckpt_name)
@@ -209,7 +276,7 @@ class HikazeCheckpointSelector:
         # Build UI preview (sample image + prompts); ignore on failure and just return model
         ui_payload = None
         try:
-            ui_payload = self._build_ui_payload(ckpt_name)
+            ui_payload = self._cached_ui_payload(ckpt_name)
         except Exception:
             ui_payload = None
 
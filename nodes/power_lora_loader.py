@@ -5,12 +5,20 @@ HikazePowerLoraLoader - Multiple LoRA stacking loader (with bypass)
 """
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional
 
 from nodes import LoraLoader  # type: ignore
+import comfy.sd  # type: ignore
+import comfy.utils  # type: ignore
 import folder_paths  # type: ignore
 import os
 
+try:
+    from ..backend import lora_cache as _lora_cache  # type: ignore
+except Exception:
+    _lora_cache = None
+
 
 # Lightweight implementation: FlexibleOptionalInputType and AnyType (inspired by rgthree)
 class _AnyType(str):
@@ -29,6 +37,55 @@ class FlexibleOptionalInputType(dict):
 _any_type = _AnyType("*")
 
 
+class _LoraNameIndex:
+    """Name resolution tiers for the LoRA list, as dicts (first list entry wins, like list.index).
+
+    Tiers, in order: exact, path without extension, basename, basename without extension,
+    then substring. Substring results are memoized. Everything is rebuilt when the list's
+    contents change: folder_paths.get_filename_list() returns a fresh copy on every call, so
+    only a comparison with a snapshot tells whether ComfyUI's LoRA folders changed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: Optional[tuple] = None
+        self._tiers: List[Dict[str, str]] = []
+        self._fuzzy: Dict[str, Optional[str]] = {}
+
+    def _rebuild(self, loras: List[str]) -> None:
+        exact: Dict[str, str] = {}
+        noext: Dict[str, str] = {}
+        base: Dict[str, str] = {}
+        base_noext: Dict[str, str] = {}
+        for x in loras:
+            b = os.path.basename(x)
+            exact.setdefault(x, x)
+            noext.setdefault(os.path.splitext(x)[0], x)
+            base.setdefault(b, x)
+            base_noext.setdefault(os.path.splitext(b)[0], x)
+        self._tiers = [exact, noext, base, base_noext]
+        self._fuzzy = {}
+        self._snapshot = tuple(loras)
+
+    def resolve(self, loras: List[str], name: str) -> Optional[str]:
+        with self._lock:
+            # Copies share ComfyUI's cached string objects, so an unchanged list compares by identity
+            if self._snapshot is None or len(loras) != len(self._snapshot) or tuple(loras) != self._snapshot:
+                self._rebuild(loras)
+            exact, noext, base, base_noext = self._tiers
+            b = os.path.basename(name)
+            hit = (exact.get(name) or noext.get(os.path.splitext(name)[0])
+                   or base.get(b) or base_noext.get(os.path.splitext(b)[0]))
+            if hit is not None:
+                return hit
+            if name not in self._fuzzy:
+                self._fuzzy[name] = next((p for p in loras if name in p), None)
+            return self._fuzzy[name]
+
+
+_NAME_INDEX = _LoraNameIndex()
+
+
 class HikazePowerLoraLoader:
     @classmethod
     def INPUT_TYPES(cls):
@@ -82,36 +139,24 @@ class HikazePowerLoraLoader:
         return rows
 
     @staticmethod
-    def _resolve_lora_name(name: str) -> str | None:
-        try:
-            loras = folder_paths.get_filename_list('loras')
-        except Exception:
-            loras = []
+    def _resolve_lora_name(name: str, loras: Optional[List[str]] = None) -> str | None:
+        if loras is None:
+            try:
+                loras = folder_paths.get_filename_list('loras')
+            except Exception:
+                loras = []
         if not loras:
             return None
-        # direct match
-        if name in loras:
-            return name
-        # match without extension (path or filename)
-        name_noext = os.path.splitext(name)[0]
-        loras_noext = [os.path.splitext(x)[0] for x in loras]
-        if name_noext in loras_noext:
-            return loras[loras_noext.index(name_noext)]
-        # match by basename
-        base = os.path.basename(name)
-        loras_base = [os.path.basename(x) for x in loras]
-        if base in loras_base:
-            return loras[loras_base.index(base)]
-        # match basename without extension
-        base_noext = os.path.splitext(base)[0]
-        loras_base_noext = [os.path.splitext(os.path.basename(x))[0] for x in loras]
-        if base_noext in loras_base_noext:
-            return loras[loras_base_noext.index(base_noext)]
-        # fuzzy contains
-        for i, p in enumerate(loras):
-            if name in p:
-                return loras[i]
-        return None
+        return _NAME_INDEX.resolve(loras, name)
+
+    @staticmethod
+    def _apply_cached_lora(model, clip, lora_name: str, strength_model: float, strength_clip: float):
+        """LoraLoader.load_lora, but the file's state dict comes from the shared LRU (backend.lora_cache)."""
+        if strength_model == 0 and strength_clip == 0:
+            return model, clip
+        lora_path = folder_paths.get_full_path_or_raise("loras", lora_name)
+        lora = _lora_cache.get(lora_path, lambda p: comfy.utils.load_torch_file(p, safe_load=True))
+        return comfy.sd.load_lora_for_models(model, clip, lora, strength_model, strength_clip)
 
     def load_loras(self, model, clip, **kwargs):
         # Bypass: support frontend-injected boolean 'bypass'
@@ -123,20 +168,28 @@ class HikazePowerLoraLoader:
         if not rows:
             return (model, clip)
 
-        loader = LoraLoader()
+        # One list fetch per execution (it stats the lora folders) instead of one per row
+        try:
+            loras = folder_paths.get_filename_list('loras')
+        except Exception:
+            loras = []
+        loader = LoraLoader() if _lora_cache is None else None
         for row in rows:
             if not row.get("on", True):
                 continue
             lora_name_in = row.get("lora")
             if not lora_name_in or not isinstance(lora_name_in, str):
                 continue
-            lora_name = self._resolve_lora_name(lora_name_in) or lora_name_in
+            lora_name = self._resolve_lora_name(lora_name_in, loras) or lora_name_in
             sm = row.get("strength_model", 1.0)
             sc = row.get("strength_clip", 1.0)
             # When no CLIP input, force clip strength to 0
             sc_eff = 0.0 if clip is None else float(sc)
             try:
-                model, clip = loader.load_lora(model, clip, lora_name, float(sm), sc_eff)
+                if loader is not None:
+                    model, clip = loader.load_lora(model, clip, lora_name, float(sm), sc_eff)
+                else:
+                    model, clip = self._apply_cached_lora(model, clip, lora_name, float(sm), sc_eff)
             except Exception:
                 # Skip on single-row failure to avoid failing the whole node
                 continue
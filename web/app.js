@@ -117,6 +117,7 @@
     models: [],
     total: 0,
     page: 1,
+    cursor: null, // keyset cursor from the previous /models page
     limit: 5000,
     loading: false,
     hasMore: true,
@@ -379,7 +380,7 @@
     // always use ALL mode for tags filtering
     url.searchParams.set('tags_mode', 'all');
     url.searchParams.set('limit', String(state.limit));
-    url.searchParams.set('offset', String((state.page - 1) * state.limit));
+    if (state.cursor) url.searchParams.set('cursor', state.cursor);
 
     try {
       const data = await api(url.pathname + '?' + url.searchParams.toString());
@@ -394,7 +395,8 @@
       state.models.push(...newModels);
       state.total = data.total || 0;
       state.page++;
-      state.hasMore = state.models.length < state.total;
+      state.cursor = data.next_cursor || null;
+      state.hasMore = !!state.cursor;
 
       // map preselected keys for lora
       if (state.selector.on && (state.selector.kind||'').toLowerCase().startsWith('lora') && state.selector.preKeys && state.selector.preKeys.size){
@@ -480,6 +482,12 @@
     hoverPreview.pos.x = e.clientX; hoverPreview.pos.y = e.clientY;
     if (hoverPreview.el && hoverPreview.el.style.display === 'block') positionPreview();
   }
+  // Grid cards and the hover preview use the server's 512px thumbnail instead of the full upload
+  const THUMB_SIZE = 512;
+  function thumbUrl(url){
+    if (!url || !url.startsWith('/media/')) return url;
+    return url + (url.includes('?') ? '&' : '?') + 'size=' + THUMB_SIZE;
+  }
   function removePreview(){
     if (hoverPreview.timer) { clearTimeout(hoverPreview.timer); hoverPreview.timer = null; }
     if (hoverPreview.el) hoverPreview.el.style.display = 'none';
@@ -487,7 +495,7 @@
   function schedulePreview(m){
     if (hoverPreview.timer) { clearTimeout(hoverPreview.timer); hoverPreview.timer = null; }
     removePreview();
-    const url = (m && m.images && m.images[0]) ? m.images[0] : null;
+    const url = (m && m.images && m.images[0]) ? thumbUrl(m.images[0]) : null;
     if (!url) return;
     hoverPreview.timer = setTimeout(() => {
       const box = createHoverEl();
@@ -619,7 +627,7 @@
         const tagRow = h('div', {class:'tags', style:{display:'flex', gap:'6px', flexWrap:'wrap'}}, tagRowChildren);
         card.append(top, bg, name, tagRow);
         if (m.images && m.images.length){
-          card.style.backgroundImage = `url(${m.images[0]})`;
+          card.style.backgroundImage = `url(${thumbUrl(m.images[0])})`;
         } else {
           card.classList.add('no-image');
         }
@@ -1080,6 +1088,7 @@
   function resetAndLoad(){
     state.loadSeq++; // 序列自增，标记之前的请求为过期
     state.page = 1;
+    state.cursor = null;
     state.models = [];
     state.hasMore = true;
     state.loading = false;